@@ -2,11 +2,13 @@ from django.db import models
 from django.conf import settings
 from django.contrib.auth import get_user_model
 
+from common.storage import content_storage
+
 
 class Profile(models.Model):
     user = models.OneToOneField(settings.AUTH_USER_MODEL, on_delete=models.CASCADE)
     date_of_birth = models.DateField(blank=True, null=True)
-    photo = models.ImageField(upload_to='users/%Y/%m/%d/', blank=True)
+    photo = models.ImageField(upload_to='users/%Y/%m/%d/', blank=True, storage=content_storage)
 
     def __str__(self):
         return f'Profile for user {self.user.username}'
@@ -0,0 +1,12 @@
+from django.db import transaction
+from django.db.models.signals import post_save
+from django.dispatch import receiver
+from images.thumbnails import queue_thumbnails
+from .models import Profile
+
+
+@receiver(post_save, sender=Profile)
+def profile_saved(sender, instance, update_fields=None, **kwargs):
+    # pre-generate thumbnails unless the photo was not part of the save
+    if update_fields is None or 'photo' in update_fields:
+        transaction.on_commit(lambda: queue_thumbnails(instance.photo))
@@ -1,6 +1,7 @@
 from django.contrib.syndication.views import Feed
 from django.urls import reverse_lazy
 from .models import Post
+from .rendering import post_html
 
 
 class LatestPostsFeed(Feed):
@@ -15,4 +16,4 @@ class LatestPostsFeed(Feed):
         return item.title
 
     def item_description(self, item):
-        return item.body
+        return post_html(item)
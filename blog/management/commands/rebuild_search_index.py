@@ -0,0 +1,27 @@
+import time
+
+from django.core.management.base import BaseCommand, CommandError
+
+from blog.models import Post
+from blog.search import search_supported, update_search_vector
+
+
+class Command(BaseCommand):
+    help = 'Recompute the stored full-text search vector of every blog post.'
+
+    def add_arguments(self, parser):
+        parser.add_argument('--batch-size', type=int, default=500,
+                            help='Posts updated per statement (default: 500).')
+
+    def handle(self, *args, **options):
+        if not search_supported():
+            raise CommandError('Full-text search needs PostgreSQL')
+
+        ids = list(Post.objects.order_by('pk').values_list('pk', flat=True))
+        started = time.monotonic()
+        updated = 0
+        for offset in range(0, len(ids), options['batch_size']):
+            batch = ids[offset:offset + options['batch_size']]
+            updated += update_search_vector(Post.objects.filter(pk__in=batch))
+        self.stdout.write(self.style.SUCCESS(
+            f"Rebuilt the search vector of {updated} posts in {time.monotonic() - started:.1f}s"))
@@ -0,0 +1,15 @@
+import time
+
+from django.core.management.base import BaseCommand
+
+from blog.similar import rebuild_index
+
+
+class Command(BaseCommand):
+    help = 'Recompute the similar posts index of every published blog post from their tags.'
+
+    def handle(self, *args, **options):
+        started = time.monotonic()
+        indexed = rebuild_index()
+        self.stdout.write(self.style.SUCCESS(
+            f"Indexed similar posts of {indexed} posts in {time.monotonic() - started:.1f}s"))
@@ -1,3 +1,5 @@
+from django.contrib.postgres.indexes import GinIndex
+from django.contrib.postgres.search import SearchVectorField
 from django.db import models
 from django.urls import reverse
 from django.utils import timezone
@@ -33,9 +35,16 @@ class Post(models.Model):
                                         related_name='blog_posts_liked',
                                         blank=True)
     total_likes = models.PositiveIntegerField(db_index=True, default=0)
+    # weighted title/body tsvector, maintained by blog.signals (see blog.search)
+    search_vector = SearchVectorField(null=True, editable=False)
 
     class Meta:
         ordering = ('-publish',)
+        indexes = [
+            GinIndex(fields=['search_vector'], name='blog_post_search_idx'),
+            # typo-tolerant title matching (requires the pg_trgm extension)
+            GinIndex(fields=['title'], name='blog_post_title_trgm_idx', opclasses=['gin_trgm_ops']),
+        ]
 
     def __str__(self):
         return self.title
@@ -0,0 +1,78 @@
+"""
+Rendered Markdown of post bodies.
+
+A post's HTML (and each excerpt length of it) is cached under the post id
+and its ``updated`` timestamp, so an edit changes the key and stale entries
+simply expire. The HTML is rendered when a post is saved; pages, the feed
+and excerpts only read it. Markdown converters are built once per thread
+with the configured extensions and reset between documents. Without a
+reachable cache, bodies are simply rendered on every request.
+"""
+import logging
+import threading
+
+import markdown
+import redis
+from django.core.cache import cache
+from django.utils.text import Truncator
+
+logger = logging.getLogger(__name__)
+
+# Markdown extensions used for post bodies
+EXTENSIONS = ()
+HTML_CACHE_TTL = 7 * 24 * 3600
+
+_local = threading.local()
+
+
+def render_markdown(text):
+    # a Markdown instance keeps per-document state and is not thread-safe
+    converter = getattr(_local, 'converter', None)
+    if converter is None:
+        converter = _local.converter = markdown.Markdown(extensions=list(EXTENSIONS))
+    return converter.reset().convert(text)
+
+
+def _cache_get(key):
+    try:
+        return cache.get(key)
+    except redis.RedisError as e:
+        logger.error(f"Redis error reading rendered post body: {e}")
+        return None
+
+
+def _cache_set(key, html):
+    try:
+        cache.set(key, html, HTML_CACHE_TTL)
+    except redis.RedisError as e:
+        logger.error(f"Redis error caching rendered post body: {e}")
+
+
+def html_cache_key(post, words=None):
+    key = f"blog:post_html:{post.pk}:{post.updated:%Y%m%d%H%M%S%f}"
+    return f"{key}:{words}" if words else key
+
+
+def post_html(post):
+    """Rendered HTML of the body of ``post``."""
+    html = _cache_get(html_cache_key(post))
+    if html is None:
+        html = prerender(post)
+    return html
+
+
+def post_excerpt(post, words):
+    """The rendered body truncated to ``words`` words, like ``truncatewords_html``."""
+    key = html_cache_key(post, words)
+    html = _cache_get(key)
+    if html is None:
+        html = Truncator(post_html(post)).words(words, html=True, truncate=' …')
+        _cache_set(key, html)
+    return html
+
+
+def prerender(post):
+    """Render and cache the body of ``post``; returns the HTML."""
+    html = render_markdown(post.body)
+    _cache_set(html_cache_key(post), html)
+    return html
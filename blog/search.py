@@ -0,0 +1,67 @@
+"""
+Full-text search of blog posts.
+
+Each post's weighted tsvector (title A, body B) is stored in
+``Post.search_vector`` when the post is saved and indexed with GIN, so a
+search is an index lookup and only the returned page is ranked and
+highlighted. Queries matching nothing fall back to trigram similarity on
+titles, which tolerates typos. ``manage.py rebuild_search_index`` refills
+the column after bulk writes that bypass save().
+"""
+from django.contrib.postgres.search import (SearchHeadline, SearchQuery, SearchRank, SearchVector,
+                                            TrigramSimilarity)
+from django.db import connection
+from django.db.models import F
+from django.utils.html import escape
+from django.utils.safestring import mark_safe
+
+from .models import Post
+
+SEARCH_VECTOR = SearchVector('title', weight='A') + SearchVector('body', weight='B')
+MIN_RANK = 0.3
+MAX_RESULTS = 20
+# Private-use characters marking matches in ts_headline output, which is
+# escaped (it is cut from the raw body) before they become <mark> tags
+START_SEL, STOP_SEL = '\ue000', '\ue001'
+
+
+def search_supported():
+    return connection.vendor == 'postgresql'
+
+
+def update_search_vector(queryset):
+    """Recompute the stored vector of every post in ``queryset`` in one UPDATE."""
+    if search_supported():
+        return queryset.update(search_vector=SEARCH_VECTOR)
+    return 0
+
+
+def highlight(headline):
+    """HTML of a ts_headline snippet: the body text escaped, matches in ``<mark>``."""
+    return mark_safe(escape(headline).replace(START_SEL, '<mark>').replace(STOP_SEL, '</mark>'))
+
+
+def search_posts(query, limit=MAX_RESULTS):
+    """
+    Return ``(posts, total, fuzzy)``: the best ``limit`` published posts for
+    ``query`` with a highlighted ``headline``, the number of matches, and
+    whether they came from the trigram fallback.
+    """
+    search_query = SearchQuery(query, search_type='websearch')
+    matches = (Post.published.filter(search_vector=search_query)
+               .annotate(rank=SearchRank(F('search_vector'), search_query))
+               .filter(rank__gte=MIN_RANK))
+    total = matches.count()
+    if total:
+        posts = list(matches.order_by('-rank').annotate(
+            headline=SearchHeadline('body', search_query, start_sel=START_SEL, stop_sel=STOP_SEL,
+                                    max_words=35, min_words=15))[:limit])
+        for post in posts:
+            post.headline = highlight(post.headline)
+        return posts, total, False
+
+    # trigram_similar (the indexed % operator) filters, similarity orders
+    matches = (Post.published.filter(title__trigram_similar=query)
+               .annotate(similarity=TrigramSimilarity('title', query)))
+    total = matches.count()
+    return list(matches.order_by('-similarity')[:limit]), total, True
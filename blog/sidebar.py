@@ -0,0 +1,81 @@
+"""
+Cached blog sidebar data.
+
+The sidebar (post count, latest and most commented posts) is cached both
+per query and as a rendered fragment (the ``cached_sidebar`` tag), under a version number that
+``blog.signals`` bumps whenever a post or comment is saved or deleted.
+Bumping the version orphans every cached entry at once; they then expire.
+While the cache is unreachable the sidebar is computed live.
+"""
+import logging
+import time
+
+import redis
+from django.core.cache import cache
+from django.db.models import Count
+
+from .models import Post
+
+logger = logging.getLogger(__name__)
+
+VERSION_KEY = 'blog:sidebar:version'
+SIDEBAR_CACHE_TTL = 24 * 3600
+
+
+def sidebar_version():
+    version = cache.get(VERSION_KEY)
+    if version is None:
+        # time-based so a lost version key never revives entries of an old version
+        cache.add(VERSION_KEY, int(time.time()), None)
+        version = cache.get(VERSION_KEY, int(time.time()))
+    return version
+
+
+def bump_sidebar_version():
+    try:
+        try:
+            cache.incr(VERSION_KEY)
+        except ValueError:
+            cache.set(VERSION_KEY, int(time.time()), None)
+    except redis.RedisError as e:
+        # runs after commit; cached entries expire within SIDEBAR_CACHE_TTL
+        logger.error(f"Redis error bumping the blog sidebar version: {e}")
+
+
+def _cached(name, compute):
+    try:
+        key = f'blog:sidebar:{sidebar_version()}:{name}'
+        value = cache.get(key)
+    except redis.RedisError as e:
+        logger.error(f"Redis error reading blog sidebar {name}: {e}")
+        return compute()
+    if value is None:
+        value = compute()
+        try:
+            cache.set(key, value, SIDEBAR_CACHE_TTL)
+        except redis.RedisError as e:
+            logger.error(f"Redis error caching blog sidebar {name}: {e}")
+    return value
+
+
+def rendered(render):
+    """The rendered sidebar, ``render()`` on a miss."""
+    return _cached('fragment', render)
+
+
+def _links(queryset):
+    # only what get_absolute_url and the title need
+    return list(queryset.only('id', 'title', 'slug', 'publish'))
+
+
+def total_posts():
+    return _cached('total', Post.published.count)
+
+
+def latest_posts(count):
+    return _cached(f'latest:{count}', lambda: _links(Post.published.order_by('-publish')[:count]))
+
+
+def most_commented_posts(count):
+    return _cached(f'commented:{count}', lambda: _links(
+        Post.published.annotate(total_comments=Count('comments')).order_by('-total_comments')[:count]))
@@ -1,9 +1,122 @@
-from django.db.models.signals import m2m_changed
+import logging
+
+import redis
+from django.db import transaction
+from django.db.models.signals import m2m_changed, post_delete, post_save, pre_delete, pre_save
 from django.dispatch import receiver
-from .models import Post
+from django.urls import reverse
+from taggit.models import Tag
+from common.likes import update_like_count
+from core.page_cache import purge
+from . import similar
+from .models import Comment, Post
+from .rendering import prerender
+from .search import update_search_vector
+from .sidebar import bump_sidebar_version
+
+logger = logging.getLogger(__name__)
 
 
 @receiver(m2m_changed, sender=Post.users_like.through)
-def users_like_changed(sender, instance, **kwargs):
-    instance.total_likes = instance.users_like.count()
-    instance.save()
+def users_like_changed(sender, instance, action, reverse, pk_set, **kwargs):
+    update_like_count(Post, instance, action, reverse, pk_set)
+
+
+@receiver(post_save, sender=Post)
+def post_saved(sender, instance, update_fields=None, **kwargs):
+    if update_fields is None or {'title', 'body'} & set(update_fields):
+        update_search_vector(Post.objects.filter(pk=instance.pk))
+    if update_fields is None or 'body' in update_fields:
+        prerender(instance)
+
+
+@receiver([post_save, post_delete], sender=Post)
+@receiver([post_save, post_delete], sender=Comment)
+def sidebar_changed(sender, **kwargs):
+    transaction.on_commit(bump_sidebar_version)
+
+
+def reindex_similar(post=None, deleted_id=None):
+    try:
+        if deleted_id is not None:
+            neighbours = similar.remove_post(deleted_id)
+        else:
+            neighbours = similar.update_post(post)
+    except redis.RedisError as e:
+        # the index is rebuilt for a post when it is next viewed, or by rebuild_similar_posts
+        logger.error(f"Redis error updating similar posts of post {post.pk if post else deleted_id}: {e}")
+        return
+    # the neighbours' pages list this post among their similar posts (already on commit here)
+    purge([neighbour.get_absolute_url()
+           for neighbour in Post.objects.filter(pk__in=neighbours).only('slug', 'publish')])
+
+
+@receiver(post_save, sender=Post)
+def post_similar_changed(sender, instance, update_fields=None, **kwargs):
+    if update_fields is None or {'status', 'publish'} & set(update_fields):
+        transaction.on_commit(lambda: reindex_similar(instance))
+
+
+@receiver(m2m_changed, sender=Post.tags.through)
+def post_tags_changed(sender, instance, action, **kwargs):
+    if action in ('post_add', 'post_remove', 'post_clear') and isinstance(instance, Post):
+        transaction.on_commit(lambda: reindex_similar(instance))
+
+
+@receiver(post_delete, sender=Post)
+def post_deleted(sender, instance, **kwargs):
+    post_id = instance.pk
+    transaction.on_commit(lambda: reindex_similar(deleted_id=post_id))
+
+
+# Anonymous page cache purging: only the URLs showing the changed content
+
+def listing_paths(tag_slugs=()):
+    paths = [reverse('blog:post_list'), reverse('blog:post_feed'), reverse('django.contrib.sitemaps.views.sitemap')]
+    return paths + [reverse('blog:post_list_by_tag', args=[slug]) for slug in tag_slugs]
+
+
+def purge_on_commit(paths):
+    transaction.on_commit(lambda: purge(paths))
+
+
+@receiver(pre_save, sender=Post)
+def post_url_before_save(sender, instance, **kwargs):
+    # a new slug or publication date moves the post, and its old URL must go too
+    old = Post.objects.filter(pk=instance.pk).only('slug', 'publish').first() if instance.pk else None
+    instance._old_url = old.get_absolute_url() if old else None
+
+
+@receiver(post_save, sender=Post)
+@receiver(pre_delete, sender=Post)
+def post_pages_changed(sender, instance, **kwargs):
+    paths = [instance.get_absolute_url()] + listing_paths(instance.tags.values_list('slug', flat=True))
+    if getattr(instance, '_old_url', None):
+        paths.append(instance._old_url)
+    purge_on_commit(paths)
+
+
+@receiver(m2m_changed, sender=Post.tags.through)
+def post_tag_pages_changed(sender, instance, action, pk_set, **kwargs):
+    if not isinstance(instance, Post):
+        return
+    if action == 'pre_clear':
+        instance._cleared_tag_slugs = list(instance.tags.values_list('slug', flat=True))
+    elif action in ('post_add', 'post_remove', 'post_clear'):
+        if action == 'post_clear':
+            slugs = instance.__dict__.pop('_cleared_tag_slugs', [])
+        else:
+            slugs = Tag.objects.filter(pk__in=pk_set).values_list('slug', flat=True)
+        purge_on_commit([instance.get_absolute_url()] + listing_paths(slugs))
+
+
+@receiver(post_save, sender=Tag)
+@receiver(pre_delete, sender=Tag)
+def tag_pages_changed(sender, instance, **kwargs):
+    posts = Post.published.filter(tags=instance).only('slug', 'publish')
+    purge_on_commit([post.get_absolute_url() for post in posts] + listing_paths([instance.slug]))
+
+
+@receiver([post_save, post_delete], sender=Comment)
+def comment_pages_changed(sender, instance, **kwargs):
+    purge_on_commit([instance.post.get_absolute_url()])
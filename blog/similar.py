@@ -0,0 +1,136 @@
+"""
+Similar posts index.
+
+For every published post a sorted set ``blog:similar:<id>`` holds the other
+published posts sharing at least one tag, scored by the number of shared
+tags and then by publication date (the order post_detail always used). It
+is kept current incrementally: when a post's tags, status or date change,
+only its own set and the sets of its old and new neighbours are touched.
+Post pages then read their similar posts with one ZREVRANGE and one
+primary-key lookup. ``manage.py rebuild_similar_posts`` recomputes the
+whole index in a single pass over the tag assignments.
+"""
+import logging
+from collections import Counter, defaultdict
+
+import redis
+from django.db.models import Count
+
+from core.redis_client import get_redis
+
+from .models import Post
+
+logger = logging.getLogger(__name__)
+
+KEY_PREFIX = 'blog:similar:'
+# Member present in every indexed post's set, so a post without similar
+# posts is told apart from one not indexed yet. Real scores are far higher.
+INDEXED = '-'
+# Shared tags dominate; the publication timestamp breaks ties
+SHARED_TAG_WEIGHT = 1e10
+
+
+def similar_key(post_id):
+    return f'{KEY_PREFIX}{post_id}'
+
+
+def similarity_score(shared_tags, publish):
+    return shared_tags * SHARED_TAG_WEIGHT + publish.timestamp()
+
+
+def similar_posts_query(post):
+    """Published posts sharing tags with ``post``, annotated with ``same_tags``, most similar first."""
+    post_tags_ids = post.tags.values_list('id', flat=True)
+    similar_posts = Post.published.filter(tags__in=post_tags_ids).exclude(id=post.id)
+    return similar_posts.annotate(same_tags=Count('tags')).order_by('-same_tags', '-publish')
+
+
+def update_post(post):
+    """
+    Re-index ``post`` and its neighbours after its tags, status or publication
+    date changed. Returns the ids of its old and new neighbours, whose similar
+    posts lists changed.
+    """
+    r = get_redis()
+    key = similar_key(post.pk)
+    old = {int(member) for member in r.zrange(key, 0, -1) if member != INDEXED}
+    neighbours = {}
+    if post.status == Post.Status.PUBLISHED:
+        neighbours = {pk: (shared, publish) for pk, shared, publish
+                      in similar_posts_query(post).values_list('id', 'same_tags', 'publish')}
+    # only sets that are already indexed get this post added, never a partial set
+    pipe = r.pipeline()
+    for pk in neighbours:
+        pipe.exists(similar_key(pk))
+    indexed = [pk for pk, exists in zip(neighbours, pipe.execute()) if exists]
+
+    pipe = r.pipeline()
+    pipe.delete(key)
+    for pk in old - neighbours.keys():
+        pipe.zrem(similar_key(pk), post.pk)
+    if post.status == Post.Status.PUBLISHED:
+        pipe.zadd(key, {INDEXED: 0, **{pk: similarity_score(shared, publish)
+                                       for pk, (shared, publish) in neighbours.items()}})
+        for pk in indexed:
+            pipe.zadd(similar_key(pk), {post.pk: similarity_score(neighbours[pk][0], post.publish)})
+    pipe.execute()
+    return old | neighbours.keys()
+
+
+def remove_post(post_id):
+    """Drop a deleted post from the index. Returns the ids of its former neighbours."""
+    r = get_redis()
+    key = similar_key(post_id)
+    old = {int(member) for member in r.zrange(key, 0, -1) if member != INDEXED}
+    pipe = r.pipeline()
+    for pk in old:
+        pipe.zrem(similar_key(pk), post_id)
+    pipe.delete(key)
+    pipe.execute()
+    return old
+
+
+def shared_tag_counts(tagged):
+    """``{post id: Counter({other post id: shared tags})}`` from ``(post id, tag id)`` pairs."""
+    posts_by_tag = defaultdict(list)
+    for post_id, tag_id in tagged:
+        posts_by_tag[tag_id].append(post_id)
+    shared = defaultdict(Counter)
+    for post_ids in posts_by_tag.values():
+        for post_id in post_ids:
+            for other in post_ids:
+                if other != post_id:
+                    shared[post_id][other] += 1
+    return shared
+
+
+def rebuild_index():
+    """Recompute the sets of every published post. Returns the number of posts indexed."""
+    publish = dict(Post.published.values_list('id', 'publish'))
+    shared = shared_tag_counts(Post.published.filter(tags__isnull=False).values_list('id', 'tags'))
+    r = get_redis()
+    pipe = r.pipeline()
+    for key in r.scan_iter(f'{KEY_PREFIX}*'):
+        pipe.delete(key)
+    for post_id in publish:
+        pipe.zadd(similar_key(post_id), {INDEXED: 0, **{other: similarity_score(count, publish[other])
+                                                        for other, count in shared[post_id].items()}})
+    pipe.execute()
+    return len(publish)
+
+
+def similar_posts(post, count=4):
+    """The ``count`` posts most similar to ``post``, from the index (built for it if missing)."""
+    try:
+        r = get_redis()
+        # one extra member: the INDEXED marker sorts last
+        ids = r.zrevrange(similar_key(post.pk), 0, count)
+        if not ids:
+            update_post(post)
+            ids = r.zrevrange(similar_key(post.pk), 0, count)
+    except redis.RedisError as e:
+        logger.warning(f"Similar posts index unavailable for post {post.pk}: {e}")
+        return list(similar_posts_query(post)[:count])
+    ids = [int(pk) for pk in ids if pk != INDEXED][:count]
+    posts = Post.published.in_bulk(ids)
+    return [posts[pk] for pk in ids if pk in posts]
@@ -1,17 +1,26 @@
-import markdown
-
 from django import template
-from django.db.models import Count
 from django.utils.safestring import mark_safe
 
-from ..models import Post
+from .. import rendering, sidebar
 
 register = template.Library()
 
 
 @register.filter(name='markdown')
 def markdown_format(text):
-    return mark_safe(markdown.markdown(text))
+    return mark_safe(rendering.render_markdown(text))
+
+
+@register.filter
+def post_html(post):
+    """Rendered body of a post, from the cache."""
+    return mark_safe(rendering.post_html(post))
+
+
+@register.filter
+def post_excerpt(post, words):
+    """Rendered body of a post truncated to ``words`` words, from the cache."""
+    return mark_safe(rendering.post_excerpt(post, int(words)))
 
 
 
@@ -20,15 +29,31 @@ def markdown_format(text):
 
 @register.simple_tag
 def get_most_commented_posts(count=5):
-    return Post.published.annotate(total_comments=Count('comments')).order_by('-total_comments')[:count]
+    return sidebar.most_commented_posts(count)
 
 
 @register.inclusion_tag('blog/post/latest_posts.html')
 def show_latest_posts(count=5):
-    latest_posts = Post.published.order_by('-publish')[:count]
+    latest_posts = sidebar.latest_posts(count)
     return {'latest_posts': latest_posts}
 
 
 @register.simple_tag
 def total_posts():
-    return Post.published.count()
+    return sidebar.total_posts()
+
+
+class CachedSidebarNode(template.Node):
+    def __init__(self, nodelist):
+        self.nodelist = nodelist
+
+    def render(self, context):
+        return sidebar.rendered(lambda: self.nodelist.render(context))
+
+
+@register.tag
+def cached_sidebar(parser, token):
+    """``{% cached_sidebar %}…{% endcached_sidebar %}``: the sidebar fragment, cached until posts or comments change."""
+    nodelist = parser.parse(('endcached_sidebar',))
+    parser.delete_first_token()
+    return CachedSidebarNode(nodelist)
@@ -1,4 +1,4 @@
-from django.test import TestCase, Client
+from django.test import TestCase, Client, override_settings
 from django.contrib.auth.models import User
 from django.urls import reverse
 from .models import Post, Comment
@@ -6,6 +6,10 @@ from .forms import CommentForm, EmailPostForm, SearchForm
 from django.utils import timezone
 from taggit.models import Tag
 
+# Tests that use the cache get a private in-memory one, never the configured Redis
+LOCMEM_CACHES = {'default': {'BACKEND': 'django.core.cache.backends.locmem.LocMemCache'}}
+
+
 class BlogModelTests(TestCase):
     def setUp(self):
         self.user = User.objects.create_user(username='john', password='12345')
@@ -90,6 +94,31 @@ class BlogViewTests(TestCase):
         self.assertEqual(resp.status_code, 200)
         self.assertTemplateUsed(resp, 'blog/post/search.html')
 
+    def test_post_search_view_renders_highlights(self):
+        from unittest.mock import patch
+        from django.utils.safestring import mark_safe
+        self.post.headline = mark_safe('a <mark>sample</mark> body')
+        with patch('blog.views.search_posts', return_value=([self.post], 1, False)) as mock_search:
+            resp = self.client.get(reverse('blog:post_search'), {'query': 'sample'})
+        mock_search.assert_called_once_with('sample')
+        self.assertContains(resp, 'Found 1 result')
+        self.assertContains(resp, 'a <mark>sample</mark> body')
+
+    def test_highlight_escapes_body_and_marks_matches(self):
+        from .search import START_SEL, STOP_SEL, highlight
+        headline = highlight(f'<a href="x">see {START_SEL}django{STOP_SEL} **docs**</a')
+        self.assertEqual(headline, '&lt;a href=&quot;x&quot;&gt;see <mark>django</mark> **docs**&lt;/a')
+
+    def test_save_updates_search_vector(self):
+        from unittest.mock import patch
+        with patch('blog.signals.update_search_vector') as mock_update:
+            self.post.save(update_fields=['total_likes'])
+            mock_update.assert_not_called()
+            self.post.body = 'New body'
+            self.post.save()
+        queryset = mock_update.call_args[0][0]
+        self.assertEqual(list(queryset), [self.post])
+
     def test_post_share_view_get(self):
         url = reverse('blog:post_share', args=[self.post.id])
         self.client.login(username='john', password='12345')
@@ -105,6 +134,17 @@ class BlogViewTests(TestCase):
         }, HTTP_X_REQUESTED_WITH='XMLHttpRequest')
         self.assertJSONEqual(str(resp.content, encoding='utf8'), {'status': 'ok'})
 
+    def test_like_updates_counter_without_saving_post(self):
+        from actions.models import Action
+        actions = Action.objects.count()
+        other = User.objects.create_user(username='jane', password='12345')
+        self.post.users_like.add(self.user)
+        other.blog_posts_liked.add(self.post)
+        self.post.refresh_from_db()
+        self.assertEqual(self.post.total_likes, 2)
+        # no 'blogged' action from re-running Post.save
+        self.assertEqual(Action.objects.count(), actions)
+
 
 class FeedTests(TestCase):
     def test_latest_posts_feed(self):
@@ -120,3 +160,224 @@ class FeedTests(TestCase):
         resp = self.client.get(reverse('blog:post_feed'))
         self.assertEqual(resp.status_code, 200)
         self.assertIn(b'New post', resp.content)
+
+
+@override_settings(CACHES=LOCMEM_CACHES)
+class RenderedBodyTests(TestCase):
+    def setUp(self):
+        from django.core.cache import cache
+        cache.clear()
+        self.user = User.objects.create_user(username='john', password='12345')
+        self.post = Post.objects.create(title='Post', slug='post', author=self.user,
+                                        body='Some **bold** text ' + 'word ' * 200)
+
+    def test_save_prerenders_and_pages_reuse_html(self):
+        from unittest.mock import patch
+        from .rendering import post_excerpt, post_html
+        with patch('blog.rendering.render_markdown') as mock_render:
+            html = post_html(self.post)
+            post_excerpt(self.post, 140)
+            self.client.get(self.post.get_absolute_url())
+        mock_render.assert_not_called()
+        self.assertIn('<strong>bold</strong>', html)
+
+    def test_edit_renders_new_body(self):
+        from django.template.defaultfilters import truncatewords_html
+        from .rendering import post_excerpt, post_html
+        self.assertEqual(post_excerpt(self.post, 5), truncatewords_html(post_html(self.post), 5))
+        self.post.body = 'Changed _body_'
+        self.post.save()
+        post = Post.objects.get(pk=self.post.pk)
+        self.assertEqual(post_html(post), '<p>Changed <em>body</em></p>')
+        self.assertEqual(post_excerpt(post, 5), '<p>Changed <em>body</em></p>')
+
+    def test_feed_uses_rendered_html(self):
+        resp = self.client.get(reverse('blog:post_feed'))
+        self.assertIn(b'&lt;strong&gt;bold&lt;/strong&gt;', resp.content)
+
+    def test_renders_without_redis(self):
+        import redis
+        from unittest.mock import patch
+        from .rendering import post_excerpt, post_html
+        with patch('blog.rendering.cache') as cache:
+            cache.get.side_effect = cache.set.side_effect = redis.ConnectionError('down')
+            self.post.body = 'New _body_'
+            self.post.save()
+            self.assertEqual(post_html(self.post), '<p>New <em>body</em></p>')
+            self.assertEqual(post_excerpt(self.post, 1), '<p>New <em> …</em></p>')
+
+
+@override_settings(CACHES=LOCMEM_CACHES)
+class SidebarCacheTests(TestCase):
+    def setUp(self):
+        from django.core.cache import cache
+        cache.clear()
+        self.user = User.objects.create_user(username='john', password='12345')
+        self.post = Post.objects.create(title='Post', slug='post', author=self.user, body='Body')
+
+    def test_queries_are_cached_until_a_post_or_comment_changes(self):
+        from . import sidebar
+        self.assertEqual(sidebar.total_posts(), 1)
+        self.assertEqual(sidebar.latest_posts(3), [self.post])
+        with self.assertNumQueries(0):
+            sidebar.total_posts()
+            sidebar.latest_posts(3)
+        with self.captureOnCommitCallbacks(execute=True):
+            other = Post.objects.create(title='Other', slug='other', author=self.user, body='Body')
+        self.assertEqual(sidebar.total_posts(), 2)
+        with self.captureOnCommitCallbacks(execute=True):
+            Comment.objects.create(post=other, user=self.user, body='Hi')
+        self.assertEqual(sidebar.most_commented_posts(1), [other])
+        with self.captureOnCommitCallbacks(execute=True):
+            other.delete()
+        self.assertEqual(sidebar.total_posts(), 1)
+
+    def test_sidebar_fragment_is_cached(self):
+        from django.db import connection
+        from django.test.utils import CaptureQueriesContext
+        self.client.get(reverse('blog:post_list'))
+        with CaptureQueriesContext(connection) as queries:
+            resp = self.client.get(reverse('blog:post_list'))
+        self.assertContains(resp, '1 posts so far')
+        self.assertFalse([q for q in queries.captured_queries if 'COUNT(' in q['sql'].upper()
+                          and 'blog_comment' in q['sql']])
+
+    def test_sidebar_is_computed_live_without_redis(self):
+        import redis
+        from unittest.mock import patch
+        from . import sidebar
+        with patch('blog.sidebar.cache') as cache:
+            cache.get.side_effect = cache.incr.side_effect = redis.ConnectionError('down')
+            resp = self.client.get(reverse('blog:post_list'))
+            with self.captureOnCommitCallbacks(execute=True):
+                Post.objects.create(title='Other', slug='other', author=self.user, body='Body')
+            self.assertEqual(sidebar.total_posts(), 2)
+        self.assertContains(resp, '1 posts so far')
+
+
+class SimilarPostsTests(TestCase):
+    def setUp(self):
+        from unittest.mock import patch
+        self.user = User.objects.create_user(username='john', password='12345')
+        self.posts = []
+        for i, tags in enumerate([('django', 'redis'), ('django', 'redis'), ('django',), ('life',)]):
+            post = Post.objects.create(title=f'Post {i}', slug=f'post-{i}', author=self.user, body='Body',
+                                       publish=timezone.now() - timezone.timedelta(days=i))
+            post.tags.add(*tags)
+            self.posts.append(post)
+        patcher = patch('blog.similar.get_redis')
+        self.redis = patcher.start().return_value
+        self.addCleanup(patcher.stop)
+
+    def test_shared_tag_counts(self):
+        from .similar import shared_tag_counts
+        shared = shared_tag_counts([(1, 'a'), (2, 'a'), (1, 'b'), (2, 'b'), (3, 'b'), (4, 'c')])
+        self.assertEqual(shared[1], {2: 2, 3: 1})
+        self.assertEqual(shared[3], {1: 1, 2: 1})
+        self.assertEqual(shared[4], {})
+
+    def test_reads_index_in_order(self):
+        from .similar import INDEXED, similar_key, similar_posts
+        self.redis.zrevrange.return_value = [str(self.posts[2].pk), str(self.posts[1].pk), INDEXED]
+        with self.assertNumQueries(1):
+            result = similar_posts(self.posts[0], 4)
+        self.assertEqual(result, [self.posts[2], self.posts[1]])
+        self.redis.zrevrange.assert_called_once_with(similar_key(self.posts[0].pk), 0, 4)
+
+    def test_update_post_scores_neighbours(self):
+        from .similar import INDEXED, similar_key, update_post
+        self.redis.zrange.return_value = [INDEXED, str(self.posts[3].pk)]
+        pipe = self.redis.pipeline.return_value
+        pipe.execute.side_effect = [[True, False], []]
+        neighbours = update_post(self.posts[0])
+        zadds = {call.args[0]: call.args[1] for call in pipe.zadd.call_args_list}
+        own = zadds[similar_key(self.posts[0].pk)]
+        # two shared tags rank above one, whatever the dates
+        self.assertGreater(own[self.posts[1].pk], own[self.posts[2].pk])
+        self.assertEqual(own[INDEXED], 0)
+        # only the already indexed neighbour gets this post added
+        self.assertIn(similar_key(self.posts[1].pk), zadds)
+        self.assertNotIn(similar_key(self.posts[2].pk), zadds)
+        pipe.zrem.assert_called_once_with(similar_key(self.posts[3].pk), self.posts[0].pk)
+        # old and new neighbours, whose pages list this post
+        self.assertEqual(neighbours, {self.posts[1].pk, self.posts[2].pk, self.posts[3].pk})
+
+    def test_falls_back_to_query_without_redis(self):
+        import redis
+        from .similar import similar_posts
+        self.redis.zrevrange.side_effect = redis.ConnectionError('down')
+        self.assertEqual(similar_posts(self.posts[0], 4), [self.posts[1], self.posts[2]])
+
+    def test_tag_changes_reindex_the_post(self):
+        from unittest.mock import patch
+        with patch('blog.similar.update_post') as mock_update:
+            with self.captureOnCommitCallbacks(execute=True):
+                self.posts[3].tags.add('django')
+        mock_update.assert_called_once_with(self.posts[3])
+
+
+@override_settings(CACHES=LOCMEM_CACHES)
+class PageCachePurgeTests(TestCase):
+    def setUp(self):
+        from unittest.mock import patch
+        from django.core.cache import cache
+        cache.clear()
+        patcher = patch('core.page_cache.get_redis')
+        patcher.start()
+        self.addCleanup(patcher.stop)
+        self.user = User.objects.create_user(username='john', password='12345')
+        with self.captureOnCommitCallbacks(execute=True):
+            self.post = Post.objects.create(title='Post', slug='post', author=self.user, body='Old body')
+            self.other = Post.objects.create(title='Other', slug='other', author=self.user, body='Other body')
+            self.post.tags.add('django')
+
+    def cached(self, url):
+        return self.client.get(url)['X-Page-Cache'] == 'HIT'
+
+    def warm(self, *urls):
+        for url in urls:
+            self.client.get(url)
+            self.assertTrue(self.cached(url))
+
+    def test_post_edit_purges_its_pages_only(self):
+        tag_url = reverse('blog:post_list_by_tag', args=['django'])
+        list_url = reverse('blog:post_list')
+        self.warm(self.post.get_absolute_url(), self.other.get_absolute_url(), tag_url, list_url,
+                  reverse('blog:post_feed'))
+        with self.captureOnCommitCallbacks(execute=True):
+            self.post.body = 'New body'
+            self.post.save()
+        response = self.client.get(self.post.get_absolute_url())
+        self.assertEqual(response['X-Page-Cache'], 'MISS')
+        self.assertContains(response, 'New body')
+        self.assertFalse(self.cached(tag_url))
+        self.assertFalse(self.cached(list_url))
+        self.assertFalse(self.cached(reverse('blog:post_feed')))
+        self.assertTrue(self.cached(self.other.get_absolute_url()))
+
+    def test_comment_purges_the_post_page(self):
+        self.warm(self.post.get_absolute_url(), self.other.get_absolute_url())
+        with self.captureOnCommitCallbacks(execute=True):
+            Comment.objects.create(post=self.post, user=self.user, body='Nice post')
+        self.assertContains(self.client.get(self.post.get_absolute_url()), 'Nice post')
+        self.assertTrue(self.cached(self.other.get_absolute_url()))
+
+    def test_tag_changes_purge_tag_pages(self):
+        new_tag_url = reverse('blog:post_list_by_tag', args=['redis'])
+        self.client.get(new_tag_url)
+        self.warm(self.other.get_absolute_url())
+        with self.captureOnCommitCallbacks(execute=True):
+            self.other.tags.add('redis')
+        self.assertContains(self.client.get(new_tag_url), 'Other')
+        self.assertFalse(self.cached(self.other.get_absolute_url()))
+
+    def test_similar_index_changes_purge_neighbour_pages(self):
+        from unittest.mock import patch
+        third = Post.objects.create(title='Third', slug='third', author=self.user, body='Third body')
+        self.warm(self.other.get_absolute_url(), third.get_absolute_url())
+        # the similar index reports the old and new neighbours of the retagged post
+        with patch('blog.similar.update_post', return_value={self.other.pk}):
+            with self.captureOnCommitCallbacks(execute=True):
+                self.post.tags.add('redis')
+        self.assertFalse(self.cached(self.other.get_absolute_url()))
+        self.assertTrue(self.cached(third.get_absolute_url()))
@@ -1,5 +1,7 @@
 from django.urls import path
 
+from core.page_cache import anonymous_page_cache
+
 from . import views
 from .feeds import LatestPostsFeed
 
@@ -11,7 +13,7 @@ urlpatterns = [
     # path('', views.PostListView.as_view(), name='post_list'),
     path('<int:year>/<int:month>/<int:day>/<slug:post>/', views.post_detail, name='post_detail'),
     path('<int:post_id>/share/', views.post_share, name='post_share'),
-    path('feed/', LatestPostsFeed(), name='post_feed'),
+    path('feed/', anonymous_page_cache(LatestPostsFeed()), name='post_feed'),
     path('search/', views.post_search, name='post_search'),
     path('like/', views.post_like, name='like_post')
 ]
@@ -1,9 +1,7 @@
-from django.contrib.postgres.search import SearchVector, SearchQuery, SearchRank
 from django.core.paginator import Paginator, EmptyPage, PageNotAnInteger
 from django.core.mail import send_mail
 from django.conf import settings
 from django.contrib import messages
-from django.db.models import Count
 from django.shortcuts import render, get_object_or_404, redirect
 from django.views.decorators.http import require_POST
 from django.views.generic import ListView
@@ -13,8 +11,11 @@ from taggit.models import Tag
 
 from actions.utils import create_action
 from common.decorators import ajax_required
+from core.page_cache import anonymous_page_cache
 from .forms import CommentForm, EmailPostForm, SearchForm
 from .models import Post
+from .search import search_posts
+from .similar import similar_posts as get_similar_posts
 
 from logging import getLogger
 logger = getLogger(__name__)
@@ -27,6 +28,7 @@ class PostListView(ListView):
     template_name = 'blog/post/list.html'
 
 
+@anonymous_page_cache
 def post_list(request, tag_slug=None):
     post_list = Post.published.all()
 
@@ -48,6 +50,7 @@ def post_list(request, tag_slug=None):
     return render(request, 'blog/post/list.html', {'page': page, 'posts': posts, 'tag': tag})
 
 
+@anonymous_page_cache
 def post_detail(request, year, month, day, post):
     post = get_object_or_404(Post,
                              status=Post.Status.PUBLISHED,
@@ -72,9 +75,7 @@ def post_detail(request, year, month, day, post):
         comment_form = CommentForm()
 
     # List of similar posts
-    post_tags_ids = post.tags.values_list('id', flat=True)
-    similar_posts = Post.published.filter(tags__in=post_tags_ids).exclude(id=post.id)
-    similar_posts = similar_posts.annotate(same_tags=Count('tags')).order_by('-same_tags', '-publish')[:4]
+    similar_posts = get_similar_posts(post, 4)
 
     return render(request,
                   'blog/post/detail.html',
@@ -87,24 +88,21 @@ def post_detail(request, year, month, day, post):
 def post_search(request):
     query = request.GET.get('query', '')
     results = []
+    total_results = 0
+    fuzzy = False
 
     if query:
         form = SearchForm(request.GET)
         if form.is_valid():
             query = form.cleaned_data['query']
-            search_vector = SearchVector('title', weight='A') + SearchVector('body', weight='B')
-            search_query = SearchQuery(query)
-            results = Post.published.annotate(
-                search=search_vector,
-                rank=SearchRank(search_vector, search_query)
-            ).filter(rank__gte=0.3).order_by('-rank')
+            results, total_results, fuzzy = search_posts(query)
     else:
         form = SearchForm()
 
     return render(
         request,
         'blog/post/search.html',
-        {'form': form, 'query': query, 'results': results}
+        {'form': form, 'query': query, 'results': results, 'total_results': total_results, 'fuzzy': fuzzy}
     )
 
 
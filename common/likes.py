@@ -0,0 +1,51 @@
+"""
+Denormalized like counters (``total_likes``) kept in step with ``users_like``.
+
+Changes are applied with ``F('total_likes') + n`` updates of that single
+column, so liking costs neither a COUNT nor a full-row save (and no save()
+side effects such as activity stream entries). Drift from writes that skip
+m2m_changed, e.g. cascading deletes, is repaired by ``manage.py reconcile_likes``.
+"""
+from collections import Counter
+
+from django.db.models import F
+
+
+def _removed_attr(through):
+    return f'_unliked_{through._meta.db_table}'
+
+
+def update_like_count(model, instance, action, reverse, pk_set, field='users_like'):
+    """
+    Apply one m2m_changed event of ``model.<field>`` to ``total_likes``.
+    Forward changes (``post.users_like.add(user)``) touch one row; reverse ones
+    (``user.blog_posts_liked.add(post)``) one row per pk.
+    """
+    m2m = getattr(model, field).field
+    through = m2m.remote_field.through
+    source, target = f'{m2m.m2m_field_name()}_id', f'{m2m.m2m_reverse_field_name()}_id'
+
+    if action in ('pre_remove', 'pre_clear'):
+        # remove() reports every requested pk and clear() none, so record the likes that really exist
+        rows = through.objects.filter(**{target if reverse else source: instance.pk})
+        if action == 'pre_remove':
+            rows = rows.filter(**{f'{source if reverse else target}__in': pk_set})
+        setattr(instance, _removed_attr(through), list(rows.values_list(source, flat=True)))
+        return
+
+    if action == 'post_add':
+        changes = Counter(pk_set) if reverse else Counter({instance.pk: len(pk_set)})
+    elif action in ('post_remove', 'post_clear'):
+        removed = instance.__dict__.pop(_removed_attr(through), [])
+        changes = Counter({pk: -count for pk, count in Counter(removed).items()})
+    else:
+        return
+
+    by_delta = {}
+    for pk, delta in changes.items():
+        if delta:
+            by_delta.setdefault(delta, []).append(pk)
+    for delta, pks in by_delta.items():
+        model.objects.filter(pk__in=pks).update(total_likes=F('total_likes') + delta)
+    if not reverse and changes[instance.pk]:
+        instance.total_likes += changes[instance.pk]
@@ -0,0 +1,65 @@
+"""
+Content-addressed media storage.
+
+Uploads are stored once per distinct content, under the SHA-256 of their
+bytes (``blobs/3f/3f9a…e1.png``), whatever name and ``upload_to`` they came
+with. Saving a file that is already stored writes nothing and returns the
+existing name, so rows sharing an image (e.g. every profile given the same
+lego icon) share one file, and everything derived from the file name
+(thumbnails, renditions) is produced once per blob.
+
+Blobs are never deleted with the rows that reference them. Files saved
+under a blob name (renditions of a blob) are stored as named, and files
+stored before this backend keep their names.
+"""
+import hashlib
+import os
+import re
+
+from django.core.files import File
+from django.core.files.storage import FileSystemStorage
+from django.utils.deconstruct import deconstructible
+
+BLOB_ROOT = 'blobs'
+BLOB_NAME = re.compile(rf'^{BLOB_ROOT}/[0-9a-f]{{2}}/[0-9a-f]{{64}}')
+
+
+def file_digest(content):
+    """SHA-256 hex digest of a Django File, read in chunks."""
+    digest = hashlib.sha256()
+    for chunk in content.chunks():
+        digest.update(chunk)
+    return digest.hexdigest()
+
+
+def is_blob(name):
+    """Whether ``name`` is a blob, or derived from one."""
+    return bool(name and BLOB_NAME.match(name))
+
+
+@deconstructible
+class ContentAddressedStorage(FileSystemStorage):
+    def __init__(self, *args, **kwargs):
+        # a concurrent save of the same blob writes the same bytes
+        kwargs.setdefault('allow_overwrite', True)
+        super().__init__(*args, **kwargs)
+
+    def blob_name(self, name, content):
+        digest = file_digest(content)
+        extension = os.path.splitext(name)[1].lower()
+        return f'{BLOB_ROOT}/{digest[:2]}/{digest}{extension}'
+
+    def save(self, name, content, max_length=None):
+        if name is None:
+            name = content.name
+        if not hasattr(content, 'chunks'):
+            content = File(content, name)
+        if is_blob(name):
+            return super().save(name, content, max_length=max_length)
+        name = self.blob_name(name, content)
+        if self.exists(name):
+            return name
+        return self._save(name, content)
+
+
+content_storage = ContentAddressedStorage()
@@ -0,0 +1,35 @@
+import time
+
+from django.core.management.base import BaseCommand, CommandError
+
+from core.weather import DAY, RESOLUTIONS
+from core.weather_store import RETENTION, backfill
+
+
+class Command(BaseCommand):
+    help = 'Backfill the downsampled weather history store from Prometheus.'
+
+    def add_arguments(self, parser):
+        parser.add_argument('--days', type=int, default=365,
+                            help='How far back to backfill (capped at each resolution\'s retention).')
+        parser.add_argument('--resolution', choices=list(RESOLUTIONS), action='append',
+                            help='Resolution to backfill; repeatable (default: all).')
+        parser.add_argument('--deadline', type=float, default=300,
+                            help='Seconds allowed per resolution.')
+
+    def handle(self, *args, **options):
+        end_time = time.time()
+        for resolution in options['resolution'] or RESOLUTIONS:
+            window = options['days'] * DAY
+            if RETENTION[resolution]:
+                window = min(window, RETENTION[resolution])
+            started = time.monotonic()
+            try:
+                written, missing = backfill(resolution, end_time - window, end_time, deadline=options['deadline'])
+            except Exception as e:
+                raise CommandError(f"Backfilling {resolution} failed: {e}")
+            message = f"{resolution}: stored {written} points in {time.monotonic() - started:.1f}s"
+            if missing:
+                self.stdout.write(self.style.WARNING(f"{message} ({missing} chunks missing, re-run to retry)"))
+            else:
+                self.stdout.write(self.style.SUCCESS(message))
@@ -0,0 +1,18 @@
+from django.core.management.base import BaseCommand
+
+import core.metrics_poller  # noqa: F401 (registers the endpoint caches)
+import core.weather  # noqa: F401
+from core.swr import registry
+
+
+class Command(BaseCommand):
+    help = 'Show TTLs and fresh/stale/miss counts for the stale-while-revalidate caches.'
+
+    def handle(self, *args, **options):
+        for key in sorted(registry):
+            stats = registry[key].stats()
+            self.stdout.write(
+                f"{key}: soft_ttl={stats['soft_ttl']}s hard_ttl={stats['hard_ttl']}s "
+                f"fresh={stats['fresh']} stale={stats['stale']} miss={stats['miss']} "
+                f"refreshes={stats['refreshes']} errors={stats['errors']}"
+            )
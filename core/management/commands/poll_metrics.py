@@ -0,0 +1,31 @@
+from django.core.management.base import BaseCommand, CommandError
+
+from core.metrics_poller import MetricsPoller
+
+
+class Command(BaseCommand):
+    help = 'Scrape Netdata on a fixed cadence and publish homelab metric snapshots (leader-elected via Redis).'
+
+    def add_arguments(self, parser):
+        parser.add_argument('--interval', type=float, default=None,
+                            help='Seconds between scrapes (default: METRICS_POLL_INTERVAL).')
+        parser.add_argument('--once', action='store_true',
+                            help='Publish a single snapshot and exit.')
+
+    def handle(self, *args, **options):
+        poller = MetricsPoller(interval=options['interval'])
+        if options['once']:
+            if not poller.elect():
+                raise CommandError('Another poller holds the leader lock (or Redis is unreachable)')
+            try:
+                metrics = poller.poll()
+            finally:
+                poller.resign()
+            if metrics is None:
+                raise CommandError('Netdata is unreachable, no snapshot published')
+            self.stdout.write(self.style.SUCCESS(f"Published metrics snapshot (status: {metrics['status']})"))
+            return
+        try:
+            poller.run_forever()
+        except KeyboardInterrupt:
+            self.stdout.write('Metrics poller stopped')
@@ -0,0 +1,25 @@
+from django.core.management.base import BaseCommand
+from django.db.models import Count, F
+
+from blog.models import Post
+from images.models import Image
+
+
+class Command(BaseCommand):
+    help = 'Repair total_likes counters of images and blog posts that drifted from their users_like rows.'
+
+    def add_arguments(self, parser):
+        parser.add_argument('--dry-run', action='store_true',
+                            help='Only report drifted counters.')
+
+    def handle(self, *args, **options):
+        for model in (Image, Post):
+            drifted = (model.objects.annotate(actual=Count('users_like'))
+                       .exclude(total_likes=F('actual'))
+                       .values_list('pk', 'total_likes', 'actual'))
+            fixed = 0
+            for pk, stored, actual in drifted:
+                self.stdout.write(f"{model._meta.label} {pk}: total_likes {stored} -> {actual}")
+                if not options['dry_run']:
+                    fixed += model.objects.filter(pk=pk).update(total_likes=actual)
+            self.stdout.write(self.style.SUCCESS(f"{model._meta.verbose_name_plural}: {fixed} counters repaired"))
@@ -0,0 +1,40 @@
+import threading
+import time
+
+from django.core.management.base import BaseCommand
+
+from core.weather import RESOLUTIONS
+from core.weather_store import record_latest
+
+
+class Command(BaseCommand):
+    help = 'Append the newest weather history buckets from Prometheus to the downsampled store.'
+
+    def add_arguments(self, parser):
+        parser.add_argument('--interval', type=float, default=300,
+                            help='Seconds between runs (default: 300).')
+        parser.add_argument('--once', action='store_true',
+                            help='Record a single time and exit.')
+
+    def record(self):
+        for resolution in RESOLUTIONS:
+            try:
+                written, missing = record_latest(resolution)
+            except Exception as e:
+                self.stderr.write(f"Recording {resolution} weather history failed: {e}")
+                continue
+            if written or missing:
+                self.stdout.write(f"{resolution}: stored {written} points ({missing} chunks missing)")
+
+    def handle(self, *args, **options):
+        if options['once']:
+            self.record()
+            return
+        stop_event = threading.Event()
+        try:
+            while not stop_event.is_set():
+                started = time.monotonic()
+                self.record()
+                stop_event.wait(max(0.0, options['interval'] - (time.monotonic() - started)))
+        except KeyboardInterrupt:
+            self.stdout.write('Weather history recorder stopped')
@@ -0,0 +1,123 @@
+"""
+Background Netdata poller for the homelab dashboard.
+
+A single leader, elected through a Redis lock, scrapes Netdata on a fixed
+cadence and publishes the snapshot to a stale-while-revalidate cache and to
+stream subscribers over Redis pub/sub. The metrics API only reads that
+snapshot, so one process talks to Netdata no matter how many workers or
+browser tabs are open.
+"""
+import json
+import logging
+import threading
+import time
+
+import redis
+from django.conf import settings
+from django.core.cache import cache
+
+from .netdata import collect_metrics
+from .redis_client import get_redis
+from .snapshots import remember
+from .swr import StaleWhileRevalidate
+
+logger = logging.getLogger(__name__)
+
+SNAPSHOT_KEY = 'netdata_metrics'
+BACKUP_KEY = 'netdata_metrics_backup'
+LEADER_LOCK_KEY = 'netdata_metrics:leader'
+# Redis pub/sub channel carrying each published snapshot to the SSE stream
+UPDATES_CHANNEL = 'netdata_metrics:updates'
+
+
+def build_snapshot():
+    """Scrape Netdata and version the result. Returns None if Netdata was unreachable."""
+    metrics = collect_metrics()
+    if metrics['status'] == 'unavailable':
+        return None
+    remember(SNAPSHOT_KEY, metrics)
+    metrics['published_at'] = time.time()
+    if not metrics['missing']:
+        cache.set(BACKUP_KEY, metrics, 3600)
+    return metrics
+
+
+def announce_snapshot(metrics):
+    """Push a newly stored snapshot to stream subscribers."""
+    try:
+        get_redis().publish(UPDATES_CHANNEL, json.dumps(metrics))
+    except redis.RedisError as e:
+        logger.error(f"Failed to publish metrics update: {e}")
+
+
+# Refreshes share the leader lock, so an on-demand refresh never races the poller
+metrics_snapshot = StaleWhileRevalidate(
+    SNAPSHOT_KEY,
+    build_snapshot,
+    soft_ttl=settings.METRICS_SNAPSHOT_MAX_AGE,
+    hard_ttl=settings.METRICS_SNAPSHOT_TTL,
+    lock_key=LEADER_LOCK_KEY,
+    lock_timeout=settings.METRICS_LEADER_TTL,
+    after_refresh=announce_snapshot,
+)
+
+
+class MetricsPoller:
+    """Scrapes Netdata while holding the leader lock."""
+
+    def __init__(self, interval=None, lock_timeout=None):
+        self.interval = interval or settings.METRICS_POLL_INTERVAL
+        self.lock_timeout = lock_timeout or settings.METRICS_LEADER_TTL
+        self.is_leader = False
+        self._lock = None
+
+    @property
+    def lock(self):
+        if self._lock is None:
+            self._lock = get_redis().lock(LEADER_LOCK_KEY, timeout=self.lock_timeout)
+        return self._lock
+
+    def elect(self):
+        """Renew leadership if held, otherwise try to take it. Returns True when leader."""
+        try:
+            if self.is_leader:
+                try:
+                    self.lock.reacquire()
+                except redis.exceptions.LockError:
+                    logger.warning("Lost metrics poller leadership")
+                    self.is_leader = False
+            if not self.is_leader:
+                self.is_leader = bool(self.lock.acquire(blocking=False))
+                if self.is_leader:
+                    logger.info("Acquired metrics poller leadership")
+        except redis.RedisError as e:
+            logger.error(f"Redis error during metrics poller election: {e}")
+            self.is_leader = False
+        return self.is_leader
+
+    def resign(self):
+        if self.is_leader:
+            try:
+                self.lock.release()
+            except redis.RedisError:
+                pass
+            self.is_leader = False
+
+    def poll(self):
+        """Scrape Netdata once and publish the result. Callers must hold the leader lock."""
+        return metrics_snapshot.produce()
+
+    def run_forever(self, stop_event=None):
+        stop_event = stop_event or threading.Event()
+        logger.info(f"Metrics poller started (interval {self.interval}s)")
+        try:
+            while not stop_event.is_set():
+                started = time.monotonic()
+                if self.elect():
+                    try:
+                        self.poll()
+                    except Exception as e:
+                        logger.error(f"Metrics poll failed: {e}")
+                stop_event.wait(max(0.0, self.interval - (time.monotonic() - started)))
+        finally:
+            self.resign()
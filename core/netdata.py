@@ -0,0 +1,321 @@
+"""
+Concurrent Netdata collector for the homelab dashboard.
+
+Every chart/context query is sent at once over a shared connection pool and
+the whole refresh is bounded by a single deadline, so the cost of a refresh is
+that of the slowest query rather than the sum of all of them.
+"""
+import logging
+import time
+from concurrent.futures import ThreadPoolExecutor, wait
+
+import requests
+from django.conf import settings
+from requests.adapters import HTTPAdapter
+
+logger = logging.getLogger(__name__)
+
+# Cluster constants
+CLUSTER_CORES = 18  # 3 nodes * 6 cores per node
+CLUSTER_RAM_GB = 48  # 3 nodes * 16GB per node
+
+SECTIONS = ('cpu', 'memory', 'pods', 'network', 'disk_io', 'uptime', 'temperature', 'deployments')
+
+# Per-node v1 charts, keyed by the metrics section they feed
+NODE_CHARTS = {
+    'cpu': 'system.cpu',
+    'memory': 'system.ram',
+    'disk_io': 'system.io',
+    'uptime': 'system.uptime',
+}
+
+# Deployment contexts in order of preference; all are queried at once
+DEPLOYMENT_CONTEXTS = [
+    'k8s_state.deployment_replicas',
+    'k8s_state.deployment_replicas_ready',
+    'k8s_state.deployment_condition',
+]
+
+_executor = None
+_session = None
+
+
+def _get_executor():
+    global _executor
+    if _executor is None:
+        _executor = ThreadPoolExecutor(max_workers=settings.NETDATA_MAX_WORKERS,
+                                       thread_name_prefix='netdata')
+    return _executor
+
+
+def _get_session():
+    """Shared session so queries reuse pooled keep-alive connections."""
+    global _session
+    if _session is None:
+        session = requests.Session()
+        adapter = HTTPAdapter(pool_connections=1, pool_maxsize=settings.NETDATA_MAX_WORKERS)
+        session.mount('http://', adapter)
+        session.mount('https://', adapter)
+        _session = session
+    return _session
+
+
+def _fetch(url, params, timeout):
+    """Run a single Netdata query, returning the decoded JSON or None on a non-200 reply."""
+    response = _get_session().get(url, params=params, timeout=timeout)
+    if response.status_code != 200:
+        logger.warning(f"Netdata returned status {response.status_code} for {params}")
+        return None
+    return response.json()
+
+
+def _build_queries(netdata_url, netdata_hosts):
+    """Return (section, node, url, params) for every query of a refresh."""
+    queries = []
+    for section, chart in NODE_CHARTS.items():
+        for node in netdata_hosts:
+            queries.append((section, node, f"{netdata_url}/api/v1/data",
+                            {'chart': chart, 'node': node, 'points': 1, 'after': -10}))
+    # Running pods across all nodes from the k8s_state collector
+    queries.append(('pods', None, f"{netdata_url}/api/v2/data",
+                    {'contexts': 'k8s_state.node_pods_phase', 'dimensions': 'running', 'points': 1}))
+    # net.net aggregates all interfaces; values are in kilobits/s, sent values are negative
+    queries.append(('network', None, f"{netdata_url}/api/v2/data",
+                    {'contexts': 'net.net', 'nodes': ','.join(netdata_hosts), 'points': 1, 'after': -10}))
+    queries.append(('temperature', None, f"{netdata_url}/api/v2/data",
+                    {'contexts': 'system.hw.sensor.temperature.input',
+                     'nodes': ','.join(netdata_hosts), 'points': 1}))
+    for context in DEPLOYMENT_CONTEXTS:
+        queries.append(('deployments', context, f"{netdata_url}/api/v2/data",
+                        {'contexts': context, 'points': 1}))
+    return queries
+
+
+def _latest_row(data):
+    """Return the most recent v1 data row, or None."""
+    if data and 'data' in data and len(data['data']) > 0:
+        return data['data'][0]
+    return None
+
+
+def _number(value):
+    return value if isinstance(value, (int, float)) else 0
+
+
+def _cpu_section(rows):
+    usages = []
+    for latest in rows:
+        if latest and len(latest) >= 2:
+            # Skip timestamp (index 0) and sum all CPU values including iowait
+            usages.append(sum(v for v in latest[1:] if isinstance(v, (int, float))))
+    if not usages:
+        return {'percentage': 0.0, 'total_cores': CLUSTER_CORES,
+                'description': 'CPU Utilization (no nodes available)'}
+    return {'percentage': round(sum(usages) / len(usages), 1), 'total_cores': CLUSTER_CORES,
+            'description': 'CPU Utilization'}
+
+
+def _memory_section(rows):
+    used_mb = 0
+    total_mb = 0
+    node_count = 0
+    for latest in rows:
+        # Memory data format: [time, free, used, cached, buffers] (in MB)
+        if latest and len(latest) >= 5:
+            free, used, cached, buffers = (_number(v) for v in latest[1:5])
+            used_mb += used
+            total_mb += used + free + cached + buffers
+            node_count += 1
+    if node_count == 0:
+        return {'total_gb': CLUSTER_RAM_GB, 'used_gb': 0.0, 'percentage': 0.0,
+                'description': 'Memory Utilization (no nodes available)'}
+    return {
+        'total_gb': round(total_mb / 1024, 1),
+        'used_gb': round(used_mb / 1024, 1),
+        'percentage': round((used_mb / total_mb) * 100, 1) if total_mb > 0 else 0,
+        'description': 'Memory Utilization',
+    }
+
+
+def _disk_io_section(rows):
+    read_kbps = 0
+    write_kbps = 0
+    node_count = 0
+    for latest in rows:
+        # Disk I/O format: [time, in (read), out (write)] in KiB/s
+        if latest and len(latest) >= 3:
+            read_kbps += abs(_number(latest[1]))
+            write_kbps += abs(_number(latest[2]))
+            node_count += 1
+    if node_count == 0:
+        return None
+    read_mbps = round(read_kbps / 1024, 2)
+    write_mbps = round(write_kbps / 1024, 2)
+    return {'read_mbps': read_mbps, 'write_mbps': write_mbps,
+            'total_mbps': round(read_mbps + write_mbps, 2), 'description': 'Disk I/O'}
+
+
+def _uptime_section(rows):
+    uptimes = [_number(latest[1]) for latest in rows if latest and len(latest) >= 2]
+    uptimes = [u for u in uptimes if u > 0]
+    if not uptimes:
+        return None
+    # Use minimum uptime (most recent reboot) for cluster uptime
+    uptime_seconds = min(uptimes)
+    days = int(uptime_seconds // 86400)
+    hours = int((uptime_seconds % 86400) // 3600)
+    minutes = int((uptime_seconds % 3600) // 60)
+    if days > 0:
+        uptime_str = f"{days}d {hours}h"
+    elif hours > 0:
+        uptime_str = f"{hours}h {minutes}m"
+    else:
+        uptime_str = f"{minutes}m"
+    return {'seconds': int(uptime_seconds), 'formatted': uptime_str, 'days': days, 'description': 'Uptime'}
+
+
+def _pods_section(data):
+    if data is None:
+        return {'count': 0, 'description': 'Pods Running (unavailable)'}
+    # API v2 returns summary.instances with per-node data; 'avg' is the current value
+    running_pods = 0
+    for instance in data.get('summary', {}).get('instances', []):
+        if 'sts' in instance and 'avg' in instance['sts']:
+            running_pods += int(instance['sts']['avg'])
+    return {'count': running_pods, 'description': 'Pods Running'}
+
+
+def _network_section(data):
+    # API v2 returns result.data with format [timestamp, [received, arp, pa], [sent, arp, pa]]
+    rows = (data or {}).get('result', {}).get('data', [])
+    if not rows:
+        return None
+    latest = rows[0]
+    received_kbps = 0
+    sent_kbps = 0
+    if len(latest) >= 3:
+        # received is positive, sent is negative in netdata
+        if isinstance(latest[1], list) and len(latest[1]) > 0:
+            received_kbps = abs(_number(latest[1][0]))
+        if isinstance(latest[2], list) and len(latest[2]) > 0:
+            sent_kbps = abs(_number(latest[2][0]))
+    # Convert kilobits/s to Mbps (1 Mbps = 1000 kbps)
+    received_mbps = round(received_kbps / 1000, 2)
+    sent_mbps = round(sent_kbps / 1000, 2)
+    return {'bandwidth_mbps': round(received_mbps + sent_mbps, 2), 'received_mbps': received_mbps,
+            'sent_mbps': sent_mbps, 'description': 'Network Utilization'}
+
+
+def _cpu_temperatures(entries):
+    temps = []
+    for entry in entries:
+        entry_id = entry.get('id', '').lower()
+        # Package temps are the overall CPU temp; also accept Core temps
+        if 'package' in entry_id or 'coretemp' in entry_id:
+            temp_val = entry.get('sts', {}).get('avg')
+            if isinstance(temp_val, (int, float)) and 20 < temp_val < 120:
+                temps.append(temp_val)
+    return temps
+
+
+def _temperature_section(data):
+    summary = (data or {}).get('summary', {})
+    temps = _cpu_temperatures(summary.get('dimensions', []))
+    if not temps:
+        temps = _cpu_temperatures(summary.get('instances', []))
+    if not temps:
+        return None
+    return {'avg_celsius': round(sum(temps) / len(temps), 1), 'max_celsius': round(max(temps), 1),
+            'node_count': len(temps), 'description': 'CPU Temperature'}
+
+
+def _deployments_section(responses):
+    """Use the first context (in preference order) that returned instances or dimensions."""
+    for context in DEPLOYMENT_CONTEXTS:
+        summary = (responses.get(context) or {}).get('summary', {})
+        # Count instances, or dimensions when there are none (each may be a deployment)
+        entries = summary.get('instances') or summary.get('dimensions') or []
+        if entries:
+            healthy = sum(1 for e in entries if e.get('sts', {}).get('avg', 0) > 0)
+            return {'total': len(entries), 'healthy': healthy, 'description': 'Deployments'}
+    return None
+
+
+def collect_metrics(netdata_url=None, netdata_hosts=None, timeout=None, deadline=None):
+    """
+    Query every Netdata chart/context concurrently and aggregate the cluster metrics.
+
+    The refresh waits at most ``deadline`` seconds. Sections whose queries did
+    not complete by then are left as None and listed in ``missing``.
+    """
+    netdata_url = netdata_url or settings.NETDATA_URL
+    netdata_hosts = netdata_hosts or settings.NETDATA_HOSTS
+    timeout = timeout or settings.NETDATA_TIMEOUT
+    deadline = deadline or settings.NETDATA_DEADLINE
+
+    started = time.monotonic()
+    executor = _get_executor()
+    futures = {
+        executor.submit(_fetch, url, params, timeout): (section, key)
+        for section, key, url, params in _build_queries(netdata_url, netdata_hosts)
+    }
+    done, not_done = wait(futures, timeout=deadline)
+    for future in not_done:
+        future.cancel()
+
+    metrics = {section: None for section in SECTIONS}
+    metrics.update({
+        'status': 'ok',
+        'errors': [],
+        'missing': [],
+        'nodes_count': len(netdata_hosts),
+        'reachable_nodes': 0,
+    })
+
+    # results[section][key] -> decoded JSON (or None on a non-200 reply)
+    results = {section: {} for section in SECTIONS}
+    for future in done:
+        section, key = futures[future]
+        try:
+            results[section][key] = future.result()
+        except Exception as e:
+            logger.warning(f"Failed to fetch {section} metrics ({key or 'cluster'}): {e}")
+            metrics['errors'].append(f"{section}: {type(e).__name__}")
+
+    reachable = set()
+    for section in NODE_CHARTS:
+        for node, data in results[section].items():
+            if data is not None:
+                reachable.add(node)
+    metrics['reachable_nodes'] = len(reachable)
+
+    answered = {section for section, key in (futures[f] for f in done if not f.exception())}
+    metrics['missing'] = [section for section in SECTIONS if section not in answered]
+
+    builders = {
+        'cpu': lambda r: _cpu_section(_latest_row(d) for d in r.values()),
+        'memory': lambda r: _memory_section(_latest_row(d) for d in r.values()),
+        'disk_io': lambda r: _disk_io_section(_latest_row(d) for d in r.values()),
+        'uptime': lambda r: _uptime_section(_latest_row(d) for d in r.values()),
+        'pods': lambda r: _pods_section(r.get(None)),
+        'network': lambda r: _network_section(r.get(None)),
+        'temperature': lambda r: _temperature_section(r.get(None)),
+        'deployments': _deployments_section,
+    }
+    for section, build in builders.items():
+        if section in metrics['missing']:
+            continue
+        try:
+            metrics[section] = build(results[section])
+        except Exception as e:
+            logger.warning(f"Failed to parse {section} metrics: {e}")
+            metrics['errors'].append(f"{section}: parse error")
+
+    if len(metrics['missing']) == len(SECTIONS):
+        metrics['status'] = 'unavailable'
+        metrics['error'] = 'Unable to connect to monitoring service'
+    elif metrics['missing']:
+        metrics['status'] = 'partial'
+        logger.warning(f"Netdata refresh hit {deadline}s deadline, missing: {metrics['missing']}")
+    logger.debug(f"Netdata refresh took {time.monotonic() - started:.2f}s")
+    return metrics
@@ -0,0 +1,150 @@
+"""
+Full-page cache for anonymous visitors.
+
+Views wrapped with ``anonymous_page_cache`` serve GET/HEAD requests of
+anonymous users from the cache. Entries are keyed by the URL path, the
+path's content version, and a hash of the host, query string and the
+request headers in VARY_HEADERS. ``purge(paths)`` bumps the version of each
+path, which invalidates every cached variant of that URL (all its pages and
+query strings) at once. ``blog.signals`` purges the URLs a Post, Comment or
+Tag write affects. Content shared by many pages, such as the blog sidebar,
+can be up to PAGE_CACHE_TTL seconds stale.
+
+Responses that set cookies, used a CSRF token, are not 200, or carry flash
+messages are never stored. Hits, misses and bypasses are counted per view
+in Redis for the page cache admin view. While Redis is unreachable every
+request bypasses the cache and purges are skipped (entries expire anyway).
+"""
+import hashlib
+import logging
+import time
+from functools import wraps
+
+import redis
+from django.conf import settings
+from django.contrib import messages
+from django.core.cache import cache
+from django.http import HttpResponse
+
+from .redis_client import get_redis
+
+logger = logging.getLogger(__name__)
+
+VARY_HEADERS = ('HTTP_X_REQUESTED_WITH', 'HTTP_ACCEPT_ENCODING')
+STATS_KEY = 'page_cache:stats'
+STAT_FIELDS = ('hit', 'miss', 'bypass')
+
+
+def _version_key(path):
+    return f'page_cache:version:{path}'
+
+
+def path_version(path):
+    version = cache.get(_version_key(path))
+    if version is None:
+        # time-based so a lost version key never revives entries of an old version
+        cache.add(_version_key(path), int(time.time()), None)
+        version = cache.get(_version_key(path), int(time.time()))
+    return version
+
+
+def purge(paths):
+    """Invalidate every cached variant of each URL path in ``paths``. Best effort: runs after commit."""
+    try:
+        for path in set(paths):
+            try:
+                cache.incr(_version_key(path))
+            except ValueError:
+                # nothing cached for it since the key was lost
+                cache.set(_version_key(path), int(time.time()), None)
+    except redis.RedisError as e:
+        logger.error(f"Redis error purging cached pages: {e}")
+
+
+def page_key(request):
+    path = request.path
+    variant = '|'.join([request.get_host(), request.scheme, request.META.get('QUERY_STRING', '')]
+                       + [request.META.get(header, '') for header in VARY_HEADERS])
+    digest = hashlib.sha1(variant.encode()).hexdigest()
+    return f'page_cache:{path}:{path_version(path)}:{digest}'
+
+
+def _count(view_name, outcome):
+    try:
+        get_redis().hincrby(STATS_KEY, f'{view_name}:{outcome}', 1)
+    except redis.RedisError:
+        pass
+
+
+def stats():
+    """``{view name: {'hit', 'miss', 'bypass', 'ratio'}}``, ratio of hits among cacheable requests."""
+    counts = get_redis().hgetall(STATS_KEY)
+    views = {}
+    for field, value in counts.items():
+        view_name, outcome = field.rsplit(':', 1)
+        views.setdefault(view_name, dict.fromkeys(STAT_FIELDS, 0))[outcome] = int(value)
+    for row in views.values():
+        lookups = row['hit'] + row['miss']
+        row['ratio'] = row['hit'] / lookups if lookups else None
+    return views
+
+
+def reset_stats():
+    get_redis().delete(STATS_KEY)
+
+
+def _cacheable(request, response):
+    return (response.status_code == 200
+            and not response.cookies
+            and not getattr(response, 'streaming', False)
+            and not request.META.get('CSRF_COOKIE_USED')
+            and 'private' not in response.get('Cache-Control', ''))
+
+
+def anonymous_page_cache(view):
+    """Serve ``view`` to anonymous GET/HEAD requests from the page cache."""
+    @wraps(view)
+    def wrapper(request, *args, **kwargs):
+        view_name = request.resolver_match.view_name if request.resolver_match else request.path
+        if (request.method not in ('GET', 'HEAD') or request.user.is_authenticated
+                or len(messages.get_messages(request))):
+            _count(view_name, 'bypass')
+            return view(request, *args, **kwargs)
+
+        try:
+            key = page_key(request)
+            entry = cache.get(key)
+        except redis.RedisError as e:
+            logger.error(f"Redis error reading page cache for {request.path}: {e}")
+            _count(view_name, 'bypass')
+            return view(request, *args, **kwargs)
+        if entry is not None:
+            _count(view_name, 'hit')
+            response = HttpResponse(entry['content'], status=entry['status'])
+            for header, value in entry['headers']:
+                response[header] = value
+            response['X-Page-Cache'] = 'HIT'
+            return response
+
+        response = view(request, *args, **kwargs)
+        if hasattr(response, 'render') and callable(response.render):
+            response = response.render()
+        if _cacheable(request, response):
+            entry = {
+                'content': response.content,
+                'status': response.status_code,
+                'headers': [(header, value) for header, value in response.items()
+                            if header.lower() not in ('set-cookie', 'vary')],
+            }
+            try:
+                cache.set(key, entry, settings.PAGE_CACHE_TTL)
+            except redis.RedisError as e:
+                logger.error(f"Redis error storing page cache for {request.path}: {e}")
+                _count(view_name, 'bypass')
+                return response
+            _count(view_name, 'miss')
+            response['X-Page-Cache'] = 'MISS'
+        else:
+            _count(view_name, 'bypass')
+        return response
+    return wrapper
@@ -0,0 +1,78 @@
+"""
+Versioned JSON snapshots for the polling APIs.
+
+Each published snapshot is stamped with a content hash that doubles as its
+ETag. Recent versions are kept briefly so clients can ask for only the
+fields that changed since the version they already hold (``?since=``).
+"""
+import hashlib
+import json
+
+from django.conf import settings
+from django.core.cache import cache
+from django.http import HttpResponseNotModified, JsonResponse
+from django.utils.cache import get_conditional_response
+
+# Fields that do not take part in the content version
+VOLATILE_FIELDS = ('version', 'published_at')
+
+
+def content_version(payload):
+    """Short, stable hash of a payload's content."""
+    content = {k: v for k, v in payload.items() if k not in VOLATILE_FIELDS}
+    encoded = json.dumps(content, sort_keys=True, separators=(',', ':'), default=str)
+    return hashlib.sha1(encoded.encode()).hexdigest()[:16]
+
+
+def stamp(payload):
+    payload['version'] = content_version(payload)
+    return payload
+
+
+def _history_key(namespace, version):
+    return f'{namespace}:history:{version}'
+
+
+def remember(namespace, payload):
+    """Stamp a payload and keep it around so later versions can be sent as deltas."""
+    stamp(payload)
+    cache.set(_history_key(namespace, payload['version']), payload, settings.SNAPSHOT_HISTORY_TTL)
+    return payload
+
+
+def diff(old, new):
+    """Top-level fields of ``new`` that differ from ``old``, plus removed fields."""
+    changed = {k: v for k, v in new.items() if k not in VOLATILE_FIELDS and old.get(k) != v}
+    removed = [k for k in old if k not in new and k not in VOLATILE_FIELDS]
+    return changed, removed
+
+
+def snapshot_response(request, namespace, payload):
+    """
+    Respond with a stamped snapshot, honouring If-None-Match and ``?since=<version>``.
+    The ETag is weak because volatile fields such as published_at are not versioned.
+    """
+    if 'version' not in payload:
+        stamp(payload)
+    version = payload['version']
+    etag = f'W/"{version}"'
+    since = request.GET.get('since')
+
+    not_modified = get_conditional_response(request, etag=etag)
+    if not_modified is None and since == version:
+        not_modified = HttpResponseNotModified()
+    if not_modified is not None:
+        not_modified['ETag'] = etag
+        return not_modified
+
+    body = payload
+    if since:
+        previous = cache.get(_history_key(namespace, since))
+        if previous is not None:
+            changed, removed = diff(previous, payload)
+            body = {'version': version, 'since': since, 'changed': changed, 'removed': removed}
+
+    response = JsonResponse(body)
+    response['ETag'] = etag
+    response['Cache-Control'] = 'no-cache'
+    return response
@@ -1,151 +1,178 @@
-// Fetch and display Netdata metrics
+// Last full snapshot received, used to apply ?since= deltas
+let lastMetrics = null;
+
+// Display a Netdata metrics snapshot
+function renderMetrics(data) {
+    lastMetrics = data;
+
+    if (data.status === 'unavailable' || data.status === 'error') {
+        let errorMsg = 'Metrics temporarily unavailable';
+        if (data.error) {
+            errorMsg += ': ' + data.error;
+        }
+        if (data.errors && data.errors.length > 0) {
+            errorMsg += ' (' + data.errors.join(', ') + ')';
+        }
+        document.getElementById('metrics-content').innerHTML = 
+            '<div class="metrics-error">' + errorMsg + '</div>';
+        return;
+    }
+    
+    let html = '<div class="metrics-grid">';
+
+    // Row 1: Utilization metrics
+    // CPU Utilization Card
+    if (data.cpu !== null) {
+        const cpuClass = data.cpu.percentage > 80 ? 'critical' : (data.cpu.percentage > 60 ? 'warning' : '');
+        html += `
+            <div class="metric-card">
+                <div class="metric-label">${data.cpu.description}</div>
+                <div class="metric-value">${data.cpu.percentage}%</div>
+                <div class="metric-detail">${data.cpu.total_cores} cores total</div>
+                <div class="metric-bar">
+                    <div class="metric-bar-fill ${cpuClass}" style="width: ${Math.min(data.cpu.percentage, 100)}%"></div>
+                </div>
+            </div>
+        `;
+    }
+
+    // Memory Utilization Card
+    if (data.memory !== null) {
+        const memoryClass = data.memory.percentage > 85 ? 'critical' : (data.memory.percentage > 70 ? 'warning' : '');
+        html += `
+            <div class="metric-card">
+                <div class="metric-label">${data.memory.description}</div>
+                <div class="metric-value">${data.memory.percentage}%</div>
+                <div class="metric-detail">${data.memory.used_gb} / ${data.memory.total_gb} GB</div>
+                <div class="metric-bar">
+                    <div class="metric-bar-fill ${memoryClass}" style="width: ${Math.min(data.memory.percentage, 100)}%"></div>
+                </div>
+            </div>
+        `;
+    }
+
+    // Disk I/O Card
+    if (data.disk_io !== null) {
+        html += `
+            <div class="metric-card">
+                <div class="metric-label">${data.disk_io.description}</div>
+                <div class="metric-value">${data.disk_io.total_mbps} MB/s</div>
+                <div class="metric-detail">↑ ${data.disk_io.write_mbps} · ↓ ${data.disk_io.read_mbps} MB/s</div>
+            </div>
+        `;
+    }
+
+    // Network Utilization Card
+    if (data.network !== null) {
+        let networkValue, networkDetail;
+        if (data.network.bandwidth_mbps !== undefined) {
+            networkValue = `${data.network.bandwidth_mbps} Mbps`;
+            networkDetail = `↑ ${data.network.sent_mbps} · ↓ ${data.network.received_mbps} Mbps`;
+        } else {
+            networkValue = 'N/A';
+            networkDetail = 'metrics unavailable';
+        }
+
+        html += `
+            <div class="metric-card">
+                <div class="metric-label">${data.network.description}</div>
+                <div class="metric-value">${networkValue}</div>
+                <div class="metric-detail">${networkDetail}</div>
+            </div>
+        `;
+    }
+
+    // Row 2: Other metrics (CPU Temp under CPU Util)
+    // CPU Temperature Card
+    if (data.temperature !== null) {
+        const tempClass = data.temperature.max_celsius > 80 ? 'critical' : (data.temperature.max_celsius > 65 ? 'warning' : '');
+        html += `
+            <div class="metric-card">
+                <div class="metric-label">${data.temperature.description}</div>
+                <div class="metric-value ${tempClass}">${data.temperature.avg_celsius}°C</div>
+                <div class="metric-detail">peak ${data.temperature.max_celsius}°C</div>
+            </div>
+        `;
+    }
+
+    // Pods Running Card
+    if (data.pods !== null) {
+        html += `
+            <div class="metric-card">
+                <div class="metric-label">${data.pods.description}</div>
+                <div class="metric-value">${data.pods.count}</div>
+                <div class="metric-detail">in cluster</div>
+            </div>
+        `;
+    }
+
+    // Deployments Card
+    if (data.deployments !== null) {
+        const deployClass = data.deployments.healthy < data.deployments.total ? 'warning' : '';
+        const deployDetail = data.deployments.healthy === data.deployments.total ? 'all healthy' : `${data.deployments.total - data.deployments.healthy} unhealthy`;
+        html += `
+            <div class="metric-card">
+                <div class="metric-label">${data.deployments.description}</div>
+                <div class="metric-value ${deployClass}">${data.deployments.healthy}/${data.deployments.total}</div>
+                <div class="metric-detail">${deployDetail}</div>
+            </div>
+        `;
+    }
+
+    // Cluster Uptime Card
+    if (data.uptime !== null) {
+        html += `
+            <div class="metric-card">
+                <div class="metric-label">${data.uptime.description}</div>
+                <div class="metric-value">${data.uptime.formatted}</div>
+                <div class="metric-detail">since last reboot</div>
+            </div>
+        `;
+    }
+
+    html += '</div>';
+    
+    // Add status indicator
+    let statusParts = [];
+    if (data.nodes_count) {
+        const reachable = data.reachable_nodes || 0;
+        statusParts.push(reachable + '/' + data.nodes_count + ' nodes');
+    }
+    if (data.errors && data.errors.length > 0) {
+        statusParts.push(data.errors.length + ' warnings');
+    }
+    if (data.missing && data.missing.length > 0) {
+        statusParts.push('delayed: ' + data.missing.join(', '));
+    }
+    if (statusParts.length > 0) {
+        html += '<div class="metrics-status">' + statusParts.join(' • ') + '</div>';
+    }
+    
+    document.getElementById('metrics-content').innerHTML = html;
+}
+
+// Merge a delta ({version, changed, removed}) into the last snapshot
+function applyMetricsDelta(delta) {
+    const data = Object.assign({}, lastMetrics, delta.changed);
+    delta.removed.forEach(key => delete data[key]);
+    data.version = delta.version;
+    return data;
+}
+
+// Fetch and display Netdata metrics, asking only for what changed
 function fetchMetrics() {
-    fetch('/api/metrics/')
-        .then(response => response.json())
+    const url = lastMetrics && lastMetrics.version
+        ? '/api/metrics/?since=' + encodeURIComponent(lastMetrics.version)
+        : '/api/metrics/';
+    fetch(url)
+        .then(response => {
+            // 304: the snapshot we already have is current
+            if (response.status === 304) return null;
+            return response.json();
+        })
         .then(data => {
-            console.log('Metrics response:', data);  // Debug logging
-            
-            if (data.status === 'unavailable' || data.status === 'error') {
-                let errorMsg = 'Metrics temporarily unavailable';
-                if (data.error) {
-                    errorMsg += ': ' + data.error;
-                }
-                if (data.errors && data.errors.length > 0) {
-                    errorMsg += ' (' + data.errors.join(', ') + ')';
-                }
-                document.getElementById('metrics-content').innerHTML = 
-                    '<div class="metrics-error">' + errorMsg + '</div>';
-                return;
-            }
-            
-            let html = '<div class="metrics-grid">';
-
-            // Row 1: Utilization metrics
-            // CPU Utilization Card
-            if (data.cpu !== null) {
-                const cpuClass = data.cpu.percentage > 80 ? 'critical' : (data.cpu.percentage > 60 ? 'warning' : '');
-                html += `
-                    <div class="metric-card">
-                        <div class="metric-label">${data.cpu.description}</div>
-                        <div class="metric-value">${data.cpu.percentage}%</div>
-                        <div class="metric-detail">${data.cpu.total_cores} cores total</div>
-                        <div class="metric-bar">
-                            <div class="metric-bar-fill ${cpuClass}" style="width: ${Math.min(data.cpu.percentage, 100)}%"></div>
-                        </div>
-                    </div>
-                `;
-            }
-
-            // Memory Utilization Card
-            if (data.memory !== null) {
-                const memoryClass = data.memory.percentage > 85 ? 'critical' : (data.memory.percentage > 70 ? 'warning' : '');
-                html += `
-                    <div class="metric-card">
-                        <div class="metric-label">${data.memory.description}</div>
-                        <div class="metric-value">${data.memory.percentage}%</div>
-                        <div class="metric-detail">${data.memory.used_gb} / ${data.memory.total_gb} GB</div>
-                        <div class="metric-bar">
-                            <div class="metric-bar-fill ${memoryClass}" style="width: ${Math.min(data.memory.percentage, 100)}%"></div>
-                        </div>
-                    </div>
-                `;
-            }
-
-            // Disk I/O Card
-            if (data.disk_io !== null) {
-                html += `
-                    <div class="metric-card">
-                        <div class="metric-label">${data.disk_io.description}</div>
-                        <div class="metric-value">${data.disk_io.total_mbps} MB/s</div>
-                        <div class="metric-detail">↑ ${data.disk_io.write_mbps} · ↓ ${data.disk_io.read_mbps} MB/s</div>
-                    </div>
-                `;
-            }
-
-            // Network Utilization Card
-            if (data.network !== null) {
-                let networkValue, networkDetail;
-                if (data.network.bandwidth_mbps !== undefined) {
-                    networkValue = `${data.network.bandwidth_mbps} Mbps`;
-                    networkDetail = `↑ ${data.network.sent_mbps} · ↓ ${data.network.received_mbps} Mbps`;
-                } else {
-                    networkValue = 'N/A';
-                    networkDetail = 'metrics unavailable';
-                }
-
-                html += `
-                    <div class="metric-card">
-                        <div class="metric-label">${data.network.description}</div>
-                        <div class="metric-value">${networkValue}</div>
-                        <div class="metric-detail">${networkDetail}</div>
-                    </div>
-                `;
-            }
-
-            // Row 2: Other metrics (CPU Temp under CPU Util)
-            // CPU Temperature Card
-            if (data.temperature !== null) {
-                const tempClass = data.temperature.max_celsius > 80 ? 'critical' : (data.temperature.max_celsius > 65 ? 'warning' : '');
-                html += `
-                    <div class="metric-card">
-                        <div class="metric-label">${data.temperature.description}</div>
-                        <div class="metric-value ${tempClass}">${data.temperature.avg_celsius}°C</div>
-                        <div class="metric-detail">peak ${data.temperature.max_celsius}°C</div>
-                    </div>
-                `;
-            }
-
-            // Pods Running Card
-            if (data.pods !== null) {
-                html += `
-                    <div class="metric-card">
-                        <div class="metric-label">${data.pods.description}</div>
-                        <div class="metric-value">${data.pods.count}</div>
-                        <div class="metric-detail">in cluster</div>
-                    </div>
-                `;
-            }
-
-            // Deployments Card
-            if (data.deployments !== null) {
-                const deployClass = data.deployments.healthy < data.deployments.total ? 'warning' : '';
-                const deployDetail = data.deployments.healthy === data.deployments.total ? 'all healthy' : `${data.deployments.total - data.deployments.healthy} unhealthy`;
-                html += `
-                    <div class="metric-card">
-                        <div class="metric-label">${data.deployments.description}</div>
-                        <div class="metric-value ${deployClass}">${data.deployments.healthy}/${data.deployments.total}</div>
-                        <div class="metric-detail">${deployDetail}</div>
-                    </div>
-                `;
-            }
-
-            // Cluster Uptime Card
-            if (data.uptime !== null) {
-                html += `
-                    <div class="metric-card">
-                        <div class="metric-label">${data.uptime.description}</div>
-                        <div class="metric-value">${data.uptime.formatted}</div>
-                        <div class="metric-detail">since last reboot</div>
-                    </div>
-                `;
-            }
-
-            html += '</div>';
-            
-            // Add status indicator
-            let statusParts = [];
-            if (data.nodes_count) {
-                const reachable = data.reachable_nodes || 0;
-                statusParts.push(reachable + '/' + data.nodes_count + ' nodes');
-            }
-            if (data.errors && data.errors.length > 0) {
-                statusParts.push(data.errors.length + ' warnings');
-            }
-            if (statusParts.length > 0) {
-                html += '<div class="metrics-status">' + statusParts.join(' • ') + '</div>';
-            }
-            
-            document.getElementById('metrics-content').innerHTML = html;
+            if (data === null) return;
+            renderMetrics(data.changed !== undefined ? applyMetricsDelta(data) : data);
         })
         .catch(error => {
             console.error('Error fetching metrics:', error);
@@ -154,8 +181,30 @@ function fetchMetrics() {
         });
 }
 
-// Initial fetch
-fetchMetrics();
+// Poll every second (used when the push stream is unavailable)
+function startPolling() {
+    setInterval(fetchMetrics, 1000);
+}
 
-// Refresh every second
-setInterval(fetchMetrics, 1000);
+// Subscribe to pushed snapshots; fall back to polling if the stream never opens
+function startStream() {
+    if (!window.EventSource) {
+        startPolling();
+        return;
+    }
+    let opened = false;
+    const source = new EventSource('/api/metrics/stream/');
+    source.onopen = () => { opened = true; };
+    source.onmessage = event => renderMetrics(JSON.parse(event.data));
+    source.onerror = () => {
+        // Once opened, EventSource reconnects on its own
+        if (!opened) {
+            source.close();
+            startPolling();
+        }
+    };
+}
+
+// Initial fetch, then live updates
+fetchMetrics();
+startStream();
@@ -198,11 +198,31 @@ function updateWindDisplay(data) {
     }
 }
 
+// Convert a history series to Chart.js points. Accepts the 'points' format
+// ([{time, value}]) and the columnar formats ({times, values}), where 'delta'
+// sends every timestamp after the first as a difference from the previous one.
+function toChartData(series, format, convert = value => value) {
+    if (Array.isArray(series)) {
+        return series.map(point => ({ x: point.time * 1000, y: convert(point.value) }));
+    }
+    const chartData = new Array(series.times.length);
+    let time = 0;
+    for (let i = 0; i < series.times.length; i++) {
+        time = format === 'delta' ? time + series.times[i] : series.times[i];
+        chartData[i] = { x: time * 1000, y: convert(series.values[i]) };
+    }
+    return chartData;
+}
+
 // Fetch historical data and render charts
 function fetchHistoricalData(period) {
     currentPeriod = period;
     
-    fetch(`/api/weather/history/?period=${period}`)
+    // No point sending more samples than the chart has pixels
+    const chart = document.getElementById('temperature-chart');
+    const maxPoints = Math.max(100, Math.round((chart ? chart.clientWidth : 800) * (window.devicePixelRatio || 1)));
+    
+    fetch(`/api/weather/history/?period=${period}&format=delta&max_points=${maxPoints}`)
         .then(response => response.json())
         .then(data => {
             if (data.status === 'error') {
@@ -210,25 +230,20 @@ function fetchHistoricalData(period) {
                 return;
             }
             
-            renderTemperatureChart(data.temperature, period, data.start_time, data.end_time);
-            renderWindChart(data.wind_speed, period, data.start_time, data.end_time);
+            renderTemperatureChart(toChartData(data.temperature, data.format, celsius => (celsius * 9/5) + 32),
+                period, data.start_time, data.end_time);
+            renderWindChart(toChartData(data.wind_speed, data.format), period, data.start_time, data.end_time);
         })
         .catch(error => {
             console.error('Error fetching historical data:', error);
         });
 }
 
-// Render temperature chart
-function renderTemperatureChart(data, period, startTime, endTime) {
+// Render temperature chart (chartData in °F, see toChartData)
+function renderTemperatureChart(chartData, period, startTime, endTime) {
     const ctx = document.getElementById('temperature-chart');
     if (!ctx) return;
     
-    // Convert data to Chart.js format
-    const chartData = data.map(point => ({
-        x: point.time * 1000, // Convert to milliseconds
-        y: (point.value * 9/5) + 32 // Convert C to F
-    }));
-    
     // Get accent color from CSS
     const accentColor = getComputedStyle(document.documentElement).getPropertyValue('--accent-primary').trim() || '#00d4ff';
     
@@ -274,16 +289,10 @@ function renderTemperatureChart(data, period, startTime, endTime) {
 }
 
 // Render wind speed chart
-function renderWindChart(data, period, startTime, endTime) {
+function renderWindChart(chartData, period, startTime, endTime) {
     const ctx = document.getElementById('wind-chart');
     if (!ctx) return;
     
-    // Convert data to Chart.js format
-    const chartData = data.map(point => ({
-        x: point.time * 1000,
-        y: point.value
-    }));
-    
     // Use a secondary color for wind
     const highlightColor = getComputedStyle(document.documentElement).getPropertyValue('--highlight').trim() || '#00ff88';
     
@@ -0,0 +1,133 @@
+"""
+Server-Sent Events stream of homelab metric snapshots.
+
+Served as a bare ASGI app (routed in wielandtech/asgi.py) so long-lived
+connections skip the Django middleware stack. Each process holds a single
+Redis pub/sub subscription and fans every published snapshot out to all of
+its connected clients.
+"""
+import asyncio
+import json
+import logging
+
+import redis.asyncio as aioredis
+from asgiref.sync import sync_to_async
+from django.conf import settings
+
+from .metrics_poller import UPDATES_CHANNEL, metrics_snapshot
+
+logger = logging.getLogger(__name__)
+
+STREAM_PATH = '/api/metrics/stream/'
+HEARTBEAT_SECONDS = 15
+
+
+class MetricsBroadcaster:
+    """Shares one Redis subscription between every stream client of this process."""
+
+    def __init__(self):
+        self.subscribers = set()
+        self._task = None
+
+    def subscribe(self):
+        # Slow clients only ever need the newest snapshot
+        queue = asyncio.Queue(maxsize=1)
+        self.subscribers.add(queue)
+        if self._task is None or self._task.done():
+            self._task = asyncio.get_running_loop().create_task(self._listen())
+        return queue
+
+    def unsubscribe(self, queue):
+        self.subscribers.discard(queue)
+        if not self.subscribers and self._task is not None:
+            self._task.cancel()
+            self._task = None
+
+    def dispatch(self, data):
+        for queue in self.subscribers:
+            if queue.full():
+                queue.get_nowait()
+            queue.put_nowait(data)
+
+    async def _listen(self):
+        while True:
+            try:
+                await self._relay()
+            except asyncio.CancelledError:
+                raise
+            except Exception as e:
+                logger.error(f"Metrics stream subscription failed: {e}")
+                await asyncio.sleep(1)
+
+    async def _relay(self):
+        client = aioredis.Redis(host=settings.REDIS_HOST, port=settings.REDIS_PORT,
+                                db=settings.REDIS_DB, decode_responses=True)
+        pubsub = client.pubsub()
+        try:
+            await pubsub.subscribe(UPDATES_CHANNEL)
+            while True:
+                message = await pubsub.get_message(ignore_subscribe_messages=True,
+                                                   timeout=settings.METRICS_SNAPSHOT_MAX_AGE)
+                if message is not None:
+                    self.dispatch(message['data'])
+                else:
+                    # Nothing published recently: no poller is running, so refresh
+                    # on demand (still single-flight through the leader lock)
+                    await sync_to_async(metrics_snapshot.refresh, thread_sensitive=False)()
+        finally:
+            await pubsub.aclose()
+            await client.aclose()
+
+
+broadcaster = MetricsBroadcaster()
+
+
+def format_event(data):
+    return f"data: {data}\n\n".encode()
+
+
+async def metrics_stream(scope, receive, send):
+    """ASGI handler pushing a metrics snapshot to the client on every refresh."""
+    if scope['method'] != 'GET':
+        await send({'type': 'http.response.start', 'status': 405, 'headers': [(b'allow', b'GET')]})
+        await send({'type': 'http.response.body', 'body': b''})
+        return
+
+    await send({
+        'type': 'http.response.start',
+        'status': 200,
+        'headers': [
+            (b'content-type', b'text/event-stream'),
+            (b'cache-control', b'no-cache'),
+            (b'x-accel-buffering', b'no'),
+        ],
+    })
+
+    queue = broadcaster.subscribe()
+    disconnected = asyncio.ensure_future(_wait_for_disconnect(receive))
+    try:
+        snapshot, age = await sync_to_async(metrics_snapshot.get_entry)()
+        if snapshot is not None and age <= metrics_snapshot.soft_ttl:
+            await send({'type': 'http.response.body', 'body': format_event(json.dumps(snapshot)),
+                        'more_body': True})
+        while not disconnected.done():
+            update = asyncio.ensure_future(queue.get())
+            await asyncio.wait({update, disconnected}, timeout=HEARTBEAT_SECONDS,
+                               return_when=asyncio.FIRST_COMPLETED)
+            if update.done():
+                body = format_event(update.result())
+            else:
+                update.cancel()
+                body = b': keepalive\n\n'
+            if not disconnected.done():
+                await send({'type': 'http.response.body', 'body': body, 'more_body': True})
+    finally:
+        disconnected.cancel()
+        broadcaster.unsubscribe(queue)
+
+
+async def _wait_for_disconnect(receive):
+    while True:
+        message = await receive()
+        if message['type'] == 'http.disconnect':
+            return
@@ -0,0 +1,142 @@
+"""
+Stale-while-revalidate cache for upstream-backed JSON endpoints.
+
+Readers get the last good value immediately. Once it is older than the soft
+TTL, at most one refresh per key runs across all workers (single-flight via a
+Redis lock) while everyone else keeps serving the stale value until the hard
+TTL expires it. Only a cold cache makes a reader wait on the upstream.
+"""
+import logging
+import threading
+import time
+from functools import wraps
+
+import redis
+from django.core.cache import cache
+
+from .redis_client import get_redis
+
+logger = logging.getLogger(__name__)
+
+# All caches by key, for stats reporting
+registry = {}
+
+STAT_FIELDS = ('fresh', 'stale', 'miss', 'refreshes', 'errors')
+
+
+class StaleWhileRevalidate:
+    def __init__(self, key, producer, soft_ttl, hard_ttl, lock_key=None, lock_timeout=30,
+                 after_refresh=None):
+        """
+        ``producer`` returns the new value, or None to keep the current one.
+        ``after_refresh`` is called with each newly stored value.
+        """
+        self.key = key
+        self.producer = producer
+        self.soft_ttl = soft_ttl
+        self.hard_ttl = hard_ttl
+        self.lock_key = lock_key or f'{key}:refresh'
+        self.lock_timeout = lock_timeout
+        self.after_refresh = after_refresh
+        registry[key] = self
+
+    @property
+    def stats_key(self):
+        return f'swr:stats:{self.key}'
+
+    def _count(self, field):
+        try:
+            get_redis().hincrby(self.stats_key, field, 1)
+        except redis.RedisError:
+            pass
+
+    def _lock(self):
+        # Not thread-local: a lock taken by a request may be released by the refresh thread
+        return get_redis().lock(self.lock_key, timeout=self.lock_timeout, thread_local=False)
+
+    def get_entry(self):
+        """Return ``(value, age_seconds)``, or ``(None, None)`` if nothing is cached."""
+        entry = cache.get(self.key)
+        if entry is None:
+            return None, None
+        return entry['value'], time.time() - entry['refreshed_at']
+
+    def set(self, value):
+        cache.set(self.key, {'value': value, 'refreshed_at': time.time()}, self.hard_ttl)
+
+    def produce(self):
+        """Run the producer and store its value. Callers must hold the refresh lock."""
+        try:
+            value = self.producer()
+        except Exception as e:
+            logger.error(f"Refresh of {self.key} failed: {e}")
+            self._count('errors')
+            return None
+        self._count('refreshes')
+        if value is not None:
+            self.set(value)
+            if self.after_refresh is not None:
+                self.after_refresh(value)
+        return value
+
+    def _acquire(self):
+        lock = self._lock()
+        try:
+            if lock.acquire(blocking=False):
+                return lock
+        except redis.RedisError as e:
+            logger.error(f"Redis error acquiring refresh lock for {self.key}: {e}")
+        return None
+
+    def _produce_and_release(self, lock):
+        try:
+            return self.produce()
+        finally:
+            try:
+                lock.release()
+            except redis.exceptions.LockError:
+                pass
+
+    def refresh(self):
+        """Refresh now unless another worker already is. Returns the new value or None."""
+        lock = self._acquire()
+        if lock is None:
+            return None
+        return self._produce_and_release(lock)
+
+    def refresh_in_background(self):
+        lock = self._acquire()
+        if lock is not None:
+            threading.Thread(target=self._produce_and_release, args=(lock,),
+                             name=f'swr-{self.key}', daemon=True).start()
+
+    def get(self):
+        value, age = self.get_entry()
+        if value is None:
+            self._count('miss')
+            return self.refresh()
+        if age <= self.soft_ttl:
+            self._count('fresh')
+        else:
+            self._count('stale')
+            self.refresh_in_background()
+        return value
+
+    def stats(self):
+        try:
+            counts = get_redis().hgetall(self.stats_key)
+        except redis.RedisError:
+            counts = {}
+        stats = {'key': self.key, 'soft_ttl': self.soft_ttl, 'hard_ttl': self.hard_ttl}
+        stats.update({field: int(counts.get(field, 0)) for field in STAT_FIELDS})
+        return stats
+
+    def __call__(self):
+        return self.get()
+
+
+def stale_while_revalidate(key, soft_ttl, hard_ttl, **kwargs):
+    """Decorate a zero-argument producer into a StaleWhileRevalidate cache."""
+    def decorator(producer):
+        return wraps(producer)(StaleWhileRevalidate(key, producer, soft_ttl, hard_ttl, **kwargs))
+    return decorator
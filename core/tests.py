@@ -1,11 +1,26 @@
-from django.test import TestCase, SimpleTestCase
+import time
+from array import array
+
+from django.test import TestCase, SimpleTestCase, override_settings
 from django.urls import reverse
 from unittest import mock
 from core.sitemaps import StaticViewSitemap
 from core.redis_client import RedisClient
 
+# Tests that use the cache get a private in-memory one, never the configured Redis
+LOCMEM_CACHES = {'default': {'BACKEND': 'django.core.cache.backends.locmem.LocMemCache'}}
+
 
+@override_settings(CACHES=LOCMEM_CACHES)
 class HomepageViewTests(TestCase):
+    def setUp(self):
+        from django.core.cache import cache
+        # the homepage is page-cached for anonymous visitors
+        cache.clear()
+        patcher = mock.patch('core.page_cache.get_redis')
+        patcher.start()
+        self.addCleanup(patcher.stop)
+
     def test_homepage_status_code(self):
         response = self.client.get(reverse('core:core_home'))
         self.assertEqual(response.status_code, 200)
@@ -44,3 +59,505 @@ class RedisClientTests(TestCase):
         mock_redis_class.assert_called_once_with(
             host='localhost', port=6379, db=0, decode_responses=True
         )
+
+
+class NetdataCollectorTests(SimpleTestCase):
+    hosts = ['node1', 'node2']
+
+    def fake_fetch(self, url, params, timeout):
+        chart = params.get('chart')
+        if chart == 'system.cpu':
+            return {'data': [[0, 10.0, 5.0]]}
+        if chart == 'system.ram':
+            return {'data': [[0, 1024, 2048, 512, 512]]}
+        if chart == 'system.uptime':
+            return {'data': [[0, 90000 if params['node'] == 'node1' else 3600]]}
+        if params.get('contexts') == 'k8s_state.node_pods_phase':
+            return {'summary': {'instances': [{'sts': {'avg': 7}}, {'sts': {'avg': 5}}]}}
+        if params.get('contexts') == 'k8s_state.deployment_replicas':
+            return {'summary': {'instances': []}}
+        if params.get('contexts') == 'k8s_state.deployment_replicas_ready':
+            return {'summary': {'instances': [{'sts': {'avg': 1}}, {'sts': {'avg': 0}}]}}
+        return None
+
+    def collect(self, fetch, deadline=2):
+        from core.netdata import collect_metrics
+        with mock.patch('core.netdata._fetch', side_effect=fetch):
+            return collect_metrics('http://netdata', self.hosts, timeout=1, deadline=deadline)
+
+    def test_aggregates_sections_across_nodes(self):
+        metrics = self.collect(self.fake_fetch)
+        self.assertEqual(metrics['status'], 'ok')
+        self.assertEqual(metrics['missing'], [])
+        self.assertEqual(metrics['cpu']['percentage'], 15.0)
+        self.assertEqual(metrics['memory']['used_gb'], 4.0)
+        self.assertEqual(metrics['uptime']['formatted'], '1h 0m')
+        self.assertEqual(metrics['pods']['count'], 12)
+        self.assertEqual(metrics['deployments'], {'total': 2, 'healthy': 1, 'description': 'Deployments'})
+        self.assertEqual(metrics['reachable_nodes'], 2)
+
+    def test_deadline_returns_partial_metrics(self):
+        def slow_temperature(url, params, timeout):
+            if params.get('contexts') == 'system.hw.sensor.temperature.input':
+                time.sleep(0.5)
+            return self.fake_fetch(url, params, timeout)
+
+        started = time.monotonic()
+        metrics = self.collect(slow_temperature, deadline=0.2)
+        self.assertLess(time.monotonic() - started, 0.5)
+        self.assertEqual(metrics['status'], 'partial')
+        self.assertEqual(metrics['missing'], ['temperature'])
+        self.assertIsNotNone(metrics['cpu'])
+
+    def test_unreachable_netdata(self):
+        def refuse(url, params, timeout):
+            raise ConnectionError('refused')
+
+        metrics = self.collect(refuse)
+        self.assertEqual(metrics['status'], 'unavailable')
+        self.assertEqual(metrics['reachable_nodes'], 0)
+
+
+@override_settings(CACHES=LOCMEM_CACHES)
+class MetricsPollerTests(TestCase):
+    def setUp(self):
+        from django.core.cache import cache
+        cache.clear()
+        redis = mock.MagicMock()
+        self.lock = redis.lock.return_value
+        for target in ('core.metrics_poller.get_redis', 'core.swr.get_redis'):
+            redis_patcher = mock.patch(target, return_value=redis)
+            redis_patcher.start()
+            self.addCleanup(redis_patcher.stop)
+        collect_patcher = mock.patch('core.metrics_poller.collect_metrics',
+                                     return_value={'status': 'ok', 'missing': [], 'cpu': {'percentage': 1.0}})
+        self.collect = collect_patcher.start()
+        self.addCleanup(collect_patcher.stop)
+
+    def test_view_serves_fresh_snapshot_without_scraping(self):
+        from core.metrics_poller import MetricsPoller
+        MetricsPoller().poll()
+        self.collect.reset_mock()
+        response = self.client.get(reverse('core:netdata_metrics'))
+        self.assertEqual(response.json()['cpu'], {'percentage': 1.0})
+        self.collect.assert_not_called()
+
+    def test_view_scrapes_on_demand_when_no_leader(self):
+        self.lock.acquire.return_value = True
+        response = self.client.get(reverse('core:netdata_metrics'))
+        self.assertEqual(response.json()['status'], 'ok')
+        self.collect.assert_called_once()
+        self.lock.release.assert_called_once()
+
+    def test_view_does_not_scrape_while_poller_leads(self):
+        self.lock.acquire.return_value = False
+        response = self.client.get(reverse('core:netdata_metrics'))
+        self.assertEqual(response.json()['status'], 'unavailable')
+        self.collect.assert_not_called()
+
+    def test_leader_renews_lock(self):
+        from core.metrics_poller import MetricsPoller
+        self.lock.acquire.return_value = True
+        poller = MetricsPoller()
+        self.assertTrue(poller.elect())
+        self.assertTrue(poller.elect())
+        self.lock.acquire.assert_called_once_with(blocking=False)
+        self.lock.reacquire.assert_called_once()
+
+    def test_poll_once_holds_the_lock_and_fails_without_netdata(self):
+        from django.core.management import CommandError, call_command
+        self.lock.acquire.return_value = True
+        self.collect.return_value = {'status': 'unavailable', 'missing': []}
+        with self.assertRaises(CommandError):
+            call_command('poll_metrics', '--once')
+        self.lock.acquire.assert_called_once_with(blocking=False)
+        self.lock.release.assert_called_once()
+        self.lock.acquire.return_value = False
+        with self.assertRaises(CommandError):
+            call_command('poll_metrics', '--once')
+
+
+class MetricsStreamTests(SimpleTestCase):
+    def test_broadcaster_keeps_only_newest_update_per_client(self):
+        import asyncio
+        from core.streaming import MetricsBroadcaster
+
+        async def scenario():
+            broadcaster = MetricsBroadcaster()
+            with mock.patch.object(MetricsBroadcaster, '_listen', new=mock.AsyncMock()):
+                first, second = broadcaster.subscribe(), broadcaster.subscribe()
+                broadcaster.dispatch('a')
+                broadcaster.dispatch('b')
+                return await first.get(), await second.get()
+
+        self.assertEqual(asyncio.run(scenario()), ('b', 'b'))
+
+    def test_stream_sends_snapshot_then_closes_on_disconnect(self):
+        import asyncio
+        from core import streaming
+
+        sent = []
+
+        async def receive():
+            await asyncio.sleep(0.05)
+            return {'type': 'http.disconnect'}
+
+        async def send(message):
+            sent.append(message)
+
+        snapshot = {'status': 'ok'}
+        with mock.patch.object(streaming.MetricsBroadcaster, '_listen', new=mock.AsyncMock()), \
+                mock.patch.object(streaming.metrics_snapshot, 'get_entry', return_value=(snapshot, 0)):
+            asyncio.run(streaming.metrics_stream({'type': 'http', 'method': 'GET'}, receive, send))
+
+        self.assertEqual(sent[0]['status'], 200)
+        self.assertIn((b'content-type', b'text/event-stream'), sent[0]['headers'])
+        self.assertTrue(sent[1]['body'].startswith(b'data: {"status": "ok"'))
+        self.assertEqual(streaming.broadcaster.subscribers, set())
+
+
+@override_settings(CACHES=LOCMEM_CACHES)
+class SnapshotResponseTests(SimpleTestCase):
+    def setUp(self):
+        from django.core.cache import cache
+        from django.test import RequestFactory
+        cache.clear()
+        self.factory = RequestFactory()
+
+    def test_version_ignores_volatile_fields(self):
+        from core.snapshots import content_version
+        self.assertEqual(content_version({'a': 1, 'published_at': 1}),
+                         content_version({'a': 1, 'published_at': 2}))
+        self.assertNotEqual(content_version({'a': 1}), content_version({'a': 2}))
+
+    def test_matching_etag_returns_304(self):
+        from core.snapshots import remember, snapshot_response
+        payload = remember('test', {'cpu': 1})
+        etag = snapshot_response(self.factory.get('/'), 'test', payload)['ETag']
+        response = snapshot_response(self.factory.get('/', HTTP_IF_NONE_MATCH=etag), 'test', payload)
+        self.assertEqual(response.status_code, 304)
+
+    def test_since_returns_only_changed_fields(self):
+        import json
+        from core.snapshots import remember, snapshot_response
+        old = remember('test', {'cpu': 1, 'memory': 2, 'pods': 3})
+        new = remember('test', {'cpu': 1, 'memory': 5})
+        response = snapshot_response(self.factory.get('/', {'since': old['version']}), 'test', new)
+        body = json.loads(response.content)
+        self.assertEqual(body['changed'], {'memory': 5})
+        self.assertEqual(body['removed'], ['pods'])
+        self.assertEqual(body['version'], new['version'])
+
+        current = snapshot_response(self.factory.get('/', {'since': new['version']}), 'test', new)
+        self.assertEqual(current.status_code, 304)
+
+    def test_unknown_since_returns_full_snapshot(self):
+        import json
+        from core.snapshots import remember, snapshot_response
+        payload = remember('test', {'cpu': 1})
+        response = snapshot_response(self.factory.get('/', {'since': 'gone'}), 'test', payload)
+        self.assertEqual(json.loads(response.content)['cpu'], 1)
+
+
+@override_settings(CACHES=LOCMEM_CACHES)
+class StaleWhileRevalidateTests(SimpleTestCase):
+    def setUp(self):
+        from django.core.cache import cache
+        cache.clear()
+        redis_patcher = mock.patch('core.swr.get_redis')
+        self.redis = redis_patcher.start().return_value
+        self.addCleanup(redis_patcher.stop)
+        self.producer = mock.Mock(side_effect=['v1', 'v2'])
+
+    def make_cache(self):
+        from core.swr import StaleWhileRevalidate
+        return StaleWhileRevalidate('test_swr', self.producer, soft_ttl=60, hard_ttl=600)
+
+    def test_miss_refreshes_then_serves_fresh(self):
+        swr = self.make_cache()
+        self.assertEqual(swr.get(), 'v1')
+        self.assertEqual(swr.get(), 'v1')
+        self.producer.assert_called_once()
+
+    def test_stale_value_served_while_single_refresh_runs(self):
+        swr = self.make_cache()
+        swr.set('old')
+        with mock.patch('core.swr.time.time', return_value=time.time() + 120), \
+                mock.patch('core.swr.threading.Thread') as thread:
+            self.assertEqual(swr.get(), 'old')
+        thread.return_value.start.assert_called_once()
+        self.redis.lock.assert_called_with('test_swr:refresh', timeout=30, thread_local=False)
+
+    def test_no_refresh_while_another_worker_holds_lock(self):
+        self.redis.lock.return_value.acquire.return_value = False
+        swr = self.make_cache()
+        self.assertIsNone(swr.get())
+        self.producer.assert_not_called()
+
+    def test_producer_returning_none_keeps_previous_value(self):
+        swr = self.make_cache()
+        swr.set('good')
+        self.producer.side_effect = [None]
+        swr.refresh()
+        self.assertEqual(swr.get_entry()[0], 'good')
+
+
+@override_settings(CACHES=LOCMEM_CACHES)
+class CurrentWeatherTests(SimpleTestCase):
+    series = [
+        {'metric': {'__name__': 'homeassistant_sensor_temperature_celsius',
+                    'entity': 'sensor.norton_shores_weather_station_temperature'}, 'value': [0, '20']},
+        {'metric': {'__name__': 'homeassistant_sensor_wind_direction_u0xb0',
+                    'entity': 'sensor.norton_shores_weather_station_wind_direction'}, 'value': [0, '90']},
+        {'metric': {'__name__': 'homeassistant_sensor_humidity_percent',
+                    'entity': 'sensor.norton_shores_outdoor_humidity'}, 'value': [0, '55.55']},
+        {'metric': {'__name__': 'homeassistant_sensor_pressure_inhg',
+                    'entity': 'sensor.norton_shores_weather_station_pressure'}, 'value': [0, '30']},
+        {'metric': {'__name__': 'homeassistant_sensor_temperature_celsius',
+                    'entity': 'sensor.norton_shores_indoor_temperature'}, 'value': [0, '25']},
+    ]
+
+    def test_match_sensors_applies_fallback_patterns(self):
+        from core.weather import match_sensors
+        values = match_sensors(self.series)
+        self.assertEqual(values['temperature'], 20.0)
+        self.assertEqual(values['humidity'], 55.55)
+        self.assertEqual(values['pressure'], 30.0)
+        self.assertNotIn('uv_index', values)
+
+    def test_build_conditions(self):
+        from core.weather import build_conditions, match_sensors
+        weather = build_conditions(match_sensors(self.series))
+        self.assertEqual(weather['temperature_f'], 68.0)
+        self.assertEqual(weather['wind_direction_cardinal'], 'E')
+        self.assertEqual(weather['pressure_hpa'], 1015.9)
+        self.assertEqual(weather['available_metrics'], ['temperature', 'wind_direction', 'humidity', 'pressure'])
+
+    @mock.patch('core.swr.get_redis')
+    def test_weather_view_uses_single_query(self, mock_redis):
+        from django.core.cache import cache
+        cache.clear()
+        response = mock.Mock(status_code=200)
+        response.json.return_value = {'status': 'success', 'data': {'result': self.series}}
+        with mock.patch('core.weather.requests.get', return_value=response) as get:
+            body = self.client.get(reverse('core:weather_data')).json()
+        get.assert_called_once()
+        self.assertEqual(body['temperature_c'], 20.0)
+        self.assertIn('version', body)
+
+
+class WeatherHistoryTests(SimpleTestCase):
+    def test_chunks_cover_whole_period(self):
+        from core.weather import DAY, history_chunks
+        chunks = history_chunks(0, 365 * DAY, 14 * DAY)
+        self.assertEqual(len(chunks), 27)
+        self.assertEqual(chunks[0][0], 0)
+        self.assertEqual(chunks[-1][1], 365 * DAY)
+
+    def test_merges_chunks_in_order_and_dedupes(self):
+        from core import weather
+
+        def fake_range(query, start, end, step, timeout):
+            return array('q', [start, end]), array('d', [1.0, 2.0])
+
+        with mock.patch.object(weather, 'query_range', side_effect=fake_range):
+            history = weather.fetch_history('30d', end_time=30 * weather.DAY)
+        self.assertEqual(history['status'], 'ok')
+        times = list(history['temperature'][0])
+        self.assertEqual(times, sorted(set(times)))
+        self.assertEqual(len(times), 6)
+
+    @mock.patch('core.weather.time.sleep')
+    def test_retries_failed_chunk(self, sleep):
+        import requests
+        from core import weather
+        calls = []
+
+        def flaky_range(query, start, end, step, timeout):
+            calls.append(query)
+            if 'humidity' in query and calls.count(query) == 1:
+                raise requests.exceptions.ConnectionError('reset')
+            return array('q', [start]), array('d', [1.0])
+
+        with mock.patch.object(weather, 'query_range', side_effect=flaky_range):
+            history = weather.fetch_history('24h')
+        self.assertEqual(history['status'], 'ok')
+        self.assertEqual(len(history['humidity'][0]), 1)
+
+    @mock.patch('core.weather.time.sleep')
+    def test_partial_and_error_status(self, sleep):
+        import requests
+        from core import weather
+
+        def pressure_down(query, start, end, step, timeout):
+            if 'pressure' in query:
+                raise requests.exceptions.Timeout()
+            return array('q', [start]), array('d', [1.0])
+
+        with mock.patch.object(weather, 'query_range', side_effect=pressure_down):
+            history = weather.fetch_history('7d')
+        self.assertEqual(history['status'], 'partial')
+        # 7 days at 1h resolution are fetched as two 6-day chunks
+        self.assertEqual(history['missing_chunks'], 2)
+
+        with mock.patch.object(weather, 'query_range', side_effect=requests.exceptions.Timeout()):
+            history = weather.fetch_history('7d')
+        self.assertEqual(history['status'], 'error')
+
+
+class WeatherStoreTests(SimpleTestCase):
+    def setUp(self):
+        patcher = mock.patch('core.weather_store.get_redis')
+        self.redis = patcher.start().return_value
+        self.pipe = self.redis.pipeline.return_value
+        self.redis.hgetall.return_value = {}
+        self.addCleanup(patcher.stop)
+
+    def test_store_replaces_fetched_chunks_only(self):
+        from core.weather_store import store_chunks
+        chunks = [(0, 100), (100, 200)]
+        results = {'temperature': [(array('q', [0]), array('d', [1.5])), None]}
+        with mock.patch('core.weather_store.HISTORY_QUERIES', {'temperature': ''}):
+            written = store_chunks('6h', chunks, results)
+        self.assertEqual(written, 1)
+        self.pipe.zremrangebyscore.assert_called_once_with('weather:history:6h:temperature', 0, 100)
+        self.pipe.zadd.assert_called_once_with('weather:history:6h:temperature', {'0:1.5': 0})
+        # a failed chunk: not checked through
+        self.pipe.hset.assert_not_called()
+
+    def test_fresh_store_skips_prometheus(self):
+        from core import weather_store
+        end = 10 * 3600
+        self.pipe.execute.return_value = [[f'{end}:1.0'], [f'{end - 3600}:2.0'], [], []]
+        with mock.patch.object(weather_store, 'fetch_ranges') as fetch:
+            history = weather_store.load_history('7d', end_time=end)
+        fetch.assert_not_called()
+        self.assertEqual(history['temperature'], (array('q', [end]), array('d', [1.0])))
+        self.assertEqual(list(history['pressure'][0]), [])
+
+    def test_stale_store_fetches_only_tail(self):
+        from core import weather_store
+        end = 10 * 3600
+        self.pipe.execute.return_value = [[f'{end - 3 * 3600}:1.0'], [], [], []]
+        tail = {series: [weather_store.empty_series()] for series in weather_store.HISTORY_QUERIES}
+        tail['temperature'] = [(array('q', [end]), array('d', [3.0]))]
+        with mock.patch.object(weather_store, 'fetch_ranges', return_value=([(end - 2 * 3600, end)], tail)) as fetch:
+            history = weather_store.load_history('7d', end_time=end)
+        self.assertEqual(fetch.call_args[0][:2], (end - 2 * 3600, end))
+        self.assertEqual(list(history['temperature'][0]), [end - 3 * 3600, end])
+        # the tail is written back, and every fetched series marked checked
+        self.pipe.zadd.assert_called_once_with('weather:history:1h:temperature', {f'{end}:3.0': end})
+        self.pipe.hset.assert_any_call('weather:history:checked:1h', 'pressure', end)
+
+    def test_series_that_stopped_reporting_is_not_refetched(self):
+        from core import weather_store
+        end = 10 * 3600
+        # wind speed's last point is old, but it was fetched through the current bucket
+        self.pipe.execute.return_value = [[f'{end}:1.0'], [f'{end - 5 * 3600}:2.0'], [], []]
+        self.redis.hgetall.return_value = {'wind_speed': str(end)}
+        with mock.patch.object(weather_store, 'fetch_ranges') as fetch:
+            weather_store.load_history('7d', end_time=end)
+        fetch.assert_not_called()
+
+
+class HistoryEncodingTests(SimpleTestCase):
+    series = (array('q', [100, 400, 700]), array('d', [1.5, 2.0, 2.5]))
+
+    def test_formats(self):
+        from core.weather import encode_series
+        self.assertEqual(encode_series(self.series, 'points'),
+                         [{'time': 100, 'value': 1.5}, {'time': 400, 'value': 2.0}, {'time': 700, 'value': 2.5}])
+        self.assertEqual(encode_series(self.series, 'columns'), {'times': [100, 400, 700], 'values': [1.5, 2.0, 2.5]})
+        self.assertEqual(encode_series(self.series, 'delta'), {'times': [100, 300, 300], 'values': [1.5, 2.0, 2.5]})
+        self.assertEqual(encode_series((array('q'), array('d')), 'delta'), {'times': [], 'values': []})
+
+    def test_view_selects_format(self):
+        history = {'status': 'ok', 'period': '24h', 'temperature': self.series}
+        with mock.patch('core.views.load_history', side_effect=lambda period: dict(history)):
+            body = self.client.get(reverse('core:weather_history'), {'format': 'delta'}).json()
+            self.assertEqual(body['format'], 'delta')
+            self.assertEqual(body['temperature']['times'], [100, 300, 300])
+            body = self.client.get(reverse('core:weather_history'), {'format': 'bogus'}).json()
+            self.assertEqual(body['temperature'][0], {'time': 100, 'value': 1.5})
+
+
+class LttbDownsampleTests(SimpleTestCase):
+    def test_keeps_endpoints_and_spikes(self):
+        from core.weather import downsample_lttb
+        times = array('q', range(0, 1000 * 60, 60))
+        values = array('d', [20.0] * 1000)
+        values[500] = 35.0
+        kept_times, kept_values = downsample_lttb((times, values), 50)
+        self.assertEqual(len(kept_times), 50)
+        self.assertEqual((kept_times[0], kept_times[-1]), (times[0], times[-1]))
+        self.assertIn(35.0, kept_values)
+        self.assertEqual(list(kept_times), sorted(kept_times))
+
+    def test_short_series_untouched(self):
+        from core.weather import downsample_lttb
+        series = (array('q', [1, 2, 3]), array('d', [1.0, 2.0, 3.0]))
+        self.assertIs(downsample_lttb(series, 10), series)
+        self.assertIs(downsample_lttb(series, 0), series)
+
+
+@override_settings(CACHES=LOCMEM_CACHES)
+class PageCacheTests(TestCase):
+    def setUp(self):
+        from django.core.cache import cache
+        cache.clear()
+        patcher = mock.patch('core.page_cache.get_redis')
+        self.redis = patcher.start().return_value
+        self.addCleanup(patcher.stop)
+
+    def test_anonymous_pages_are_cached_until_purged(self):
+        from .page_cache import purge
+        url = reverse('core:core_home')
+        self.assertEqual(self.client.get(url)['X-Page-Cache'], 'MISS')
+        response = self.client.get(url)
+        self.assertEqual(response['X-Page-Cache'], 'HIT')
+        self.assertTemplateNotUsed(response, 'core/index.html')
+        # other query strings and headers are separate variants
+        self.assertEqual(self.client.get(url, {'a': 1})['X-Page-Cache'], 'MISS')
+        self.assertEqual(self.client.get(url, HTTP_X_REQUESTED_WITH='XMLHttpRequest')['X-Page-Cache'], 'MISS')
+        purge([url])
+        self.assertEqual(self.client.get(url)['X-Page-Cache'], 'MISS')
+        self.assertEqual(self.client.get(url, {'a': 1})['X-Page-Cache'], 'MISS')
+        self.redis.hincrby.assert_any_call('page_cache:stats', 'core:core_home:hit', 1)
+
+    def test_authenticated_users_bypass_the_cache(self):
+        from django.contrib.auth import get_user_model
+        User = get_user_model()
+        User.objects.create_user(username='john', password='12345')
+        url = reverse('core:core_home')
+        self.client.get(url)
+        self.client.login(username='john', password='12345')
+        response = self.client.get(url)
+        self.assertNotIn('X-Page-Cache', response)
+        self.redis.hincrby.assert_called_with('page_cache:stats', 'core:core_home:bypass', 1)
+
+    def test_stats_admin_view(self):
+        from django.contrib.auth import get_user_model
+        User = get_user_model()
+        User.objects.create_user(username='admin', password='12345', is_staff=True)
+        self.client.login(username='admin', password='12345')
+        self.redis.hgetall.return_value = {'blog:post_detail:hit': '3', 'blog:post_detail:miss': '1',
+                                           'core:core_home:bypass': '2'}
+        # admin URLs are only served to internal hosts
+        response = self.client.get(reverse('core:page_cache_stats'), HTTP_HOST='localhost')
+        self.assertContains(response, 'blog:post_detail')
+        self.assertContains(response, '75%')
+        self.assertEqual(response.context['totals'], {'hit': 3, 'miss': 1, 'bypass': 2, 'ratio': 0.75})
+        self.client.post(reverse('core:page_cache_stats'), HTTP_HOST='localhost')
+        self.redis.delete.assert_called_once_with('page_cache:stats')
+
+    def test_redis_outage_bypasses_the_cache(self):
+        import redis
+        from .page_cache import purge
+        url = reverse('core:core_home')
+        with mock.patch('core.page_cache.cache') as cache:
+            cache.get.side_effect = cache.incr.side_effect = redis.ConnectionError('down')
+            response = self.client.get(url)
+            purge([url])
+        self.assertEqual(response.status_code, 200)
+        self.assertNotIn('X-Page-Cache', response)
+        self.redis.hincrby.assert_called_with('page_cache:stats', 'core:core_home:bypass', 1)
@@ -12,4 +12,5 @@ urlpatterns = [
     path('api/weather/', views.get_weather_data, name='weather_data'),
     path('api/weather/history/', views.get_weather_history, name='weather_history'),
     path('maintenance/', views.maintenance, name='maintenance'),
+    path('admin/page-cache/', views.page_cache_stats, name='page_cache_stats'),
 ]
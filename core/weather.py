@@ -0,0 +1,391 @@
+"""
+Weather station data from Prometheus (Home Assistant metrics).
+
+Current conditions are read with a single batched instant query for every
+Norton Shores sensor; the per-field fallback patterns are then matched in
+Python over that one result set. History ranges are split into chunks
+(Prometheus truncates long ranges) that are fetched in parallel. History
+series are handled as ``(times, values)`` column arrays; per-point dicts are
+only built for the legacy ``points`` response format.
+"""
+import logging
+import math
+import operator
+import re
+import time
+from array import array
+from concurrent.futures import ThreadPoolExecutor, wait
+
+import requests
+from django.conf import settings
+
+from .snapshots import remember
+from .swr import stale_while_revalidate
+
+logger = logging.getLogger(__name__)
+
+STATION = 'sensor.norton_shores_weather_station'
+
+# Every Home Assistant sensor series of the station, fetched in one round trip
+CURRENT_CONDITIONS_QUERY = '{__name__=~"homeassistant_sensor_.*", entity=~"sensor.norton_shores.*"}'
+
+# Candidate (metric name, entity regex) pairs per field, in order of preference.
+# Regexes are fully anchored, as PromQL label matchers are.
+SENSOR_PATTERNS = {
+    'temperature': [('homeassistant_sensor_temperature_celsius', re.escape(f'{STATION}_temperature'))],
+    'wind_speed': [('homeassistant_sensor_wind_speed_mph', re.escape(f'{STATION}_wind_speed'))],
+    # u0xb0 is the encoded degree symbol
+    'wind_direction': [('homeassistant_sensor_wind_direction_u0xb0', re.escape(f'{STATION}_wind_direction'))],
+    'humidity': [
+        ('homeassistant_sensor_humidity_percent', re.escape(f'{STATION}_humidity')),
+        ('homeassistant_sensor_humidity_percent', r'sensor\.norton_shores.*humidity.*'),
+    ],
+    'pressure': [
+        ('homeassistant_sensor_pressure_hpa', re.escape(f'{STATION}_pressure')),
+        ('homeassistant_sensor_pressure_hpa', r'sensor\.norton_shores.*pressure.*'),
+        ('homeassistant_sensor_pressure_inhg', r'sensor\.norton_shores.*pressure.*'),
+    ],
+    'uv_index': [
+        ('homeassistant_sensor_uv_index', re.escape(f'{STATION}_uv_index')),
+        ('homeassistant_sensor_uv_index', r'sensor\.norton_shores.*uv.*'),
+    ],
+    'precipitation': [
+        ('homeassistant_sensor_precipitation_mm', r'sensor\.norton_shores.*rain.*'),
+        ('homeassistant_sensor_precipitation_in', r'sensor\.norton_shores.*rain.*'),
+    ],
+}
+
+
+def get_cardinal_direction(degrees):
+    """Convert degrees to cardinal direction (N, NE, E, etc.)"""
+    directions = ['N', 'NNE', 'NE', 'ENE', 'E', 'ESE', 'SE', 'SSE',
+                  'S', 'SSW', 'SW', 'WSW', 'W', 'WNW', 'NW', 'NNW']
+    index = round(degrees / 22.5) % 16
+    return directions[index]
+
+
+def query_instant(query, timeout):
+    """Run a Prometheus instant query and return its result series (empty on failure)."""
+    response = requests.get(
+        f"{settings.PROMETHEUS_URL}/api/v1/query",
+        params={'query': query},
+        timeout=timeout
+    )
+    if response.status_code != 200:
+        logger.warning(f"Prometheus returned status {response.status_code} for {query}")
+        return []
+    data = response.json()
+    if data.get('status') != 'success':
+        return []
+    return data.get('data', {}).get('result', [])
+
+
+def match_sensors(series):
+    """Demultiplex a batched result into ``{field: value}`` using SENSOR_PATTERNS."""
+    # (metric name, entity) -> latest value; sorted so regex fallbacks pick deterministically
+    by_series = {}
+    for s in sorted(series, key=lambda s: s['metric'].get('entity', '')):
+        key = (s['metric'].get('__name__'), s['metric'].get('entity', ''))
+        by_series.setdefault(key, float(s['value'][1]))
+
+    values = {}
+    for field, candidates in SENSOR_PATTERNS.items():
+        for name, entity_pattern in candidates:
+            pattern = re.compile(entity_pattern)
+            match = next((value for (series_name, entity), value in by_series.items()
+                          if series_name == name and pattern.fullmatch(entity)), None)
+            if match is not None:
+                values[field] = match
+                break
+    return values
+
+
+def build_conditions(values):
+    """Shape matched sensor values into the /api/weather/ payload."""
+    weather = {
+        'status': 'ok',
+        'available_metrics': []
+    }
+    if 'temperature' in values:
+        temp_celsius = values['temperature']
+        weather['temperature_c'] = round(temp_celsius, 1)
+        weather['temperature_f'] = round((temp_celsius * 9/5) + 32, 1)
+        weather['available_metrics'].append('temperature')
+    if 'wind_speed' in values:
+        weather['wind_speed_mph'] = round(values['wind_speed'], 1)
+        weather['available_metrics'].append('wind_speed')
+    if 'wind_direction' in values:
+        wind_direction = round(values['wind_direction'])
+        weather['wind_direction'] = wind_direction
+        weather['wind_direction_cardinal'] = get_cardinal_direction(wind_direction)
+        weather['available_metrics'].append('wind_direction')
+    if 'humidity' in values:
+        weather['humidity'] = round(values['humidity'], 1)
+        weather['available_metrics'].append('humidity')
+    if 'pressure' in values:
+        pressure_val = values['pressure']
+        # Check if it's in inHg (values typically 28-32) and convert to hPa
+        if pressure_val < 50:
+            weather['pressure_inhg'] = round(pressure_val, 2)
+            weather['pressure_hpa'] = round(pressure_val * 33.8639, 1)
+        else:
+            weather['pressure_hpa'] = round(pressure_val, 1)
+            weather['pressure_inhg'] = round(pressure_val / 33.8639, 2)
+        weather['available_metrics'].append('pressure')
+    if 'uv_index' in values:
+        weather['uv_index'] = round(values['uv_index'], 1)
+        weather['available_metrics'].append('uv_index')
+    if 'precipitation' in values:
+        weather['precipitation'] = round(values['precipitation'], 2)
+        weather['available_metrics'].append('precipitation')
+    return weather
+
+
+@stale_while_revalidate('weather_data', soft_ttl=60, hard_ttl=3600)
+def current_weather():
+    """
+    Current conditions of the Norton Shores weather station.
+    Cached stale-while-revalidate: refreshed after 1 minute, kept for 1 hour.
+    """
+    weather = build_conditions(match_sensors(query_instant(CURRENT_CONDITIONS_QUERY, timeout=5)))
+    # Only publish if we have at least temperature
+    if 'temperature_c' not in weather:
+        logger.warning("No weather data found in Prometheus response")
+        return None
+    return remember('weather_data', weather)
+
+
+# Range queries charted on the weather page
+HISTORY_QUERIES = {
+    'temperature': ('homeassistant_sensor_temperature_celsius'
+                    '{entity="sensor.norton_shores_weather_station_temperature"}'),
+    'wind_speed': 'homeassistant_sensor_wind_speed_mph{entity="sensor.norton_shores_weather_station_wind_speed"}',
+    'humidity': 'homeassistant_sensor_humidity_percent{entity=~"sensor.norton_shores.*humidity.*"}',
+    'pressure': 'homeassistant_sensor_pressure_hpa{entity=~"sensor.norton_shores.*pressure.*"}',
+}
+
+DAY = 24 * 60 * 60
+
+# Resolutions history is served (and stored) at: sample spacing and fetch chunk
+# length in seconds. Chunks are small enough to avoid Prometheus truncation.
+RESOLUTIONS = {
+    '5m': {'seconds': 5 * 60, 'chunk': DAY},
+    '1h': {'seconds': 60 * 60, 'chunk': 6 * DAY},
+    '6h': {'seconds': 6 * 60 * 60, 'chunk': 14 * DAY},  # ~56 points per chunk
+}
+
+# Window, resolution and per-query timeout (seconds) per period
+HISTORY_PERIODS = {
+    '24h': {'duration': DAY, 'resolution': '5m', 'timeout': 10},
+    '7d': {'duration': 7 * DAY, 'resolution': '1h', 'timeout': 10},
+    '30d': {'duration': 30 * DAY, 'resolution': '1h', 'timeout': 30},
+    '365d': {'duration': 365 * DAY, 'resolution': '6h', 'timeout': 60},
+}
+
+_range_executor = None
+
+
+def _get_range_executor():
+    """Pool shared by all history requests, bounding concurrent load on Prometheus."""
+    global _range_executor
+    if _range_executor is None:
+        _range_executor = ThreadPoolExecutor(max_workers=settings.PROMETHEUS_MAX_CONCURRENCY,
+                                             thread_name_prefix='prometheus-range')
+    return _range_executor
+
+
+def empty_series():
+    return array('q'), array('d')
+
+
+def query_range(query, start_time, end_time, step, timeout):
+    """Query Prometheus query_range and return ``(times, values)`` arrays."""
+    response = requests.get(
+        f"{settings.PROMETHEUS_URL}/api/v1/query_range",
+        params={'query': query, 'start': start_time, 'end': end_time, 'step': step},
+        timeout=timeout
+    )
+    response.raise_for_status()
+    data = response.json()
+    if data.get('status') != 'success' or not data.get('data', {}).get('result'):
+        return empty_series()
+    samples = data['data']['result'][0].get('values', [])
+    return array('q', [int(t) for t, _ in samples]), array('d', [round(float(v), 1) for _, v in samples])
+
+
+def merge_dedupe_points(series_list):
+    """Merge multiple ``(times, values)`` series and deduplicate by timestamp (first wins)."""
+    merged = {}
+    for times, values in series_list:
+        for t, v in zip(times, values):
+            merged.setdefault(t, v)
+    times = array('q', sorted(merged))
+    return times, array('d', [merged[t] for t in times])
+
+
+def _fetch_chunk(query, start_time, end_time, step, timeout, give_up_at):
+    """Fetch one chunk, retrying failures while the overall deadline allows."""
+    attempt = 0
+    while True:
+        remaining = give_up_at - time.monotonic()
+        try:
+            return query_range(query, start_time, end_time, step, min(timeout, max(remaining, 0.1)))
+        except requests.exceptions.RequestException as e:
+            attempt += 1
+            backoff = 0.5 * attempt
+            if attempt > settings.PROMETHEUS_CHUNK_RETRIES or time.monotonic() + backoff >= give_up_at:
+                raise
+            logger.warning(f"Retrying range chunk {start_time}-{end_time} after error: {e}")
+            time.sleep(backoff)
+
+
+def history_chunks(start_time, end_time, chunk):
+    """Split [start_time, end_time] into consecutive (start, end) windows of at most ``chunk`` seconds."""
+    count = max(1, math.ceil((end_time - start_time) / chunk))
+    return [(start_time + i * chunk, min(start_time + (i + 1) * chunk, end_time)) for i in range(count)]
+
+
+def align(timestamp, resolution):
+    """Round a timestamp down to the resolution grid, so every fetch samples the same instants."""
+    seconds = RESOLUTIONS[resolution]['seconds']
+    return int(timestamp) - int(timestamp) % seconds
+
+
+def rollup_query(query, resolution):
+    """Average of each bucket rather than a point sample, so downsampling keeps the trend."""
+    return f'avg_over_time({query}[{resolution}])'
+
+
+def fetch_ranges(start_time, end_time, resolution, timeout=30, deadline=None):
+    """
+    Fetch every series/chunk of [start_time, end_time] concurrently at ``resolution``.
+    Returns ``(chunks, results)`` where ``results[series][i]`` holds the series of
+    ``chunks[i]``, or None if that chunk failed or missed the deadline.
+    """
+    config = RESOLUTIONS[resolution]
+    deadline = deadline or settings.WEATHER_HISTORY_DEADLINE
+    give_up_at = time.monotonic() + deadline
+
+    executor = _get_range_executor()
+    chunks = history_chunks(start_time, end_time, config['chunk'])
+    futures = {}
+    for series, query in HISTORY_QUERIES.items():
+        for index, (c_start, c_end) in enumerate(chunks):
+            future = executor.submit(_fetch_chunk, rollup_query(query, resolution), c_start, c_end,
+                                     resolution, timeout, give_up_at)
+            futures[future] = (series, index)
+    done, not_done = wait(futures, timeout=deadline)
+    for future in not_done:
+        future.cancel()
+
+    results = {series: [None for _ in chunks] for series in HISTORY_QUERIES}
+    for future in done:
+        series, index = futures[future]
+        try:
+            results[series][index] = future.result()
+        except Exception as e:
+            logger.warning(f"Failed to fetch {series} history chunk {index}: {e}")
+    return chunks, results
+
+
+def history_payload(period, start_time, end_time, series_points, missing_chunks=0):
+    """Shape merged series into the /api/weather/history/ payload."""
+    if missing_chunks and not any(times for times, _ in series_points.values()):
+        return {'status': 'error', 'error': 'Unable to connect to monitoring service'}
+    history = {
+        'period': period,
+        'start_time': start_time,
+        'end_time': end_time,
+        'status': 'ok',
+    }
+    history.update(series_points)
+    if missing_chunks:
+        history['status'] = 'partial'
+        history['missing_chunks'] = missing_chunks
+    return history
+
+
+def merge_chunks(results):
+    """Merge per-chunk results into one series per history field, counting failed chunks."""
+    merged = {series: merge_dedupe_points(c for c in chunks if c is not None)
+              for series, chunks in results.items()}
+    missing = sum(c is None for chunks in results.values() for c in chunks)
+    return merged, missing
+
+
+def fetch_history(period, end_time=None, deadline=None):
+    """
+    Fetch a whole history period straight from Prometheus.
+    Chunks still missing at the deadline (or after their retries) are counted in
+    ``missing_chunks`` and the status becomes 'partial'.
+    """
+    config = HISTORY_PERIODS.get(period, HISTORY_PERIODS['24h'])
+    end_time = align(end_time or time.time(), config['resolution'])
+    start_time = end_time - config['duration']
+    _, results = fetch_ranges(start_time, end_time, config['resolution'],
+                              timeout=config['timeout'], deadline=deadline)
+    merged, missing = merge_chunks(results)
+    return history_payload(period, start_time, end_time, merged, missing)
+
+
+def downsample_lttb(series, max_points):
+    """
+    Largest-Triangle-Three-Buckets: keep ``max_points`` samples (first and last
+    included) that best preserve the visual shape, spikes included.
+    """
+    times, values = series
+    n = len(times)
+    if max_points < 3 or n <= max_points:
+        return series
+    bucket = (n - 2) / (max_points - 2)
+    kept_times, kept_values = array('q', times[:1]), array('d', values[:1])
+    previous = 0
+    for i in range(max_points - 2):
+        start, end = int(i * bucket) + 1, int((i + 1) * bucket) + 1
+        # The third triangle corner is the average of the next bucket
+        next_end = min(int((i + 2) * bucket) + 1, n)
+        avg_time = sum(times[end:next_end]) / (next_end - end)
+        avg_value = sum(values[end:next_end]) / (next_end - end)
+        prev_time, prev_value = times[previous], values[previous]
+        dt, dv = prev_time - avg_time, avg_value - prev_value
+        previous = max(range(start, end),
+                       key=lambda j: abs(dt * (values[j] - prev_value) - (prev_time - times[j]) * dv))
+        kept_times.append(times[previous])
+        kept_values.append(values[previous])
+    kept_times.append(times[-1])
+    kept_values.append(values[-1])
+    return kept_times, kept_values
+
+
+def downsample_history(history, max_points):
+    """Downsample every series of a history payload to at most ``max_points`` samples."""
+    for series in HISTORY_QUERIES:
+        if series in history:
+            history[series] = downsample_lttb(history[series], max_points)
+    return history
+
+
+# Response encodings of history series (``?format=``):
+#   points   [{time, value}, ...] per series
+#   columns  {times: [...], values: [...]} per series
+#   delta    as columns, with times after the first sent as differences
+HISTORY_FORMATS = ('points', 'columns', 'delta')
+
+
+def encode_series(series, fmt):
+    times, values = series
+    if fmt == 'points':
+        return [{'time': t, 'value': v} for t, v in zip(times, values)]
+    if fmt == 'delta' and times:
+        times = times[:1] + array('q', map(operator.sub, times[1:], times[:-1]))
+    return {'times': times.tolist(), 'values': values.tolist()}
+
+
+def encode_history(history, fmt='points'):
+    """Encode the series of a history payload in the requested response format."""
+    for series in HISTORY_QUERIES:
+        if series in history:
+            history[series] = encode_series(history[series], fmt)
+    if fmt != 'points':
+        history['format'] = fmt
+    return history
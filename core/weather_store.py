@@ -0,0 +1,175 @@
+"""
+Downsampled weather history kept in Redis.
+
+Each series is stored per resolution (5m, 1h, 6h) as a sorted set scored by
+timestamp, so a chart window is one ZRANGEBYSCORE per series. A periodic job
+appends only the newest slice and a backfill command fills older windows;
+past buckets never change, and history outlives Prometheus retention.
+
+Each resolution also records, per series, the time it was last fetched
+through, data or not. A sensor that stopped reporting therefore does not
+make every request refetch its "missing" tail.
+"""
+import logging
+import time
+from array import array
+
+import redis
+
+from .redis_client import get_redis
+from .weather import (
+    DAY, HISTORY_PERIODS, HISTORY_QUERIES, RESOLUTIONS, align, empty_series, fetch_ranges, history_payload,
+    merge_chunks, merge_dedupe_points,
+)
+
+logger = logging.getLogger(__name__)
+
+# How long each resolution is kept (None: forever)
+RETENTION = {
+    '5m': 8 * DAY,
+    '1h': 400 * DAY,
+    '6h': None,
+}
+
+
+def _key(resolution, series):
+    return f'weather:history:{resolution}:{series}'
+
+
+def _checked_key(resolution):
+    return f'weather:history:checked:{resolution}'
+
+
+def checked_times(resolution):
+    """``{series: time}`` each series was last successfully fetched through."""
+    return {series: int(t) for series, t in get_redis().hgetall(_checked_key(resolution)).items()}
+
+
+def fresh_through(newest, checked):
+    """
+    Oldest time all series are known up to: their newest stored point or a later
+    successful fetch. Series with neither (e.g. a sensor that is not installed) do
+    not count. None if nothing is known.
+    """
+    known = [max(t for t in (newest.get(series), checked.get(series)) if t is not None)
+             for series in HISTORY_QUERIES if newest.get(series) is not None or checked.get(series) is not None]
+    return min(known, default=None)
+
+
+def _series(members):
+    """Parse ``"<time>:<value>"`` members into ``(times, values)`` arrays."""
+    times, values = array('q'), array('d')
+    for member in members:
+        timestamp, value = member.split(':')
+        times.append(int(timestamp))
+        values.append(float(value))
+    return times, values
+
+
+def store_chunks(resolution, chunks, results):
+    """
+    Write fetched chunks. Each chunk replaces whatever was stored for its window,
+    so re-fetching is idempotent; failed chunks (None) leave stored data alone.
+    Series fetched completely are marked checked through the last chunk.
+    Returns the number of points written.
+    """
+    written = 0
+    checked = checked_times(resolution)
+    pipe = get_redis().pipeline(transaction=False)
+    for series, chunk_series in results.items():
+        key = _key(resolution, series)
+        if all(fetched is not None for fetched in chunk_series) and chunks[-1][1] > checked.get(series, -1):
+            pipe.hset(_checked_key(resolution), series, chunks[-1][1])
+        for (c_start, c_end), fetched in zip(chunks, chunk_series):
+            if fetched is None:
+                continue
+            pipe.zremrangebyscore(key, c_start, c_end)
+            times, values = fetched
+            if times:
+                pipe.zadd(key, {f'{t}:{v}': t for t, v in zip(times, values)})
+                written += len(times)
+        if RETENTION[resolution]:
+            pipe.zremrangebyscore(key, '-inf', f'({chunks[-1][1] - RETENTION[resolution]}')
+    pipe.execute()
+    return written
+
+
+def read_points(resolution, start_time, end_time):
+    """Stored ``{series: (times, values)}`` within [start_time, end_time]."""
+    pipe = get_redis().pipeline(transaction=False)
+    for series in HISTORY_QUERIES:
+        pipe.zrangebyscore(_key(resolution, series), start_time, end_time)
+    return {series: _series(members)
+            for series, members in zip(HISTORY_QUERIES, pipe.execute())}
+
+
+def latest_time(resolution):
+    """Time the store is complete up to for every series (see fresh_through), or None if it is empty."""
+    pipe = get_redis().pipeline(transaction=False)
+    for series in HISTORY_QUERIES:
+        pipe.zrevrange(_key(resolution, series), 0, 0, withscores=True)
+    newest = {series: int(rows[0][1]) for series, rows in zip(HISTORY_QUERIES, pipe.execute()) if rows}
+    return fresh_through(newest, checked_times(resolution))
+
+
+def backfill(resolution, start_time, end_time, deadline=None):
+    """Fetch [start_time, end_time] from Prometheus and store it. Returns ``(written, missing_chunks)``."""
+    start_time, end_time = align(start_time, resolution), align(end_time, resolution)
+    if start_time >= end_time:
+        return 0, 0
+    chunks, results = fetch_ranges(start_time, end_time, resolution, deadline=deadline)
+    _, missing = merge_chunks(results)
+    return store_chunks(resolution, chunks, results), missing
+
+
+def record_latest(resolution, end_time=None, deadline=None):
+    """
+    Append the slice newer than what is stored. An empty store starts one
+    retention period back (30 days for unbounded resolutions).
+    """
+    end_time = align(end_time or time.time(), resolution)
+    latest = latest_time(resolution)
+    if latest is None:
+        start_time = end_time - (RETENTION[resolution] or 30 * DAY)
+    else:
+        start_time = latest + RESOLUTIONS[resolution]['seconds']
+    return backfill(resolution, start_time, end_time, deadline=deadline)
+
+
+def load_history(period, end_time=None, deadline=None):
+    """
+    History for a chart period, read from the store. Only the tail the store is
+    missing (everything, when it is empty or Redis is down) comes from Prometheus,
+    and it is written back so the next request finds it stored.
+    """
+    config = HISTORY_PERIODS.get(period, HISTORY_PERIODS['24h'])
+    resolution = config['resolution']
+    step = RESOLUTIONS[resolution]['seconds']
+    end_time = align(end_time or time.time(), resolution)
+    start_time = end_time - config['duration']
+
+    try:
+        stored = read_points(resolution, start_time, end_time)
+        checked = checked_times(resolution)
+    except redis.RedisError as e:
+        logger.error(f"Redis error reading weather history: {e}")
+        stored = {series: empty_series() for series in HISTORY_QUERIES}
+        checked = {}
+
+    newest = {series: times[-1] for series, (times, _) in stored.items() if times}
+    fresh = fresh_through(newest, checked)
+    if fresh is None:
+        fresh = start_time - step
+    # Tolerate one missing bucket, the recorder may simply not have run yet
+    if fresh >= end_time - step:
+        return history_payload(period, start_time, end_time, stored)
+
+    tail_start = max(fresh + step, start_time)
+    chunks, results = fetch_ranges(tail_start, end_time, resolution, timeout=config['timeout'], deadline=deadline)
+    tail, missing = merge_chunks(results)
+    try:
+        store_chunks(resolution, chunks, results)
+    except redis.RedisError as e:
+        logger.error(f"Redis error storing weather history tail: {e}")
+    merged = {series: merge_dedupe_points([stored[series], tail[series]]) for series in HISTORY_QUERIES}
+    return history_payload(period, start_time, end_time, merged, missing)
@@ -0,0 +1,127 @@
+"""
+Write-behind image view counters.
+
+Views are added up per image in process memory and flushed to Redis in one
+pipelined batch, every few seconds or once enough views are pending. The
+count shown on a page is the total Redis returned at the last flush plus the
+views this process has not flushed yet, so a popular image costs no Redis
+round trip per view and a slow Redis does not slow page renders. Remembered
+totals are re-read from Redis once older than IMAGE_VIEWS_TOTAL_TTL, so views
+counted by other workers show up even on images this process rarely serves.
+
+Each flush also adds to the all-time ranking and to the current hour's
+ranking bucket, from which the windowed rankings are built.
+"""
+import atexit
+import logging
+import threading
+import time
+from collections import Counter
+
+import redis
+from django.conf import settings
+
+from core.redis_client import get_redis
+
+logger = logging.getLogger(__name__)
+
+RANKING_KEY = 'image_ranking'
+HOUR = 60 * 60
+# Hourly ranking buckets outlive the longest window (a week) by a day
+BUCKET_TTL = 8 * 24 * HOUR
+
+
+def views_key(image_id):
+    return f'image:{image_id}:views'
+
+
+def hour_bucket_key(timestamp):
+    """Sorted set of the views counted during the hour containing ``timestamp``."""
+    return f'{RANKING_KEY}:h:{int(timestamp) // HOUR * HOUR}'
+
+
+class ViewCounter:
+    # Cap on remembered totals, so an idle process does not grow without bound
+    MAX_KNOWN = 10000
+
+    def __init__(self, flush_interval=None, flush_threshold=None, total_ttl=None):
+        self.flush_interval = flush_interval or settings.IMAGE_VIEWS_FLUSH_INTERVAL
+        self.flush_threshold = flush_threshold or settings.IMAGE_VIEWS_FLUSH_THRESHOLD
+        self.total_ttl = total_ttl or settings.IMAGE_VIEWS_TOTAL_TTL
+        self._pending = Counter()
+        self._pending_total = 0
+        # image id -> (total views in Redis as of the last flush or read, when it was known)
+        self._flushed = {}
+        self._lock = threading.Lock()
+        self._flusher = None
+
+    def _start_flusher(self):
+        # Started lazily so each forked worker runs its own
+        if self._flusher is None or not self._flusher.is_alive():
+            self._flusher = threading.Thread(target=self._run, name='image-view-flusher', daemon=True)
+            self._flusher.start()
+
+    def _run(self):
+        while True:
+            time.sleep(self.flush_interval)
+            self.flush()
+
+    def incr(self, image_id):
+        """Count one view and return the image's current total."""
+        with self._lock:
+            self._pending[image_id] += 1
+            self._pending_total += 1
+            pending = self._pending_total
+        self._start_flusher()
+        if pending >= self.flush_threshold:
+            self.flush()
+        return self.get(image_id)
+
+    def get(self, image_id):
+        """Total views: last flushed (or recently read) value plus views not flushed yet."""
+        base, known_at = self._flushed.get(image_id, (None, None))
+        if base is None or time.monotonic() - known_at > self.total_ttl:
+            try:
+                base = int(get_redis().get(views_key(image_id)) or 0)
+                self._remember({image_id: base})
+            except redis.RedisError as e:
+                logger.error(f"Redis error reading views of image {image_id}: {e}")
+                # a stale total beats none
+                base = base or 0
+        return base + self._pending.get(image_id, 0)
+
+    def _remember(self, totals):
+        if len(self._flushed) + len(totals) > self.MAX_KNOWN:
+            self._flushed.clear()
+        now = time.monotonic()
+        self._flushed.update((image_id, (total, now)) for image_id, total in totals.items())
+
+    def flush(self):
+        """Write pending views to Redis in one pipeline. Views are kept for the next flush on failure."""
+        with self._lock:
+            batch, self._pending = self._pending, Counter()
+            self._pending_total = 0
+        if not batch:
+            return
+        bucket = hour_bucket_key(time.time())
+        try:
+            pipe = get_redis().pipeline(transaction=False)
+            for image_id, count in batch.items():
+                pipe.incrby(views_key(image_id), count)
+            for image_id, count in batch.items():
+                pipe.zincrby(RANKING_KEY, count, image_id)
+                pipe.zincrby(bucket, count, image_id)
+            pipe.expire(bucket, BUCKET_TTL)
+            results = pipe.execute()
+        except redis.RedisError as e:
+            logger.error(f"Redis error flushing image views: {e}")
+            with self._lock:
+                self._pending.update(batch)
+                self._pending_total += sum(batch.values())
+            return
+        # INCRBY results are the new totals across every worker
+        self._remember(dict(zip(batch, results[:len(batch)])))
+
+
+view_counter = ViewCounter()
+atexit.register(view_counter.flush)
@@ -0,0 +1,93 @@
+"""
+Bounded download of remote images for the bookmarklet and URL uploads.
+
+The body is streamed to a temporary file with connect/read timeouts and an
+overall deadline, aborting as soon as it exceeds MAX_UPLOAD_SIZE. Each
+socket read is limited to the time left before the deadline, so a server
+trickling bytes cannot hold a worker past it. The file type comes from its magic bytes, not from the URL
+or the Content-Type header.
+"""
+import tempfile
+import time
+
+import requests
+import urllib3
+from django.conf import settings
+from django.core.files import File
+
+CHUNK_SIZE = 8 * 1024
+
+# Leading bytes of the accepted formats, and the extension to store them with
+SIGNATURES = (
+    (b'\xff\xd8\xff', 'jpg'),
+    (b'\x89PNG\r\n\x1a\n', 'png'),
+)
+
+
+class RemoteImageError(Exception):
+    """The remote image could not be downloaded or is not acceptable."""
+
+
+def sniff_extension(head):
+    """Extension matching the magic bytes at the start of a file, or None."""
+    for signature, extension in SIGNATURES:
+        if head.startswith(signature):
+            return extension
+    return None
+
+
+def _set_read_timeout(response, seconds):
+    """Bound the next socket read of a streamed response."""
+    sock = getattr(getattr(response.raw, 'connection', None), 'sock', None)
+    if sock is not None:
+        sock.settimeout(seconds)
+
+
+def fetch_image(url, max_size=None):
+    """
+    Download ``url`` into a temporary file.
+    Returns ``(file, extension)``; raises RemoteImageError on any failure.
+    """
+    max_size = max_size or settings.MAX_UPLOAD_SIZE
+    deadline = time.monotonic() + settings.REMOTE_IMAGE_DEADLINE
+    timeout = (settings.REMOTE_IMAGE_CONNECT_TIMEOUT, settings.REMOTE_IMAGE_READ_TIMEOUT)
+    too_large = f'Image file too large ( > {max_size / 1024 / 1024}MB )'
+    too_slow = 'The image took too long to download.'
+
+    tmp = tempfile.TemporaryFile()
+    try:
+        with requests.get(url, stream=True, timeout=timeout) as response:
+            response.raise_for_status()
+            if int(response.headers.get('Content-Length') or 0) > max_size:
+                raise RemoteImageError(too_large)
+            # read1() returns what one socket read yields (urllib3 2), so no read waits on several
+            read = getattr(response.raw, 'read1', response.raw.read)
+            size = 0
+            while True:
+                remaining = deadline - time.monotonic()
+                if remaining <= 0:
+                    raise RemoteImageError(too_slow)
+                _set_read_timeout(response, min(settings.REMOTE_IMAGE_READ_TIMEOUT, remaining))
+                chunk = read(CHUNK_SIZE, decode_content=True)
+                if not chunk:
+                    break
+                size += len(chunk)
+                if size > max_size:
+                    raise RemoteImageError(too_large)
+                tmp.write(chunk)
+    except (requests.RequestException, urllib3.exceptions.HTTPError, OSError) as e:
+        tmp.close()
+        if time.monotonic() >= deadline:
+            raise RemoteImageError(too_slow)
+        raise RemoteImageError(f'Could not download the image: {e}')
+    except RemoteImageError:
+        tmp.close()
+        raise
+
+    tmp.seek(0)
+    extension = sniff_extension(tmp.read(16))
+    if extension is None:
+        tmp.close()
+        raise RemoteImageError('The given URL is not a JPEG or PNG image.')
+    tmp.seek(0)
+    return File(tmp, name=f'remote.{extension}'), extension
@@ -1,11 +1,17 @@
-from urllib import request
 from django import forms
-from django.core.files.base import ContentFile
 from django.utils.text import slugify
 from django.conf import settings
+from .fetch import fetch_image
 from .models import Image
 
 
+def download_image(image, url):
+    """Download ``url`` into ``image.image``. Raises RemoteImageError on failure."""
+    upload, extension = fetch_image(url)
+    with upload:
+        image.image.save(f'{slugify(image.title)}.{extension}', upload, save=False)
+
+
 class ImageCreateForm(forms.ModelForm):
     class Meta:
         model = Image
@@ -27,14 +33,8 @@ class ImageCreateForm(forms.ModelForm):
              force_update=False,
              commit=True):
         image = super().save(commit=False)
-
-        image_url = self.cleaned_data['url']
-        name = slugify(image.title)
-        extension = image_url.rsplit('.', 1)[1].lower()
-        image_name = f'{name}.{extension}'
         # download image from the given URL
-        response = request.urlopen(image_url)
-        image.image.save(image_name, ContentFile(response.read()), save=False)
+        download_image(image, self.cleaned_data['url'])
         if commit:
             image.save()
         return image
@@ -86,12 +86,7 @@ class ImageUploadForm(forms.ModelForm):
         image = super().save(commit=False)
 
         if self.cleaned_data.get('url'):
-            image_url = self.cleaned_data['url']
-            name = slugify(image.title)
-            extension = image_url.rsplit('.', 1)[1].lower()
-            image_name = f'{name}.{extension}'
-            response = request.urlopen(image_url)
-            image.image.save(image_name, ContentFile(response.read()), save=False)
+            download_image(image, self.cleaned_data['url'])
 
         if commit:
             image.save()
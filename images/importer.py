@@ -0,0 +1,78 @@
+"""
+Bulk import of image files (``manage.py import_images``).
+
+Files are hashed, size-checked and fully decoded in a process pool, so
+corrupt or unsupported files are rejected before anything is written.
+Duplicates, within the import or of earlier imports, are skipped by SHA-256.
+"""
+import csv
+import hashlib
+import json
+import os
+from io import BytesIO
+
+from django.conf import settings
+from PIL import Image as PILImage
+
+# Pillow formats accepted, and the extension they are stored with (as for uploads by URL)
+FORMATS = {'JPEG': 'jpg', 'PNG': 'png'}
+EXTENSIONS = ('.jpg', '.jpeg', '.png')
+
+
+def title_from_path(path):
+    stem = os.path.splitext(os.path.basename(path))[0]
+    return stem.replace('_', ' ').replace('-', ' ').strip().capitalize() or 'Untitled'
+
+
+def collect_entries(source):
+    """
+    Import entries ``{path, title, description, url}`` from a directory (walked
+    recursively) or a CSV/JSON manifest whose paths are relative to it.
+    """
+    if os.path.isdir(source):
+        paths = sorted(os.path.join(root, name)
+                       for root, _, names in os.walk(source)
+                       for name in names if name.lower().endswith(EXTENSIONS))
+        return [{'path': path, 'title': title_from_path(path), 'description': '', 'url': ''} for path in paths]
+
+    with open(source, newline='') as f:
+        rows = json.load(f) if source.endswith('.json') else list(csv.DictReader(f))
+    base = os.path.dirname(os.path.abspath(source))
+    entries = []
+    for row in rows:
+        path = os.path.join(base, row['path'])
+        entries.append({
+            'path': path,
+            'title': row.get('title') or title_from_path(path),
+            'description': row.get('description') or '',
+            'url': row.get('url') or '',
+        })
+    return entries
+
+
+def inspect_file(path):
+    """Hash and validate one file. Runs in a worker process; returns a dict with 'error' on rejection."""
+    try:
+        size = os.path.getsize(path)
+        if size > settings.MAX_UPLOAD_SIZE:
+            return {'path': path, 'error': f'larger than {settings.MAX_UPLOAD_SIZE} bytes'}
+        with open(path, 'rb') as f:
+            data = f.read()
+        with PILImage.open(BytesIO(data)) as image:
+            image.verify()
+        # verify() does not decode pixel data; load() does
+        with PILImage.open(BytesIO(data)) as image:
+            image.load()
+            image_format, (width, height) = image.format, image.size
+    except Exception as e:
+        return {'path': path, 'error': str(e) or e.__class__.__name__}
+    if image_format not in FORMATS:
+        return {'path': path, 'error': f'unsupported format {image_format}'}
+    return {
+        'path': path,
+        'sha256': hashlib.sha256(data).hexdigest(),
+        'extension': FORMATS[image_format],
+        'size': size,
+        'width': width,
+        'height': height,
+    }
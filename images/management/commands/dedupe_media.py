@@ -0,0 +1,36 @@
+from django.core.management.base import BaseCommand
+
+from account.models import Profile
+from common.storage import is_blob
+from images.models import Image
+
+
+class Command(BaseCommand):
+    help = ('Move image files and profile photos stored before content-addressed storage into it, '
+            'so identical files are kept once.')
+
+    def add_arguments(self, parser):
+        parser.add_argument('--delete', action='store_true',
+                            help='Delete the old files once no row references them.')
+
+    def handle(self, *args, **options):
+        for model, field in ((Image, 'image'), (Profile, 'photo')):
+            moved = 0
+            rows = model.objects.exclude(**{field: ''}).only('id', field)
+            for row in rows.iterator():
+                fieldfile = getattr(row, field)
+                old_name = fieldfile.name
+                if is_blob(old_name):
+                    continue
+                try:
+                    with fieldfile.storage.open(old_name, 'rb') as f:
+                        new_name = fieldfile.storage.save(old_name, f)
+                except OSError as e:
+                    self.stderr.write(f"{old_name}: {e}")
+                    continue
+                # update() rather than save(): nothing is regenerated for an unchanged image
+                model.objects.filter(pk=row.pk).update(**{field: new_name})
+                moved += 1
+                if options['delete'] and not model.objects.filter(**{field: old_name}).exists():
+                    fieldfile.storage.delete(old_name)
+            self.stdout.write(self.style.SUCCESS(f"Moved {moved} {model.__name__}.{field} files"))
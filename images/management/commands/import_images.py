@@ -0,0 +1,99 @@
+import os
+import time
+from concurrent.futures import ProcessPoolExecutor, ThreadPoolExecutor
+
+from django.contrib.auth import get_user_model
+from django.core.files import File
+from django.core.management.base import BaseCommand, CommandError
+from django.utils.text import slugify
+
+from actions.models import Action
+from images.importer import collect_entries, inspect_file
+from images.models import Image
+from images.renditions import render_image
+from images.thumbnails import generate_thumbnails
+
+
+class Command(BaseCommand):
+    help = ('Import image files from a directory or a CSV/JSON manifest (path, title, description, url), '
+            'skipping duplicates and invalid files.')
+
+    def add_arguments(self, parser):
+        parser.add_argument('source', help='Directory of images, or a .csv/.json manifest.')
+        parser.add_argument('--user', required=True, help='Username the images are shared by.')
+        parser.add_argument('--workers', type=int, default=os.cpu_count(),
+                            help='Processes decoding and validating files (default: CPU count).')
+        parser.add_argument('--batch-size', type=int, default=200,
+                            help='Rows per bulk insert (default: 200).')
+        parser.add_argument('--no-thumbnails', action='store_true',
+                            help='Skip thumbnail and rendition generation (run prewarm_thumbnails later).')
+
+    def handle(self, *args, **options):
+        try:
+            self.user = get_user_model().objects.get(username=options['user'])
+        except get_user_model().DoesNotExist:
+            raise CommandError(f"User {options['user']!r} does not exist")
+        if not os.path.exists(options['source']):
+            raise CommandError(f"{options['source']} does not exist")
+
+        entries = collect_entries(options['source'])
+        self.total = len(entries)
+        self.imported = self.duplicates = self.invalid = self.bytes = 0
+        self.started = time.monotonic()
+        self.stdout.write(f"Importing {self.total} files with {options['workers']} workers")
+
+        seen = set()
+        batch = []
+        with ProcessPoolExecutor(max_workers=options['workers']) as pool, \
+                ThreadPoolExecutor(max_workers=options['workers']) as self.media_pool:
+            self.generate_media = not options['no_thumbnails']
+            results = pool.map(inspect_file, [entry['path'] for entry in entries], chunksize=8)
+            for entry, result in zip(entries, results):
+                if 'error' in result:
+                    self.invalid += 1
+                    self.stderr.write(f"Skipping {entry['path']}: {result['error']}")
+                elif result['sha256'] in seen:
+                    self.duplicates += 1
+                else:
+                    seen.add(result['sha256'])
+                    batch.append((entry, result))
+                    if len(batch) >= options['batch_size']:
+                        self.import_batch(batch)
+                        batch = []
+            if batch:
+                self.import_batch(batch)
+            self.stdout.write('Waiting for thumbnails...')
+
+        elapsed = time.monotonic() - self.started
+        self.stdout.write(self.style.SUCCESS(
+            f"Imported {self.imported} images in {elapsed:.1f}s ({self.imported / elapsed:.1f} images/s); "
+            f"{self.duplicates} duplicates and {self.invalid} invalid files skipped"))
+
+    def import_batch(self, batch):
+        # duplicates of earlier imports
+        existing = set(Image.objects.filter(checksum__in=[result['sha256'] for _, result in batch])
+                       .values_list('checksum', flat=True))
+        images = []
+        for entry, result in batch:
+            if result['sha256'] in existing:
+                self.duplicates += 1
+                continue
+            image = Image(user=self.user, title=entry['title'][:200], slug=slugify(entry['title'])[:200],
+                          url=entry['url'], description=entry['description'], checksum=result['sha256'])
+            with open(entry['path'], 'rb') as f:
+                image.image.save(f"{image.slug or 'image'}.{result['extension']}", File(f), save=False)
+            images.append(image)
+            self.bytes += result['size']
+
+        Image.objects.bulk_create(images)
+        Action.objects.bulk_create([Action(user=self.user, verb='uploaded image', target=image) for image in images])
+        if self.generate_media:
+            for image in images:
+                self.media_pool.submit(generate_thumbnails, image.image)
+                self.media_pool.submit(render_image, image.pk)
+
+        self.imported += len(images)
+        elapsed = time.monotonic() - self.started
+        processed = self.imported + self.duplicates + self.invalid
+        self.stdout.write(f"{processed}/{self.total} processed, {self.imported} imported "
+                          f"({self.imported / elapsed:.1f} images/s, {self.bytes / elapsed / 1024 / 1024:.1f} MB/s)")
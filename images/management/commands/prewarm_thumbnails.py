@@ -0,0 +1,50 @@
+import time
+from concurrent.futures import ThreadPoolExecutor
+
+from django.core.management.base import BaseCommand
+
+from account.models import Profile
+from images.models import Image
+from images.renditions import render_image
+from images.thumbnails import generate_thumbnails
+
+
+class Command(BaseCommand):
+    help = ('Generate every configured thumbnail alias for existing images and profile photos, '
+            'and the responsive renditions of images that have none.')
+
+    def add_arguments(self, parser):
+        parser.add_argument('--workers', type=int, default=4,
+                            help='Files processed concurrently (default: 4).')
+        parser.add_argument('--renditions', action='store_true',
+                            help='Re-encode responsive renditions of every image, not only missing ones.')
+
+    def handle(self, *args, **options):
+        # once per stored file: rows can share a content-addressed file
+        files = list({image.image.name: image.image
+                      for image in Image.objects.exclude(image='').only('id', 'image')}.values())
+        files += list({profile.photo.name: profile.photo
+                       for profile in Profile.objects.exclude(photo='').only('id', 'photo')}.values())
+        started = time.monotonic()
+        done = failed = 0
+        with ThreadPoolExecutor(max_workers=options['workers']) as executor:
+            futures = {executor.submit(generate_thumbnails, fieldfile): fieldfile for fieldfile in files}
+            for future, fieldfile in futures.items():
+                try:
+                    future.result()
+                    done += 1
+                except Exception as e:
+                    failed += 1
+                    self.stderr.write(f"{fieldfile.name}: {e}")
+        self.stdout.write(self.style.SUCCESS(
+            f"Pre-generated thumbnails for {done} files in {time.monotonic() - started:.1f}s ({failed} failed)"))
+
+        images = Image.objects.exclude(image='')
+        if not options['renditions']:
+            images = images.filter(renditions={})
+        image_ids = list(images.values_list('id', flat=True))
+        started = time.monotonic()
+        with ThreadPoolExecutor(max_workers=options['workers']) as executor:
+            list(executor.map(render_image, image_ids))
+        self.stdout.write(self.style.SUCCESS(
+            f"Encoded renditions for {len(image_ids)} images in {time.monotonic() - started:.1f}s"))
@@ -3,17 +3,29 @@ from django.conf import settings
 from django.urls import reverse
 from django.utils.text import slugify
 
+from common.storage import content_storage
+
 
 class Image(models.Model):
     user = models.ForeignKey(settings.AUTH_USER_MODEL, related_name='images_created', on_delete=models.CASCADE)
     title = models.CharField(max_length=200)
     slug = models.SlugField(max_length=200, blank=True)
     url = models.URLField()
-    image = models.ImageField(upload_to='images/%Y/%m/%d/')
+    image = models.ImageField(upload_to='images/%Y/%m/%d/', storage=content_storage)
     description = models.TextField(blank=True)
     created = models.DateField(auto_now_add=True, db_index=True)
     users_like = models.ManyToManyField(settings.AUTH_USER_MODEL, related_name='images_liked', blank=True)
     total_likes = models.PositiveIntegerField(db_index=True, default=0)
+    # SHA-256 of the file, recorded by bulk imports to skip duplicates
+    checksum = models.CharField(max_length=64, blank=True, db_index=True, editable=False)
+    # responsive renditions generated after upload: {format: {width: storage name}}
+    renditions = models.JSONField(default=dict, blank=True, editable=False)
+
+    class Meta:
+        indexes = [
+            # backs keyset pagination of the image grid
+            models.Index(fields=['-total_likes', '-id'], name='images_likes_id_idx'),
+        ]
 
     def __str__(self):
         return self.title
@@ -0,0 +1,42 @@
+"""
+Keyset pagination of the image grid on (total_likes, id).
+
+Each page continues strictly after the last row of the previous one,
+carried in an opaque cursor token. A page is one indexed range scan
+whatever the depth, with no COUNT and no OFFSET.
+"""
+import base64
+import binascii
+
+from django.db.models import Q
+
+PAGE_SIZE = 9
+
+
+def encode_cursor(image):
+    return base64.urlsafe_b64encode(f'{image.total_likes}:{image.id}'.encode()).decode().rstrip('=')
+
+
+def decode_cursor(token):
+    """``(total_likes, id)`` of a cursor token, or None if it is missing or malformed."""
+    if not token:
+        return None
+    try:
+        likes, pk = base64.urlsafe_b64decode(token + '=' * (-len(token) % 4)).decode().split(':')
+        return int(likes), int(pk)
+    except (binascii.Error, UnicodeDecodeError, ValueError):
+        return None
+
+
+def keyset_page(queryset, cursor=None, size=PAGE_SIZE):
+    """Return ``(images, next_cursor)``; ``next_cursor`` is None on the last page."""
+    queryset = queryset.order_by('-total_likes', '-id')
+    position = decode_cursor(cursor)
+    if position is not None:
+        likes, pk = position
+        queryset = queryset.filter(Q(total_likes__lt=likes) | Q(total_likes=likes, id__lt=pk))
+    # one extra row tells whether there is a next page
+    images = list(queryset[:size + 1])
+    if len(images) > size:
+        return images[:size], encode_cursor(images[size - 1])
+    return images, None
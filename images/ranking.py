@@ -0,0 +1,87 @@
+"""
+Most viewed images.
+
+Only the top N ids are read from the ranking sorted set. The hydrated Image
+rows are cached briefly under a version derived from those ids, so the
+ranking pages cost one small ZREVRANGE and usually no query, however large
+the catalogue grows.
+
+Besides the all-time ranking there are windowed ones: the hourly buckets
+written by the view counter are merged with ZUNIONSTORE into a day, week or
+decay-weighted "trending" set, which is reused for a minute. Buckets expire,
+so every window key stays bounded by the images seen in its period.
+"""
+import hashlib
+import logging
+import time
+
+import redis
+from django.core.cache import cache
+
+from core.redis_client import get_redis
+
+from .counters import HOUR, RANKING_KEY, hour_bucket_key
+from .models import Image
+
+logger = logging.getLogger(__name__)
+
+# Seconds hydrated rankings are reused while the order stays the same
+RANKING_CACHE_TTL = 60
+
+# Hourly buckets merged per window, and the half-life in hours of the
+# weighting applied to older buckets (None: plain sum)
+WINDOWS = {
+    'day': {'hours': 24, 'half_life': None},
+    'week': {'hours': 7 * 24, 'half_life': None},
+    'trending': {'hours': 7 * 24, 'half_life': 24},
+}
+WINDOW_CHOICES = ('all',) + tuple(WINDOWS)
+# Seconds a merged window is reused before it is rebuilt from the buckets
+WINDOW_TTL = 60
+
+
+def window_key(window):
+    """Sorted set holding the ranking of ``window``, (re)built from hourly buckets if needed."""
+    if window not in WINDOWS:
+        return RANKING_KEY
+    key = f'{RANKING_KEY}:{window}'
+    r = get_redis()
+    if not r.exists(key):
+        config = WINDOWS[window]
+        now = time.time()
+        weights = {}
+        for age in range(config['hours']):
+            weight = 0.5 ** (age / config['half_life']) if config['half_life'] else 1
+            weights[hour_bucket_key(now - age * HOUR)] = weight
+        pipe = r.pipeline()
+        pipe.zunionstore(key, weights)
+        pipe.expire(key, WINDOW_TTL)
+        pipe.execute()
+    return key
+
+
+def top_image_ids(n, window='all'):
+    """Ids of the ``n`` most viewed images of ``window``, most viewed first."""
+    try:
+        return [int(image_id) for image_id in get_redis().zrevrange(window_key(window), 0, n - 1)]
+    except redis.RedisError as e:
+        logger.error(f"Redis error reading image ranking: {e}")
+        return []
+
+
+def ranking_version(ids):
+    return hashlib.sha1(','.join(map(str, ids)).encode()).hexdigest()[:16]
+
+
+def top_images(n, window='all'):
+    """The ``n`` most viewed images of ``window``, in ranking order."""
+    ids = top_image_ids(n, window)
+    if not ids:
+        return []
+    key = f'image_ranking:top:{n}:{ranking_version(ids)}'
+    images = cache.get(key)
+    if images is None:
+        by_id = Image.objects.in_bulk(ids)
+        images = [by_id[image_id] for image_id in ids if image_id in by_id]
+        cache.set(key, images, RANKING_CACHE_TTL)
+    return images
@@ -0,0 +1,106 @@
+"""
+Responsive renditions of uploaded images.
+
+Once per upload, a ladder of widths (IMAGE_RENDITION_WIDTHS) is encoded in
+modern formats with Pillow and stored next to the original, e.g.
+``images/2025/01/31/sunset.w640.webp``. The manifest is kept on the Image
+row, so the ``responsive_image`` template tag emits ``<picture>``/``srcset``
+markup without touching storage.
+"""
+import logging
+import os
+from io import BytesIO
+
+from django.conf import settings
+from django.core.files.base import ContentFile
+from PIL import Image as PILImage
+from PIL import ImageOps
+
+from common.storage import is_blob
+
+from .models import Image
+
+logger = logging.getLogger(__name__)
+
+# Preferred first: browsers take the first <source> type they support
+FORMATS = (
+    ('avif', 'AVIF', 'image/avif'),
+    ('webp', 'WEBP', 'image/webp'),
+)
+QUALITY = 80
+
+
+def supported_formats():
+    """Formats this Pillow build can encode (AVIF needs Pillow 11.2+)."""
+    PILImage.init()
+    return [(extension, pil_format, mime) for extension, pil_format, mime in FORMATS
+            if pil_format in PILImage.SAVE]
+
+
+def rendition_name(name, width, extension):
+    root, _ = os.path.splitext(name)
+    return f'{root}.w{width}.{extension}'
+
+
+def generate_renditions(fieldfile):
+    """
+    Encode and store the width ladder of ``fieldfile``. Widths at or above the
+    original's are skipped. Returns the manifest ``{extension: {width: name}}``.
+    """
+    fieldfile.open('rb')
+    try:
+        with PILImage.open(fieldfile) as source:
+            source = ImageOps.exif_transpose(source)
+            source = source.convert('RGBA' if source.mode in ('RGBA', 'LA', 'P') else 'RGB')
+    finally:
+        fieldfile.close()
+
+    manifest = {}
+    widths = [width for width in settings.IMAGE_RENDITION_WIDTHS if width < source.width]
+    for width in widths:
+        resized = source.resize((width, round(source.height * width / source.width)), PILImage.LANCZOS)
+        for extension, pil_format, _ in supported_formats():
+            buffer = BytesIO()
+            resized.save(buffer, pil_format, quality=QUALITY)
+            name = rendition_name(fieldfile.name, width, extension)
+            if fieldfile.storage.exists(name):
+                fieldfile.storage.delete(name)
+            saved = fieldfile.storage.save(name, ContentFile(buffer.getvalue()))
+            manifest.setdefault(extension, {})[str(width)] = saved
+    return manifest
+
+
+def render_image(image_id):
+    """Generate the renditions of an Image and record them on its row."""
+    image = Image.objects.filter(pk=image_id).only('id', 'image').first()
+    if image is None or not image.image:
+        return
+    # a content-addressed file is shared by every row with the same bytes, and so are its renditions
+    manifest = None
+    if is_blob(image.image.name):
+        manifest = (Image.objects.filter(image=image.image.name).exclude(pk=image_id).exclude(renditions={})
+                    .values_list('renditions', flat=True).first())
+    if manifest:
+        Image.objects.filter(pk=image_id).update(renditions=manifest)
+        return
+    try:
+        manifest = generate_renditions(image.image)
+    except Exception as e:
+        logger.error(f"Rendition generation failed for image {image_id}: {e}")
+        return
+    # update() rather than save(): no post_save, so nothing is queued again
+    Image.objects.filter(pk=image_id).update(renditions=manifest)
+
+
+def srcsets(image):
+    """``[(mime type, srcset)]`` of the stored renditions, preferred format first."""
+    manifest = image.renditions or {}
+    storage = image.image.storage
+    sources = []
+    for extension, _, mime in FORMATS:
+        widths = manifest.get(extension)
+        if widths:
+            srcset = ', '.join(f'{storage.url(name)} {width}w'
+                               for width, name in sorted(widths.items(), key=lambda item: int(item[0])))
+            sources.append((mime, srcset))
+    return sources
@@ -1,9 +1,22 @@
-from django.db.models.signals import m2m_changed
+from django.db import transaction
+from django.db.models.signals import m2m_changed, post_save
 from django.dispatch import receiver
+from common.likes import update_like_count
 from .models import Image
+from .renditions import render_image
+from .thumbnails import queue_thumbnails, run_in_background
 
 
 @receiver(m2m_changed, sender=Image.users_like.through)
-def users_like_changed(sender, instance, **kwargs):
-    instance.total_likes = instance.users_like.count()
-    instance.save()
+def users_like_changed(sender, instance, action, reverse, pk_set, **kwargs):
+    update_like_count(Image, instance, action, reverse, pk_set)
+
+
+@receiver(post_save, sender=Image)
+def image_saved(sender, instance, created, update_fields=None, **kwargs):
+    # pre-generate thumbnails unless the file was not part of the save
+    if update_fields is None or 'image' in update_fields:
+        transaction.on_commit(lambda: queue_thumbnails(instance.image))
+        if created:
+            # responsive renditions are encoded once, at upload
+            transaction.on_commit(lambda: run_in_background(render_image, instance.pk))
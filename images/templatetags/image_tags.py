@@ -0,0 +1,36 @@
+from django import template
+from django.utils.html import format_html, format_html_join
+
+from ..renditions import srcsets
+from ..thumbnails import existing_thumbnail_url, queue_thumbnails
+
+register = template.Library()
+
+
+@register.simple_tag
+def pregenerated(source, alias):
+    """
+    URL of the ``alias`` thumbnail of ``source`` (see THUMBNAIL_ALIASES), without
+    generating it during the request. A missing thumbnail is queued for the
+    background pool and the original is served meanwhile.
+    """
+    if not source:
+        return ''
+    url = existing_thumbnail_url(source, alias)
+    if url is None:
+        queue_thumbnails(source)
+        url = source.url
+    return url
+
+
+@register.simple_tag
+def responsive_image(image, alias, sizes='100vw', css_class='', alt=None):
+    """
+    ``<picture>`` with a ``srcset`` source per rendition format of ``image``,
+    falling back to the pre-generated ``alias`` thumbnail.
+    """
+    sources = format_html_join('', '<source type="{}" srcset="{}" sizes="{}">',
+                               ((mime, srcset, sizes) for mime, srcset in srcsets(image)))
+    return format_html('<picture>{}<img src="{}" alt="{}" class="{}" loading="lazy"></picture>',
+                       sources, pregenerated(image.image, alias),
+                       image.title if alt is None else alt, css_class)
@@ -1,13 +1,52 @@
-from django.test import TestCase, Client
+import hashlib
+import os
+import shutil
+import tempfile
+from io import BytesIO, StringIO
+
+import redis
+from django.test import TestCase, Client, override_settings
 from django.contrib.auth import get_user_model
+from django.core.cache import cache
+from django.core.files.base import ContentFile
+from django.core.management import CommandError, call_command
+from django.template import Context, Template
 from django.urls import reverse
 from unittest.mock import patch, MagicMock
+from PIL import Image as PILImage
+from account.models import Profile
+from actions.models import Action
+from .counters import ViewCounter
+from .fetch import RemoteImageError, fetch_image
 from .models import Image
 from .forms import ImageCreateForm, ImageUploadForm
+from .pagination import decode_cursor, keyset_page
+from .ranking import top_image_ids, top_images
+from .renditions import render_image
+from .thumbnails import existing_thumbnail_url, generate_thumbnails
 from django.core.files.uploadedfile import SimpleUploadedFile
 
 User = get_user_model()
 
+# Tests that use the cache get a private in-memory one, never the configured Redis
+LOCMEM_CACHES = {'default': {'BACKEND': 'django.core.cache.backends.locmem.LocMemCache'}}
+
+
+def image_bytes(color='red', size=(400, 300), fmt='JPEG'):
+    buffer = BytesIO()
+    PILImage.new('RGB', size, color).save(buffer, fmt)
+    return buffer.getvalue()
+
+
+class TempMediaRootMixin:
+    """Runs each test with an empty temporary MEDIA_ROOT."""
+
+    def setUp(self):
+        super().setUp()
+        media_root = tempfile.mkdtemp()
+        self.addCleanup(shutil.rmtree, media_root)
+        self.enterContext(override_settings(MEDIA_ROOT=media_root))
+
 
 class ImageModelTests(TestCase):
     def setUp(self):
@@ -45,7 +84,7 @@ class ImageViewTests(TestCase):
 
     def test_image_detail_view(self):
         url = reverse('images:detail', args=[self.image.id, self.image.slug])
-        with patch('images.views.get_redis') as mock_redis:
+        with patch('images.counters.get_redis') as mock_redis:
             mock_redis.return_value = MagicMock()
             self.client.force_login(self.user)
             response = self.client.get(url)
@@ -71,3 +110,437 @@ class ImageViewTests(TestCase):
         self.client.force_login(self.user)
         response = self.client.get(url)
         self.assertEqual(response.status_code, 200)
+
+
+class ViewCounterTests(TestCase):
+    def setUp(self):
+        patcher = patch('images.counters.get_redis')
+        self.redis = patcher.start().return_value
+        self.addCleanup(patcher.stop)
+        self.redis.get.return_value = '10'
+        self.pipe = self.redis.pipeline.return_value
+
+    def make_counter(self, threshold=100):
+        counter = ViewCounter(flush_interval=60, flush_threshold=threshold)
+        counter._start_flusher = lambda: None
+        return counter
+
+    def test_views_are_buffered(self):
+        counter = self.make_counter()
+        self.assertEqual(counter.incr(1), 11)
+        self.assertEqual(counter.incr(1), 12)
+        # Only the first read touches Redis, nothing is written yet
+        self.redis.get.assert_called_once_with('image:1:views')
+        self.pipe.execute.assert_not_called()
+
+    def test_flush_pipelines_pending_views(self):
+        counter = self.make_counter(threshold=3)
+        # INCRBY totals come first, then the ranking and bucket ZINCRBYs and the EXPIRE
+        self.pipe.execute.return_value = [15, 4, 2.0, 2.0, 1.0, 1.0, True]
+        counter.incr(1)
+        counter.incr(1)
+        counter.incr(2)
+        self.pipe.incrby.assert_any_call('image:1:views', 2)
+        self.pipe.zincrby.assert_any_call('image_ranking', 1, 2)
+        bucket = self.pipe.expire.call_args[0][0]
+        self.assertTrue(bucket.startswith('image_ranking:h:'))
+        self.pipe.zincrby.assert_any_call(bucket, 2, 1)
+        self.pipe.execute.assert_called_once()
+        self.assertEqual(counter.get(1), 15)
+        self.assertEqual(counter.get(2), 4)
+
+    def test_failed_flush_keeps_views(self):
+        counter = self.make_counter()
+        counter.incr(1)
+        self.pipe.execute.side_effect = redis.ConnectionError()
+        counter.flush()
+        self.assertEqual(counter._pending[1], 1)
+        self.assertEqual(counter.get(1), 11)
+
+    def test_remembered_totals_are_reread_after_ttl(self):
+        counter = self.make_counter()
+        with patch('images.counters.time.monotonic', return_value=1000):
+            self.assertEqual(counter.get(1), 10)
+            # other workers' views stay unseen while the total is fresh
+            self.redis.get.return_value = '25'
+            self.assertEqual(counter.get(1), 10)
+        with patch('images.counters.time.monotonic', return_value=1000 + counter.total_ttl + 1):
+            self.assertEqual(counter.get(1), 25)
+        self.assertEqual(self.redis.get.call_count, 2)
+
+
+@override_settings(CACHES=LOCMEM_CACHES)
+class ImageRankingTests(TestCase):
+    def setUp(self):
+        cache.clear()
+        self.user = User.objects.create_user(username='user1', password='pass')
+        self.images = [Image.objects.create(user=self.user, title=f'Image {i}', url='http://example.com/test.jpg',
+                                            image='test.jpg') for i in range(3)]
+        patcher = patch('images.ranking.get_redis')
+        self.redis = patcher.start().return_value
+        self.addCleanup(patcher.stop)
+
+    def test_top_images_reads_only_top_n_in_order(self):
+        ranked = [self.images[2].id, self.images[0].id]
+        self.redis.zrevrange.return_value = [str(i) for i in ranked]
+        self.assertEqual([image.id for image in top_images(2)], ranked)
+        self.redis.zrevrange.assert_called_once_with('image_ranking', 0, 1)
+
+    def test_hydrated_rows_are_cached_per_ranking_version(self):
+        self.redis.zrevrange.return_value = [str(self.images[1].id)]
+        top_images(5)
+        with self.assertNumQueries(0):
+            self.assertEqual(top_images(5)[0].id, self.images[1].id)
+        self.redis.zrevrange.return_value = [str(self.images[0].id), str(self.images[1].id)]
+        with self.assertNumQueries(1):
+            self.assertEqual(len(top_images(5)), 2)
+
+    def test_ranking_view(self):
+        self.redis.zrevrange.return_value = [str(self.images[0].id)]
+        self.client.force_login(self.user)
+        response = self.client.get(reverse('images:ranking'))
+        self.assertEqual(list(response.context['most_viewed']), [self.images[0]])
+
+    def test_window_merges_hourly_buckets(self):
+        self.redis.exists.return_value = 0
+        self.redis.zrevrange.return_value = []
+        top_image_ids(5, 'trending')
+        pipe = self.redis.pipeline.return_value
+        key, weights = pipe.zunionstore.call_args[0]
+        self.assertEqual(key, 'image_ranking:trending')
+        self.assertEqual(len(weights), 7 * 24)
+        self.assertEqual(sorted(weights.values(), reverse=True)[24], 0.5)
+        pipe.expire.assert_called_once_with('image_ranking:trending', 60)
+        self.redis.zrevrange.assert_called_once_with('image_ranking:trending', 0, 4)
+
+    def test_unknown_window_uses_all_time_ranking(self):
+        self.redis.zrevrange.return_value = []
+        self.client.force_login(self.user)
+        response = self.client.get(reverse('images:ranking'), {'window': 'decade'})
+        self.assertEqual(response.context['window'], 'all')
+        self.redis.zrevrange.assert_called_once_with('image_ranking', 0, 9)
+
+
+class ThumbnailTests(TempMediaRootMixin, TestCase):
+    def setUp(self):
+        super().setUp()
+        self.user = User.objects.create_user(username='user1', password='pass')
+
+    def make_image(self):
+        upload = SimpleUploadedFile('red.jpg', image_bytes(), content_type='image/jpeg')
+        return Image.objects.create(user=self.user, title='Red', url='http://example.com/red.jpg', image=upload)
+
+    def test_save_queues_thumbnails_on_commit(self):
+        with patch('images.signals.queue_thumbnails') as queue, \
+                patch('images.signals.run_in_background') as background:
+            with self.captureOnCommitCallbacks(execute=True):
+                image = self.make_image()
+            queue.assert_called_once_with(image.image)
+            background.assert_called_once_with(render_image, image.pk)
+            with self.captureOnCommitCallbacks(execute=True):
+                image.save(update_fields=['total_likes'])
+            queue.assert_called_once()
+            background.assert_called_once()
+
+    def test_renditions_ladder(self):
+        image = self.make_image()
+        with self.settings(IMAGE_RENDITION_WIDTHS=(160, 320, 640)):
+            render_image(image.pk)
+        image.refresh_from_db()
+        # the 640 rung is wider than the 400px original
+        self.assertEqual(sorted(image.renditions['webp']), ['160', '320'])
+        name = image.renditions['webp']['160']
+        self.assertTrue(name.endswith('.w160.webp'))
+        self.assertTrue(image.image.storage.exists(name))
+
+    def test_responsive_image_tag(self):
+        image = self.make_image()
+        image.renditions = {'webp': {'640': 'images/a.w640.webp', '320': 'images/a.w320.webp'}}
+        template = Template('{% load image_tags %}{% responsive_image image "detail" sizes="50vw" css_class="big" %}')
+        with patch('images.templatetags.image_tags.queue_thumbnails'):
+            html = template.render(Context({'image': image}))
+        self.assertIn('<source type="image/webp" srcset="/media/images/a.w320.webp 320w, '
+                      '/media/images/a.w640.webp 640w" sizes="50vw">', html)
+        self.assertIn('class="big"', html)
+        self.assertIn('alt="Red"', html)
+
+    def test_generate_then_serve_existing(self):
+        image = self.make_image()
+        self.assertIsNone(existing_thumbnail_url(image.image, 'grid'))
+        self.assertEqual(generate_thumbnails(image.image), 3)
+        self.assertIn('300x300', existing_thumbnail_url(image.image, 'grid'))
+
+    def test_template_tag_never_generates(self):
+        image = self.make_image()
+        template = Template('{% load image_tags %}{% pregenerated image.image "grid" %}')
+        with patch('images.templatetags.image_tags.queue_thumbnails') as queue, \
+                patch('images.thumbnails.generate_thumbnails') as generate:
+            self.assertEqual(template.render(Context({'image': image})), image.image.url)
+        queue.assert_called_once_with(image.image)
+        generate.assert_not_called()
+
+
+class RemoteImageFetchTests(TestCase):
+    png = b'\x89PNG\r\n\x1a\n' + b'\x00' * 100
+
+    def mock_response(self, chunks, headers=None):
+        response = MagicMock()
+        response.__enter__.return_value = response
+        response.headers = headers or {}
+        chunks = iter(chunks)
+        response.raw.read1.side_effect = lambda amt, decode_content=None: next(chunks, b'')
+        return response
+
+    def test_streams_to_file_and_sniffs_type(self):
+        with patch('images.fetch.requests.get', return_value=self.mock_response([self.png[:50], self.png[50:]])) as get:
+            upload, extension = fetch_image('http://example.com/image.jpg')
+        self.assertEqual(extension, 'png')
+        self.assertEqual(upload.read(), self.png)
+        self.assertTrue(get.call_args.kwargs['stream'])
+        self.assertIsInstance(get.call_args.kwargs['timeout'], tuple)
+
+    def test_size_limit_enforced_mid_stream(self):
+        chunks = iter([self.png] * 5)
+        response = self.mock_response([])
+        response.raw.read1.side_effect = lambda amt, decode_content=None: next(chunks, b'')
+        with patch('images.fetch.requests.get', return_value=response):
+            with self.assertRaises(RemoteImageError):
+                fetch_image('http://example.com/image.png', max_size=300)
+        # 108-byte chunks: stopped reading at the third one, which crossed the limit
+        self.assertEqual(len(list(chunks)), 2)
+
+    def test_deadline_bounds_each_read_of_a_trickling_server(self):
+        clock = [1000.0]
+        timeouts = []
+
+        def trickle(amt, decode_content=None):
+            # one byte every 9 seconds, just under the read timeout
+            clock[0] += 9
+            return b'x'
+
+        response = self.mock_response([])
+        response.raw.read1.side_effect = trickle
+        response.raw.connection.sock.settimeout.side_effect = timeouts.append
+        with override_settings(REMOTE_IMAGE_DEADLINE=30, REMOTE_IMAGE_READ_TIMEOUT=10), \
+                patch('images.fetch.time.monotonic', side_effect=lambda: clock[0]), \
+                patch('images.fetch.requests.get', return_value=response):
+            with self.assertRaisesMessage(RemoteImageError, 'took too long'):
+                fetch_image('http://example.com/image.png')
+        self.assertEqual(timeouts, [10, 10, 10, 3])
+        self.assertLessEqual(clock[0] - 1000, 30 + 9)
+
+    def test_declared_length_and_magic_bytes_checked(self):
+        big = self.mock_response([self.png], headers={'Content-Length': '999999999'})
+        with patch('images.fetch.requests.get', return_value=big):
+            with self.assertRaises(RemoteImageError):
+                fetch_image('http://example.com/image.png')
+        with patch('images.fetch.requests.get', return_value=self.mock_response([b'<html>not an image'])):
+            with self.assertRaisesMessage(RemoteImageError, 'not a JPEG or PNG'):
+                fetch_image('http://example.com/image.png')
+
+    def test_upload_view_reports_fetch_error(self):
+        user = User.objects.create_user(username='user1', password='pass')
+        self.client.force_login(user)
+        with patch('images.forms.fetch_image', side_effect=RemoteImageError('Could not download the image: 404')):
+            response = self.client.post(reverse('images:upload'),
+                                        {'title': 'Remote', 'url': 'http://example.com/image.png'})
+        self.assertEqual(response.status_code, 200)
+        self.assertContains(response, 'Could not download the image')
+        self.assertFalse(Image.objects.exists())
+
+
+class KeysetPaginationTests(TestCase):
+    def setUp(self):
+        self.user = User.objects.create_user(username='user1', password='pass')
+        for i in range(20):
+            Image.objects.create(user=self.user, title=f'Image {i}', url='http://example.com/test.jpg',
+                                 image='test.jpg', total_likes=i % 4)
+        self.client.force_login(self.user)
+
+    def test_pages_cover_every_image_once_in_order(self):
+        seen, cursor = [], None
+        while True:
+            with self.assertNumQueries(1):
+                images, cursor = keyset_page(Image.objects.all(), cursor, size=6)
+            seen += images
+            if cursor is None:
+                break
+        self.assertEqual(len(seen), 20)
+        self.assertEqual(seen, list(Image.objects.order_by('-total_likes', '-id')))
+
+    def test_malformed_cursor_starts_over(self):
+        self.assertIsNone(decode_cursor('not a cursor!'))
+        self.assertIsNone(decode_cursor(''))
+
+    def test_ajax_pages_follow_cursor_header(self):
+        ajax = {'HTTP_X_REQUESTED_WITH': 'XMLHttpRequest'}
+        with patch('images.ranking.get_redis'):
+            response = self.client.get(reverse('images:list'))
+        cursor = response.context['next_cursor']
+        titles = [image.title for image in response.context['most_liked']]
+        while cursor:
+            response = self.client.get(reverse('images:list'), {'cursor': cursor}, **ajax)
+            titles += [image.title for image in response.context['most_liked']]
+            cursor = response['X-Next-Cursor']
+        self.assertEqual(len(set(titles)), 20)
+
+
+class LikeCounterTests(TestCase):
+    def setUp(self):
+        self.users = [User.objects.create_user(username=f'user{i}', password='pass') for i in range(3)]
+        self.image = Image.objects.create(user=self.users[0], title='Title', url='http://example.com/test.jpg',
+                                          image='test.jpg')
+
+    def likes(self):
+        return Image.objects.values_list('total_likes', flat=True).get(pk=self.image.pk)
+
+    def test_add_and_remove(self):
+        with self.assertNumQueries(3):
+            # existing rows check, insert, F() update
+            self.image.users_like.add(self.users[0], self.users[1])
+        self.assertEqual(self.likes(), 2)
+        self.assertEqual(self.image.total_likes, 2)
+        # removing a user who never liked it does not count
+        self.image.users_like.remove(self.users[1], self.users[2])
+        self.assertEqual(self.likes(), 1)
+        self.image.users_like.add(self.users[0])
+        self.assertEqual(self.likes(), 1)
+
+    def test_reverse_changes_and_clear(self):
+        other = Image.objects.create(user=self.users[0], title='Other', url='http://example.com/o.jpg',
+                                     image='o.jpg')
+        self.users[1].images_liked.add(self.image, other)
+        self.users[2].images_liked.add(self.image)
+        self.assertEqual(self.likes(), 2)
+        self.users[1].images_liked.clear()
+        self.assertEqual(self.likes(), 1)
+        self.assertEqual(Image.objects.get(pk=other.pk).total_likes, 0)
+        self.image.users_like.clear()
+        self.assertEqual(self.likes(), 0)
+
+    def test_reconcile_command(self):
+        self.image.users_like.add(self.users[1])
+        Image.objects.filter(pk=self.image.pk).update(total_likes=7)
+        out = StringIO()
+        call_command('reconcile_likes', stdout=out)
+        self.assertIn('total_likes 7 -> 1', out.getvalue())
+        self.assertEqual(self.likes(), 1)
+
+
+class ImportImagesTests(TempMediaRootMixin, TestCase):
+    def setUp(self):
+        super().setUp()
+        self.source = tempfile.mkdtemp()
+        self.addCleanup(shutil.rmtree, self.source)
+        self.user = User.objects.create_user(username='user1', password='pass')
+
+    def write(self, name, color, fmt='JPEG'):
+        with open(os.path.join(self.source, name), 'wb') as f:
+            f.write(image_bytes(color, (40, 30), fmt))
+
+    def run_import(self, source, **options):
+        out, err = StringIO(), StringIO()
+        options.setdefault('user', 'user1')
+        call_command('import_images', source, workers=1, no_thumbnails=True,
+                     stdout=out, stderr=err, **options)
+        return out.getvalue(), err.getvalue()
+
+    def test_imports_directory_skipping_duplicates_and_invalid_files(self):
+        self.write('red_sunset.jpg', 'red')
+        self.write('red-copy.jpg', 'red')
+        self.write('blue.png', 'blue', 'PNG')
+        with open(os.path.join(self.source, 'broken.jpg'), 'wb') as f:
+            f.write(b'\xff\xd8\xff not really a jpeg')
+
+        out, err = self.run_import(self.source, batch_size=1)
+        self.assertIn('Imported 2 images', out)
+        self.assertIn('1 duplicates and 1 invalid files skipped', out)
+        self.assertIn('broken.jpg', err)
+        self.assertEqual(Image.objects.count(), 2)
+        image = Image.objects.get(title='Blue')
+        self.assertEqual(image.slug, 'blue')
+        self.assertEqual(len(image.checksum), 64)
+        self.assertTrue(image.image.name.endswith('.png'))
+        self.assertTrue(image.image.storage.exists(image.image.name))
+        self.assertEqual(Action.objects.filter(user=self.user, verb='uploaded image').count(), 2)
+
+        # a second run finds everything already imported
+        out, _ = self.run_import(self.source)
+        self.assertIn('Imported 0 images', out)
+        self.assertEqual(Image.objects.count(), 2)
+
+    def test_imports_csv_manifest(self):
+        self.write('a.jpg', 'green')
+        manifest = os.path.join(self.source, 'manifest.csv')
+        with open(manifest, 'w') as f:
+            f.write('path,title,description,url\na.jpg,Green field,Grass,http://example.com/a.jpg\n')
+        self.run_import(manifest)
+        image = Image.objects.get()
+        self.assertEqual((image.title, image.description, image.url),
+                         ('Green field', 'Grass', 'http://example.com/a.jpg'))
+
+    @patch('images.management.commands.import_images.render_image')
+    @patch('images.management.commands.import_images.generate_thumbnails')
+    def test_generates_thumbnails_and_renditions(self, mock_thumbnails, mock_render):
+        self.write('a.jpg', 'green')
+        call_command('import_images', self.source, user='user1', workers=1, stdout=StringIO())
+        image = Image.objects.get()
+        mock_thumbnails.assert_called_once_with(image.image)
+        mock_render.assert_called_once_with(image.pk)
+
+    def test_unknown_user(self):
+        with self.assertRaises(CommandError):
+            self.run_import(self.source, user='nobody')
+
+
+class ContentAddressedStorageTests(TempMediaRootMixin, TestCase):
+    def setUp(self):
+        super().setUp()
+        self.user = User.objects.create_user(username='user1', password='pass')
+
+    def create(self, name, content):
+        return Image.objects.create(user=self.user, title=name, url='http://example.com/a.jpg',
+                                    image=SimpleUploadedFile(name, content, content_type='image/jpeg'))
+
+    def test_identical_uploads_share_one_file(self):
+        content = image_bytes()
+        first = self.create('a.jpg', content)
+        second = self.create('b.JPG', content)
+        other = self.create('c.jpg', image_bytes('blue'))
+        digest = hashlib.sha256(content).hexdigest()
+        self.assertEqual(first.image.name, f'blobs/{digest[:2]}/{digest}.jpg')
+        self.assertEqual(second.image.name, first.image.name)
+        self.assertNotEqual(other.image.name, first.image.name)
+        self.assertEqual(first.image.storage.listdir(f'blobs/{digest[:2]}')[1], [f'{digest}.jpg'])
+
+    def test_profile_photos_share_blobs(self):
+        other = User.objects.create_user(username='user2', password='pass')
+        profiles = [Profile(user=user) for user in (self.user, other)]
+        for profile in profiles:
+            profile.photo.save('lego.png', ContentFile(b'same icon bytes'), save=False)
+        self.assertEqual(profiles[0].photo.name, profiles[1].photo.name)
+        self.assertTrue(profiles[0].photo.name.startswith('blobs/'))
+
+    def test_renditions_are_encoded_once_per_blob(self):
+        content = image_bytes()
+        first = self.create('a.jpg', content)
+        second = self.create('b.jpg', content)
+        render_image(first.pk)
+        with patch('images.renditions.generate_renditions') as mock_generate:
+            render_image(second.pk)
+        mock_generate.assert_not_called()
+        first.refresh_from_db()
+        second.refresh_from_db()
+        self.assertTrue(first.renditions)
+        self.assertEqual(second.renditions, first.renditions)
+
+    def test_dedupe_media_command(self):
+        content = image_bytes()
+        image = self.create('a.jpg', content)
+        storage = image.image.storage
+        legacy = [storage._save(f'images/2020/01/01/{name}.jpg', ContentFile(content)) for name in ('x', 'y')]
+        for name in legacy:
+            Image.objects.create(user=self.user, title=name, url='http://example.com/a.jpg', image=name)
+        call_command('dedupe_media', delete=True, stdout=StringIO())
+        self.assertEqual(set(Image.objects.values_list('image', flat=True)), {image.image.name})
+        self.assertFalse(any(storage.exists(name) for name in legacy))
@@ -0,0 +1,80 @@
+"""
+Thumbnail pre-generation.
+
+Every alias in THUMBNAIL_ALIASES for a file is generated on a small
+background pool as soon as the file is saved, so templates only ever look
+up existing thumbnails (see the ``pregenerated`` template tag) and a
+request never pays for decoding and resizing an upload.
+"""
+import logging
+import threading
+from concurrent.futures import ThreadPoolExecutor
+
+from django.conf import settings
+from django.db import connections
+from easy_thumbnails.alias import aliases
+from easy_thumbnails.files import get_thumbnailer
+
+logger = logging.getLogger(__name__)
+
+_executor = None
+# Files with a generation job queued or running in this process
+_in_flight = set()
+_in_flight_lock = threading.Lock()
+
+
+def _get_executor():
+    global _executor
+    if _executor is None:
+        _executor = ThreadPoolExecutor(max_workers=settings.THUMBNAIL_WORKERS, thread_name_prefix='thumbnails')
+    return _executor
+
+
+def run_in_background(fn, *args):
+    """Run ``fn(*args)`` on the image processing pool."""
+    def job():
+        try:
+            fn(*args)
+        finally:
+            connections.close_all()
+    return _get_executor().submit(job)
+
+
+def generate_thumbnails(fieldfile):
+    """Generate every missing alias of ``fieldfile``. Returns the number of aliases."""
+    thumbnailer = get_thumbnailer(fieldfile)
+    options = aliases.all(target=fieldfile)
+    for alias_options in options.values():
+        thumbnailer.get_thumbnail(alias_options)
+    return len(options)
+
+
+def _generate(fieldfile):
+    try:
+        generate_thumbnails(fieldfile)
+    except Exception as e:
+        logger.error(f"Thumbnail generation failed for {fieldfile.name}: {e}")
+    finally:
+        with _in_flight_lock:
+            _in_flight.discard(fieldfile.name)
+
+
+def queue_thumbnails(fieldfile):
+    """Generate the aliases of ``fieldfile`` in the background (once per file at a time)."""
+    if not fieldfile:
+        return
+    with _in_flight_lock:
+        if fieldfile.name in _in_flight:
+            return
+        _in_flight.add(fieldfile.name)
+    run_in_background(_generate, fieldfile)
+
+
+def existing_thumbnail_url(fieldfile, alias):
+    """URL of an already generated thumbnail, or None. Never generates."""
+    options = aliases.get(alias, target=fieldfile)
+    if options is None:
+        logger.warning(f"Unknown thumbnail alias {alias!r} for {fieldfile.name}")
+        return None
+    thumbnail = get_thumbnailer(fieldfile).get_existing_thumbnail(options)
+    return thumbnail.url if thumbnail else None
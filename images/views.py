@@ -1,15 +1,16 @@
-import redis
 from actions.utils import create_action
 from common.decorators import ajax_required
 from django.shortcuts import get_object_or_404, render, redirect
 from django.contrib.auth.decorators import login_required
 from django.contrib import messages
-from django.core.paginator import Paginator, EmptyPage, PageNotAnInteger
 from django.http import HttpResponse, JsonResponse
 from django.views.decorators.http import require_POST
+from .counters import view_counter
+from .fetch import RemoteImageError
 from .forms import ImageCreateForm, ImageUploadForm
 from .models import Image
-from core.redis_client import get_redis
+from .pagination import keyset_page
+from .ranking import WINDOW_CHOICES, top_images
 import logging
 
 logger = logging.getLogger(__name__)
@@ -22,15 +23,18 @@ def image_create(request):
         form = ImageCreateForm(data=request.POST)
         if form.is_valid():
             # form data is valid
-            cd = form.cleaned_data
-            new_item = form.save(commit=False)
-            # assign current user to the item
-            new_item.user = request.user
-            new_item.save()
-            create_action(request.user, 'shared image', new_item)
-            messages.success(request, 'Image added successfully')
-            # redirect to new created item detail view
-            return redirect(new_item.get_absolute_url())
+            try:
+                new_item = form.save(commit=False)
+            except RemoteImageError as e:
+                form.add_error('url', str(e))
+            else:
+                # assign current user to the item
+                new_item.user = request.user
+                new_item.save()
+                create_action(request.user, 'shared image', new_item)
+                messages.success(request, 'Image added successfully')
+                # redirect to new created item detail view
+                return redirect(new_item.get_absolute_url())
     else:
         # build form with data provided by the bookmarklet via GET
         form = ImageCreateForm(data=request.GET)
@@ -42,16 +46,8 @@ def image_create(request):
 
 def image_detail(request, id, slug):
     image = get_object_or_404(Image, id=id, slug=slug)
-    # increment total image views by 1
-    total_views = 0
-    r = get_redis()
-    if r is not None:
-        try:
-            total_views = r.incr(f'image:{image.id}:views')
-            # increment image ranking by 1
-            r.zincrby('image_ranking', 1, image.id)
-        except redis.RedisError as e:
-            logger.error(f"Redis error in image_detail: {e}")
+    # count the view; views and ranking are flushed to Redis in batches
+    total_views = view_counter.incr(image.id)
     return render(request,
                   'images/image/detail.html',
                   {'section': 'images',
@@ -81,58 +77,47 @@ def image_like(request):
 
 @login_required
 def image_list(request):
-    most_likes = Image.objects.order_by('-total_likes')
-    paginator = Paginator(most_likes, 9)
-    page = request.GET.get('page')
-    try:
-        most_likes = paginator.page(page)
-    except PageNotAnInteger:
-        # If page is not an integer deliver the first page
-        most_likes = paginator.page(1)
-    except EmptyPage:
-        if request.headers.get('X-Requested-With') == 'XMLHttpRequest':
-            # If the request is AJAX and the page is out of range
+    # keyset pagination: each page continues after the cursor of the previous one
+    most_likes, next_cursor = keyset_page(Image.objects.all(), request.GET.get('cursor'))
+    if request.headers.get('X-Requested-With') == 'XMLHttpRequest':
+        if not most_likes:
+            # If the request is AJAX and there are no more images
             # return an empty page
             return HttpResponse('')
-        # If page is out of range deliver last page of results
-        most_likes = paginator.page(paginator.num_pages)
-    if request.headers.get('X-Requested-With') == 'XMLHttpRequest':
-        return render(request,
-                      'images/image/list_ajax.html',
-                      {'section': 'images', 'images': most_likes})
-    # get image ranking dictionary
-    r = get_redis()
-    image_ranking = r.zrange('image_ranking', 0, -1,
-                             desc=True)[:5]
-    image_ranking_ids = [int(id) for id in image_ranking]
-    # get most viewed images
-    most_viewed = list(Image.objects.filter(
-        id__in=image_ranking_ids))
-    most_viewed.sort(key=lambda x: image_ranking_ids.index(x.id))
+        response = render(request,
+                          'images/image/list_ajax.html',
+                          {'section': 'images', 'most_liked': most_likes})
+        response['X-Next-Cursor'] = next_cursor or ''
+        return response
+    # get most viewed images of the requested window (all-time by default)
+    window = request.GET.get('window', 'all')
+    if window not in WINDOW_CHOICES:
+        window = 'all'
+    most_viewed = top_images(5, window)
     return render(request,
                   'images/image/list.html',
                   {
                       'section': 'images',
                       'most_liked': most_likes,
-                      'most_viewed': most_viewed}
+                      'most_viewed': most_viewed,
+                      'next_cursor': next_cursor,
+                      'window': window}
                   )
 
 
 @login_required
 def image_ranking(request):
-    # get image ranking dictionary
-    r = get_redis()
-    image_ranking = r.zrange('image_ranking', 0, -1,
-                             desc=True)[:10]
-    image_ranking_ids = [int(id) for id in image_ranking]
-    # get most viewed images
-    most_viewed = list(Image.objects.filter(
-        id__in=image_ranking_ids))
-    most_viewed.sort(key=lambda x: image_ranking_ids.index(x.id))
+    # get most viewed images of the requested window (all-time by default)
+    window = request.GET.get('window', 'all')
+    if window not in WINDOW_CHOICES:
+        window = 'all'
+    most_viewed = top_images(10, window)
     return render(request,
                   'images/image/ranking.html',
                   {'section': 'images',
-                   'most_viewed': most_viewed})
+                   'most_viewed': most_viewed,
+                   'window': window,
+                   'windows': WINDOW_CHOICES})
 
 
 @login_required
@@ -140,12 +125,16 @@ def image_upload(request):
     if request.method == 'POST':
         form = ImageUploadForm(request.POST, request.FILES)
         if form.is_valid():
-            new_item = form.save(commit=False)
-            new_item.user = request.user
-            new_item.save()
-            create_action(request.user, 'uploaded image', new_item)
-            messages.success(request, 'Image uploaded successfully')
-            return redirect(new_item.get_absolute_url())
+            try:
+                new_item = form.save(commit=False)
+            except RemoteImageError as e:
+                form.add_error('url', str(e))
+            else:
+                new_item.user = request.user
+                new_item.save()
+                create_action(request.user, 'uploaded image', new_item)
+                messages.success(request, 'Image uploaded successfully')
+                return redirect(new_item.get_absolute_url())
     else:
         form = ImageUploadForm()
     return render(request,
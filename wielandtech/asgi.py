@@ -2,6 +2,8 @@
 ASGI config for wielandtech project.
 
 It exposes the ASGI callable as a module-level variable named ``application``.
+The homelab metrics SSE stream is routed straight to core.streaming so its
+long-lived connections bypass the Django middleware stack.
 
 For more information on this file, see
 https://docs.djangoproject.com/en/5.1/howto/deployment/asgi/
@@ -13,4 +15,12 @@ from django.core.asgi import get_asgi_application
 
 os.environ.setdefault('DJANGO_SETTINGS_MODULE', 'wielandtech.settings')
 
-application = get_asgi_application()
+django_application = get_asgi_application()
+
+from core.streaming import STREAM_PATH, metrics_stream  # noqa: E402 (needs the app registry)
+
+
+async def application(scope, receive, send):
+    if scope['type'] == 'http' and scope['path'] == STREAM_PATH:
+        return await metrics_stream(scope, receive, send)
+    return await django_application(scope, receive, send)
@@ -230,10 +230,41 @@ CACHES = {
     }
 }
 
+# Anonymous full-page cache lifetime (seconds). Pages are purged per URL when their
+# content changes, so this only bounds staleness of shared parts such as the blog sidebar
+PAGE_CACHE_TTL = int(os.environ.get('PAGE_CACHE_TTL', 300))
+
+# Image views are buffered per process and flushed to Redis every interval (seconds)
+# or once this many views are pending
+IMAGE_VIEWS_FLUSH_INTERVAL = float(os.environ.get('IMAGE_VIEWS_FLUSH_INTERVAL', 5))
+IMAGE_VIEWS_FLUSH_THRESHOLD = int(os.environ.get('IMAGE_VIEWS_FLUSH_THRESHOLD', 100))
+# Seconds a remembered total is trusted before it is re-read, so totals converge across workers
+IMAGE_VIEWS_TOTAL_TTL = float(os.environ.get('IMAGE_VIEWS_TOTAL_TTL', 30))
+
+# Prometheus (kube-prometheus-stack) used for the weather station data
+PROMETHEUS_URL = os.environ.get(
+    'PROMETHEUS_URL', 'http://kube-prometheus-stack-prometheus.monitoring.svc.cluster.local:9090')
+# Parallel chunked history fetch: shared pool size, retries per chunk, overall deadline (seconds)
+PROMETHEUS_MAX_CONCURRENCY = int(os.environ.get('PROMETHEUS_MAX_CONCURRENCY', 8))
+PROMETHEUS_CHUNK_RETRIES = int(os.environ.get('PROMETHEUS_CHUNK_RETRIES', 2))
+WEATHER_HISTORY_DEADLINE = float(os.environ.get('WEATHER_HISTORY_DEADLINE', 20))
+
 # Netdata monitoring configuration
 NETDATA_URL = os.environ.get('NETDATA_URL', 'http://netdata.netdata.svc.cluster.local:19999')
 # For parent-child Netdata setups, specify which hosts to monitor (comma-separated)
 NETDATA_HOSTS = os.environ.get('NETDATA_HOSTS', 'wtech7062,wtech7061,wtech7063').split(',')
+# Per-query timeout and overall deadline (seconds) for one concurrent metrics refresh
+NETDATA_TIMEOUT = float(os.environ.get('NETDATA_TIMEOUT', 3))
+NETDATA_DEADLINE = float(os.environ.get('NETDATA_DEADLINE', 3))
+NETDATA_MAX_WORKERS = int(os.environ.get('NETDATA_MAX_WORKERS', 32))
+# Background metrics poller (manage.py poll_metrics)
+METRICS_POLL_INTERVAL = float(os.environ.get('METRICS_POLL_INTERVAL', 1))
+METRICS_LEADER_TTL = int(os.environ.get('METRICS_LEADER_TTL', 10))
+# Snapshots older than this are refreshed on demand if no poller holds the leader lock
+METRICS_SNAPSHOT_MAX_AGE = float(os.environ.get('METRICS_SNAPSHOT_MAX_AGE', 5))
+METRICS_SNAPSHOT_TTL = int(os.environ.get('METRICS_SNAPSHOT_TTL', 300))
+# How long superseded snapshot versions are kept for ?since=<version> deltas
+SNAPSHOT_HISTORY_TTL = int(os.environ.get('SNAPSHOT_HISTORY_TTL', 120))
 
 # Security settings for production
 # These are enabled when DEBUG=False
@@ -276,10 +307,30 @@ else:
     SECURE_HSTS_PRELOAD = False
     SECURE_CONTENT_TYPE_NOSNIFF = True
 
+# Thumbnail sizes, generated in the background when an image or profile photo is saved
+THUMBNAIL_ALIASES = {
+    'images.Image.image': {
+        'grid': {'size': (300, 300), 'crop': 'smart'},
+        'detail': {'size': (1024, 0)},
+        'small': {'size': (80, 80), 'crop': '100%'},
+    },
+    'account.Profile.photo': {
+        'avatar': {'size': (180, 180)},
+        'small': {'size': (80, 80), 'crop': '100%'},
+    },
+}
+THUMBNAIL_WORKERS = int(os.environ.get('THUMBNAIL_WORKERS', 2))
+# Widths of the WebP/AVIF renditions encoded for each uploaded image (srcset ladder)
+IMAGE_RENDITION_WIDTHS = (320, 640, 1024, 1600)
+
 # File upload settings
 DATA_UPLOAD_MAX_MEMORY_SIZE = 10485760  # 10MB
 FILE_UPLOAD_MAX_MEMORY_SIZE = 10485760  # 10MB
 MAX_UPLOAD_SIZE = 10485760  # 10MB
+# Downloads of images shared by URL (seconds)
+REMOTE_IMAGE_CONNECT_TIMEOUT = float(os.environ.get('REMOTE_IMAGE_CONNECT_TIMEOUT', 5))
+REMOTE_IMAGE_READ_TIMEOUT = float(os.environ.get('REMOTE_IMAGE_READ_TIMEOUT', 10))
+REMOTE_IMAGE_DEADLINE = float(os.environ.get('REMOTE_IMAGE_DEADLINE', 30))
 
 # reCAPTCHA configuration
 RECAPTCHA_PUBLIC_KEY = os.getenv("RECAPTCHA_PUBLIC_KEY")
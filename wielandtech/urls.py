@@ -21,6 +21,7 @@ from django.urls import include, path
 from django.conf.urls import handler404
 
 from blog.sitemaps import PostSitemap
+from core.page_cache import anonymous_page_cache
 from wielandtech import settings
 
 sitemaps = {
@@ -35,7 +36,8 @@ urlpatterns = [
     path('admin/', admin.site.urls),
     path('blog/', include('blog.urls', namespace='blog')),
     path('images/', include('images.urls', namespace='images')),
-    path('sitemap.xml', sitemap, {'sitemaps': sitemaps}, name='django.contrib.sitemaps.views.sitemap'),
+    path('sitemap.xml', anonymous_page_cache(sitemap), {'sitemaps': sitemaps},
+         name='django.contrib.sitemaps.views.sitemap'),
     path('social-auth/', include('social_django.urls', namespace='social')),
 ]
 